@@ -151,6 +151,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'students.User'
 
+# ModelBackend that checks token logins' passwords on a bounded worker pool
+AUTHENTICATION_BACKENDS = ['students.passwords.PooledPasswordBackend']
+
 # CORS Settings
 # In development, allow requests from Vite dev server
 CORS_ALLOWED_ORIGINS = [
@@ -163,12 +166,12 @@ CORS_ALLOW_CREDENTIALS = True  # Required for HttpOnly cookies
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'students.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'students.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
     'MAX_PAGE_SIZE': 100,
     'DEFAULT_FILTER_BACKENDS': [
@@ -179,6 +182,88 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Exports
+# Number of rows fetched per server-side cursor round trip and
+# emitted per chunk by the streaming CSV exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Seconds delta export watermarks trail the current time. A write commits
+# with the updated_at of when it ran, so transactions open longer than
+# this could commit rows behind a watermark already handed out
+EXPORT_DELTA_LAG = int(os.environ.get('DJANGO_EXPORT_DELTA_LAG', 60))
+
+# Directory where the export worker writes finished background exports
+EXPORT_ROOT = Path(os.environ.get('DJANGO_EXPORT_ROOT', BASE_DIR / 'exports'))
+
+# Seconds a running export job may go without recording progress before
+# the next worker to claim a job marks it failed, as its worker died
+EXPORT_JOB_LEASE = int(os.environ.get('DJANGO_EXPORT_JOB_LEASE', 600))
+
+# List counts
+# Seconds a paginated list's total count stays cached. Saves and deletes
+# invalidate counts right away, but only in the process's own cache
+# unless CACHES points at a shared backend such as Redis or Memcached
+COUNT_CACHE_TIMEOUT = 300
+# Unfiltered lists of tables with more rows than this report PostgreSQL's
+# row estimate instead of counting
+COUNT_ESTIMATE_THRESHOLD = 1000000
+
+# Cache versions
+# Bulk writes touching more rows than this bump each kind's {kind}:* scope
+# instead of one scope per row (see students/versions.py)
+VERSION_SCOPE_LIMIT = 1000
+
+# List response cache
+# Seconds a cached list response (the course catalog) is kept. Saves and
+# deletes of the models it shows stop it matching at once, with the same
+# per-process caveat as list counts
+LIST_CACHE_TIMEOUT = 300
+
+# Search
+# Searches matching at most this many objects are ranked by relevance;
+# broader ones keep the list's ordering
+SEARCH_RANK_LIMIT = 500
+
+# Typeahead lookups
+# Most matches one /api/v1/lookup/ request returns
+LOOKUP_MAX_RESULTS = 50
+
+# Bulk creation
+# Maximum number of rows accepted by one bulk POST to grades or enrollments
+BULK_CREATE_MAX_ROWS = 1000
+
+# Student imports
+# Roster rows validated, hashed and inserted per transaction
+IMPORT_BATCH_SIZE = 1000
+# Processes hashing passwords for the import_students command; 0 hashes in
+# the importing process. Uploads to the import endpoint always use 0.
+IMPORT_HASH_WORKERS = int(os.environ.get('DJANGO_IMPORT_HASH_WORKERS', os.cpu_count() or 1))
+# Most rows the import endpoint accepts per upload: it hashes passwords
+# while the request waits, so larger rosters go through the command
+IMPORT_UPLOAD_MAX_ROWS = int(os.environ.get('DJANGO_IMPORT_UPLOAD_MAX_ROWS', 200))
+
+# Claims-backed authentication
+# Seconds a user's active flag, role and profile ids are cached between
+# checks; saving or deleting the user or a profile drops them at once
+AUTH_USER_CACHE_TIMEOUT = 60
+# Seconds a /me payload stays cached; saving the user or a profile
+# replaces it at once
+CURRENT_USER_CACHE_TIMEOUT = 300
+
+# Token logins
+# last_login is buffered per process and written in batches: at most every
+# LAST_LOGIN_FLUSH_INTERVAL seconds (0 writes on each login), with at most
+# LAST_LOGIN_BATCH_SIZE users per UPDATE. Times are kept to
+# LAST_LOGIN_PRECISION seconds; logins within the same period write nothing.
+LAST_LOGIN_FLUSH_INTERVAL = 10
+LAST_LOGIN_BATCH_SIZE = 500
+LAST_LOGIN_PRECISION = 60
+# Token logins hash passwords on PASSWORD_HASH_WORKERS threads; at most
+# PASSWORD_HASH_QUEUE_DEPTH more wait, and further logins get 503. The
+# limit spans every process only when CACHES points at a shared backend
+PASSWORD_HASH_WORKERS = max(2, (os.cpu_count() or 2) // 2)
+PASSWORD_HASH_QUEUE_DEPTH = 32
+
 # Simple JWT Settings
 # Security note: JWT secret is derived from Django SECRET_KEY
 # Access tokens are short-lived (15 min) for security
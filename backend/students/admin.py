@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
+from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade, ExportJob
 
 
 @admin.register(User)
@@ -75,3 +75,13 @@ class GradeAdmin(admin.ModelAdmin):
     ordering = ['-graded_at']
     raw_id_fields = ['student', 'course', 'teacher']
 
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin configuration for ExportJob model."""
+    
+    list_display = ['id', 'kind', 'status', 'row_count', 'total_rows', 'requested_by', 'created_at']
+    list_filter = ['kind', 'status', 'created_at']
+    ordering = ['-created_at']
+    raw_id_fields = ['requested_by']
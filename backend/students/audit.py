@@ -0,0 +1,240 @@
+"""
+Query plan audit of the API's viewsets.
+
+Every viewset registered in students/urls.py is requested as an admin, a
+teacher and a student: list with no parameters, with each filter, each
+ordering (both directions), a search and a numbered page, and retrieve.
+The queries each request runs are captured and EXPLAINed, and flagged:
+
+- full_scan: a table read from end to end (SQLite SCAN, PostgreSQL
+  Seq Scan)
+- temp_sort: rows sorted outside an index (SQLite USE TEMP B-TREE,
+  PostgreSQL Sort)
+- n_plus_one: the same query shape run N_PLUS_ONE_REPEATS or more times
+  in one request
+
+The flags say where the database does more work than an index would
+need; whether the table is large enough to matter is the reader's call.
+"""
+import re
+from collections import Counter
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
+from .search import rebuild_index
+from .visibility import rebuild_visibility
+
+
+PERSONAS = ('admin', 'teacher', 'student')
+
+N_PLUS_ONE_REPEATS = 3
+
+
+def seed_audit_data(students=2000, courses=50, teachers=10, courses_per_student=5):
+    """
+    Bulk-create a school large enough for realistic plans, and return the
+    admin, teacher and student personas.
+    """
+    admin = User.objects.create(username='audit-admin', email='audit-admin@example.com', role='admin')
+    teacher_users = User.objects.bulk_create(
+        User(username=f'audit-teacher{i}', email=f'audit-teacher{i}@example.com', role='teacher')
+        for i in range(teachers)
+    )
+    teacher_profiles = TeacherProfile.objects.bulk_create(
+        TeacherProfile(user=user, department=f'Department {i % 4}') for i, user in enumerate(teacher_users)
+    )
+    course_rows = Course.objects.bulk_create(
+        Course(code=f'AUD{i:03d}', title=f'Audit course {i}', teacher=teacher_profiles[i % teachers],
+               is_active=i % 10 != 0)
+        for i in range(courses)
+    )
+    student_users = User.objects.bulk_create(
+        (
+            User(username=f'audit-student{i}', email=f'audit-student{i}@example.com', role='student')
+            for i in range(students)
+        ),
+        batch_size=5000,
+    )
+    student_profiles = StudentProfile.objects.bulk_create(
+        (
+            StudentProfile(user=user, enrollment_number=f'AUD{i:07d}', date_of_birth=date(2000, 1, 1))
+            for i, user in enumerate(student_users)
+        ),
+        batch_size=5000,
+    )
+    pairs = [
+        (student, course_rows[(i + offset * 7) % courses])
+        for i, student in enumerate(student_profiles)
+        for offset in range(courses_per_student)
+    ]
+    Enrollment.objects.bulk_create(
+        (Enrollment(student=student, course=course) for student, course in pairs),
+        batch_size=5000,
+    )
+    Grade.objects.bulk_create(
+        (
+            Grade(student=student, course=course, teacher=course.teacher, value='ABCDF'[i % 5])
+            for i, (student, course) in enumerate(pairs)
+        ),
+        batch_size=5000,
+    )
+    rebuild_index()
+    rebuild_visibility()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return {'admin': admin, 'teacher': teacher_users[0], 'student': student_users[0]}
+
+
+def existing_personas():
+    """The first active user of each role in the database."""
+    personas = {}
+    for role in PERSONAS:
+        user = User.objects.filter(role=role, is_active=True).order_by('pk').first()
+        if user is not None:
+            personas[role] = user
+    return personas
+
+
+def explain(sql):
+    """The database's plan for a captured query, as lines of text."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def plan_flags(plan):
+    """Flags raised by a query plan, as (flag, plan line) pairs."""
+    flags = []
+    for line in plan:
+        detail = line.strip().lstrip('-> ')
+        if re.match(r'SCAN (?!subquery)\w+$', detail) or re.match(r'Seq Scan on ', detail):
+            flags.append(('full_scan', detail))
+        elif 'USE TEMP B-TREE' in detail or re.match(r'(Incremental )?Sort ', detail):
+            flags.append(('temp_sort', detail))
+    return flags
+
+
+def query_shape(sql):
+    """The query with its literal values masked, to spot repeats."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((\?, )*\?\)', 'IN (...)', sql)
+
+
+def sample_value(obj, field_name):
+    """A filter value that matches obj, or None if it has none."""
+    value = obj
+    for part in field_name.split('__'):
+        value = getattr(value, part, None)
+        if value is None:
+            return None
+    if hasattr(value, 'pk'):
+        return value.pk
+    if isinstance(value, bool):
+        return str(value).lower()
+    return value
+
+
+def request_cases(viewset, sample):
+    """(action, params, pk) for every request audited on a viewset."""
+    cases = [('list', {}, None), ('list', {'page': 1}, None)]
+    filterset_class = getattr(viewset, 'filterset_class', None)
+    if filterset_class is not None and sample is not None:
+        for name, filter_ in filterset_class.base_filters.items():
+            value = sample_value(sample, filter_.field_name)
+            if value is not None:
+                cases.append(('list', {name: value}, None))
+    for field in getattr(viewset, 'ordering_fields', None) or []:
+        cases += [('list', {'ordering': field}, None), ('list', {'ordering': f'-{field}'}, None)]
+    if getattr(viewset, 'search_fields', None):
+        cases.append(('list', {'search': 'audit'}, None))
+    if sample is not None:
+        cases.append(('retrieve', {}, sample.pk))
+    return cases
+
+
+def audit_request(view, user, prefix, action, params, pk):
+    """Run one request and return its audit entry."""
+    path = f'/api/v1/{prefix}/' + (f'{pk}/' if pk is not None else '')
+    request = APIRequestFactory().get(path, params, HTTP_HOST='localhost')
+    force_authenticate(request, user=user)
+    with CaptureQueriesContext(connection) as captured:
+        response = view(request, **({'pk': pk} if pk is not None else {}))
+        response.render()
+
+    queries = []
+    for query in captured.captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            continue
+        plan = explain(sql)
+        queries.append({'sql': sql, 'plan': plan, 'flags': plan_flags(plan)})
+
+    shapes = Counter(query_shape(query['sql']) for query in queries)
+    flags = sorted({flag for query in queries for flag in query['flags']})
+    flags += [('n_plus_one', shape) for shape, count in shapes.items() if count >= N_PLUS_ONE_REPEATS]
+    return {
+        'status': response.status_code,
+        'query_count': len(captured.captured_queries),
+        'queries': queries,
+        'flags': [{'flag': flag, 'detail': detail} for flag, detail in flags],
+    }
+
+
+def audit_viewsets(registry, personas):
+    """Audit every (prefix, viewset, basename) in a router registry for each persona."""
+    entries = []
+    for prefix, viewset, _ in registry:
+        for persona, user in personas.items():
+            request = Request(APIRequestFactory().get('/'))
+            request.user = user
+            scope_view = viewset(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+            sample = scope_view.get_queryset().order_by('pk').first()
+            for action, params, pk in request_cases(viewset, sample):
+                view = viewset.as_view({'get': action})
+                entry = audit_request(view, user, prefix, action, params, pk)
+                entries.append({
+                    'viewset': viewset.__name__,
+                    'persona': persona,
+                    'action': action,
+                    'params': {name: str(value) for name, value in params.items()},
+                    **entry,
+                })
+    return entries
+
+
+def markdown_report(entries):
+    """A Markdown summary of the audit: flag totals, then each flagged request."""
+    totals = Counter(flag['flag'] for entry in entries for flag in entry['flags'])
+    lines = [
+        '# Query plan audit',
+        '',
+        f'{len(entries)} requests, {sum(entry["query_count"] for entry in entries)} queries.',
+        '',
+        '| Flag | Requests |',
+        '| --- | --- |',
+    ]
+    lines += [f'| {flag} | {count} |' for flag, count in sorted(totals.items())]
+    lines += [
+        '',
+        '| Viewset | Persona | Action | Params | Queries | Flags |',
+        '| --- | --- | --- | --- | --- | --- |',
+    ]
+    for entry in entries:
+        if not entry['flags']:
+            continue
+        params = ', '.join(f'{name}={value}' for name, value in entry['params'].items()) or '-'
+        flags = '<br>'.join(f"{flag['flag']}: `{flag['detail'][:120]}`" for flag in entry['flags'])
+        lines.append(
+            f"| {entry['viewset']} | {entry['persona']} | {entry['action']} | {params} "
+            f"| {entry['query_count']} | {flags} |"
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,124 @@
+"""
+JWT authentication from access token claims.
+
+Access tokens carry the user's role, username, email and profile ids
+(see token_serializers.py). ClaimsJWTAuthentication builds request.user
+from them instead of loading the user row, with the student_profile and
+teacher_profile relations pre-filled, so role checks and get_queryset()
+scoping run without queries. Fields the token does not carry are
+deferred and loaded from the database if a view reads them.
+
+Each request still checks the account: its active flag, claimed fields
+and profile ids are cached for AUTH_USER_CACHE_TIMEOUT seconds and
+dropped when the user or a profile is saved or deleted, so deactivation
+takes effect on the next request. Tokens whose claims no longer match
+the account, such as after a username change, and tokens issued before
+profile ids were added, fall back to loading the user.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.base import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User, StudentProfile, TeacherProfile
+
+
+USER_CLAIMS = ('role', 'username', 'email')
+
+# Profile relation on User -> (token claim, profile model)
+PROFILE_CLAIMS = {
+    'student_profile': ('student_profile_id', StudentProfile),
+    'teacher_profile': ('teacher_profile_id', TeacherProfile),
+}
+
+
+def profile_claims(user):
+    """Token claims for the ids of the user's profiles (None if missing)."""
+    claims = {}
+    for relation, (claim, model) in PROFILE_CLAIMS.items():
+        profile = getattr(user, relation, None)
+        claims[claim] = profile.pk if profile is not None else None
+    return claims
+
+
+def account_key(user_id):
+    return f'auth-account:{user_id}'
+
+
+def account_state(user_id):
+    """
+    The user's (is_active, role, username, email, student profile id,
+    teacher profile id), or None if there is no such user. Cached for
+    AUTH_USER_CACHE_TIMEOUT.
+    """
+    key = account_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list(
+            'is_active', *USER_CLAIMS, 'student_profile__id', 'teacher_profile__id'
+        ).first()
+        # Missing users are cached as an empty tuple
+        state = tuple(row or ())
+        cache.set(key, state, settings.AUTH_USER_CACHE_TIMEOUT)
+    return state or None
+
+
+def forget_account(user_id):
+    """Drop the cached account state after the user or a profile changes."""
+    cache.delete(account_key(user_id))
+
+
+def deferred_instance(model, values):
+    """A saved model instance with the given field values and the rest deferred."""
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        User.objects.db,
+        [field.attname for field in fields],
+        [values.get(field.attname, DEFERRED) for field in fields],
+    )
+
+
+def claims_user(validated_token, user_id):
+    """The request user described by the token, profiles included."""
+    user = deferred_instance(User, {
+        'id': user_id,
+        'is_active': True,
+        **{claim: validated_token[claim] for claim in USER_CLAIMS},
+    })
+    for relation, (claim, model) in PROFILE_CLAIMS.items():
+        profile = None
+        if validated_token[claim] is not None:
+            profile = deferred_instance(model, {'id': validated_token[claim], 'user_id': user_id})
+            model.user.field.set_cached_value(profile, user)
+        # A cached None makes hasattr(user, relation) False without a query
+        getattr(User, relation).related.set_cached_value(user, profile)
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that builds request.user from the token's claims."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        claims = USER_CLAIMS + tuple(claim for claim, model in PROFILE_CLAIMS.values())
+        if api_settings.CHECK_REVOKE_TOKEN or any(claim not in validated_token for claim in claims):
+            return super().get_user(validated_token)
+
+        state = account_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        is_active, *claimed = state
+        if not is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if tuple(claimed) != tuple(validated_token[claim] for claim in claims):
+            # The role, username, email or profiles changed since the token
+            # was issued
+            return super().get_user(validated_token)
+        return claims_user(validated_token, user_id)
@@ -0,0 +1,150 @@
+"""
+Bulk creation for list endpoints.
+
+POSTing a JSON array validates every row in one pass. Primary keys the
+rows reference are loaded with one IN query per related model, checks
+that span rows (duplicates, rows that already exist) run as set-based
+queries through the serializer's validate_rows(), and valid input is
+inserted with bulk_create(). Any invalid row rejects the whole batch,
+with errors reported per row in the order submitted.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that looks objects up among those its parent
+    serializer preloaded for a bulk request instead of querying per row.
+    """
+
+    def to_pk(self, data):
+        """Coerce input to a primary key value, or return None if it is not one."""
+        if isinstance(data, bool):
+            return None
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+
+    def preload(self, values):
+        pks = {pk for pk in map(self.to_pk, values) if pk is not None}
+        return self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        objects = getattr(self.parent, 'preloaded', {}).get(self.field_name)
+        if objects is None or self.pk_field is not None:
+            return super().to_internal_value(data)
+        pk = self.to_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in objects:
+            self.fail('does_not_exist', pk_value=data)
+        return objects[pk]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    List serializer for bulk creation. The child serializer's
+    validate_rows(rows) returns an error or None for each validated row,
+    and its optional bulk_created(instances) runs in the insert's
+    transaction, for work post_save signals would do per row.
+    """
+
+    def to_internal_value(self, data):
+        self.valid_rows = []
+        if isinstance(data, list):
+            self.child.preloaded = {
+                name: field.preload(item.get(name) for item in data if isinstance(item, dict))
+                for name, field in self.child.fields.items()
+                if isinstance(field, BulkPrimaryKeyRelatedField) and not field.read_only
+            }
+        try:
+            super().to_internal_value(data)
+            errors = [{} for _ in self.valid_rows]
+        except serializers.ValidationError as exc:
+            if not isinstance(exc.detail, list):
+                raise
+            errors = exc.detail
+        finally:
+            self.child.preloaded = {}
+
+        # Rows that are valid on their own are also checked against each other
+        valid = [index for index, error in enumerate(errors) if not error]
+        for index, error in zip(valid, self.child.validate_rows(self.valid_rows)):
+            if error:
+                errors[index] = {api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail(error, code='unique')]}
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return self.valid_rows
+
+    def run_child_validation(self, data):
+        attrs = super().run_child_validation(data)
+        self.valid_rows.append(attrs)
+        return attrs
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        with transaction.atomic():
+            instances = model.objects.bulk_create(model(**attrs) for attrs in validated_data)
+            if hasattr(self.child, 'bulk_created'):
+                self.child.bulk_created(instances)
+        return instances
+
+
+def unique_together_errors(model, fields, rows, message, instance=None):
+    """
+    Check rows against a unique_together constraint with one query.
+    Returns an error or None for each row, flagging rows that match an
+    existing object other than instance, or an earlier row.
+    """
+    keys = []
+    for attrs in rows:
+        if instance is not None:
+            # Partial updates keep the instance's values for fields not sent
+            attrs = {name: attrs.get(name, getattr(instance, name)) for name in fields}
+        values = [attrs.get(name) for name in fields]
+        keys.append(tuple(value.pk for value in values) if all(values) else None)
+    complete = [key for key in keys if key is not None]
+    existing = set()
+    if complete:
+        queryset = model.objects.filter(**{
+            f'{name}__in': {key[index] for key in complete} for index, name in enumerate(fields)
+        })
+        if instance is not None:
+            queryset = queryset.exclude(pk=instance.pk)
+        existing = set(queryset.values_list(*(f'{name}_id' for name in fields)))
+
+    errors = []
+    for key in keys:
+        errors.append(message if key is not None and key in existing else None)
+        existing.add(key)
+    return errors
+
+
+class BulkCreateMixin:
+    """
+    Viewset mixin that creates every row of a JSON array in one request.
+    - POST [{...}, {...}] validates all rows and inserts them together
+    - POST ...?dry_run=1 only validates, reporting the same errors
+    Rows are saved through perform_create(), so defaults it applies
+    reach every row. A single object is created as before.
+    """
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            data=request.data, many=True, max_length=settings.BULK_CREATE_MAX_ROWS
+        )
+        serializer.is_valid(raise_exception=True)
+        if request.query_params.get('dry_run') in ('1', 'true'):
+            return Response({'count': len(serializer.validated_data)})
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
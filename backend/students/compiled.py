@@ -0,0 +1,186 @@
+"""
+Compiled read path for list endpoints.
+
+A serializer's readable fields are compiled once into a read plan: a
+flat list of values_list() lookups and a layout saying which tuple
+index fills which output key, nested the way the serializer nests.
+List actions then reshape database rows straight into the serializer's
+output without building model instances or running DRF's per-field
+get_attribute machinery. Values still go through each field's own
+to_representation(), except where that is a no-op for the database
+type or can be bound once per response, so the output is identical.
+"""
+from functools import lru_cache
+
+from django.utils import timezone
+from rest_framework import ISO_8601, fields as drf_fields
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.settings import api_settings
+
+from .projection import resolve_source
+
+
+# Fields whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = (
+    drf_fields.CharField, drf_fields.EmailField,
+    drf_fields.IntegerField, drf_fields.BooleanField,
+)
+
+
+def no_converter():
+    return None
+
+
+def representation_converter(field):
+    """
+    Return a function binding the field's converter for one response,
+    which returns None when values can be used as they are.
+    """
+    if type(field) in IDENTITY_FIELDS:
+        return no_converter
+    if type(field) is drf_fields.DateTimeField:
+        return lambda: datetime_converter(field)
+    return lambda: field.to_representation
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation() with the timezone looked up once
+    instead of for every value.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class NotCompilable(Exception):
+    """Raised when a serializer field cannot be read from a values_list() row."""
+
+
+class ReadPlan:
+    """
+    values_list() lookups plus the layout that turns each row into the
+    serializer's output. Layout entries are (key, row index, converter,
+    nested layout); a nested entry's index holds the relation's foreign
+    key, which is None when the related object is missing. Converters
+    are bound at the start of each render().
+    """
+
+    def __init__(self, serializer, model):
+        self.lookups = []
+        self.layout = self._compile(serializer, model, [])
+
+    def _column(self, lookup):
+        self.lookups.append(lookup)
+        return len(self.lookups) - 1
+
+    def _compile(self, serializer, model, prefix):
+        layout = []
+        for field in serializer._readable_fields:
+            if field.source == '*' or isinstance(field, ListSerializer):
+                raise NotCompilable(field.field_name)
+            resolved = resolve_source(model, field.source)
+            if resolved is None or len(resolved[0]) > 1:
+                raise NotCompilable(field.field_name)
+
+            parts, related_model = resolved
+            lookup = '__'.join(prefix + parts)
+            if isinstance(field, BaseSerializer):
+                if related_model is None:
+                    raise NotCompilable(field.field_name)
+                nested = self._compile(field, related_model, prefix + parts)
+                layout.append((field.field_name, self._column(lookup), no_converter, nested))
+            elif related_model is not None:
+                # A raw foreign key is exactly what a plain PrimaryKeyRelatedField renders
+                if not isinstance(field, PrimaryKeyRelatedField) or field.pk_field is not None:
+                    raise NotCompilable(field.field_name)
+                layout.append((field.field_name, self._column(lookup), no_converter, None))
+            else:
+                converter = representation_converter(field)
+                layout.append((field.field_name, self._column(lookup), converter, None))
+        return layout
+
+    def render(self, rows):
+        layout = _bind(self.layout)
+        return [_render_row(layout, row) for row in rows]
+
+
+def _bind(layout):
+    return [
+        (key, index, converter(), _bind(nested) if nested is not None else None)
+        for key, index, converter, nested in layout
+    ]
+
+
+def _render_row(layout, row):
+    data = {}
+    for key, index, convert, nested in layout:
+        value = row[index]
+        if value is None:
+            data[key] = None
+        elif nested is not None:
+            data[key] = _render_row(nested, row)
+        elif convert is None:
+            data[key] = value
+        else:
+            data[key] = convert(value)
+    return data
+
+
+@lru_cache(maxsize=128)
+def compile_serializer(serializer_class, fields=None, expand=()):
+    """
+    Build the read plan for a serializer class and its sparse fieldset
+    and expansion options, or return None if it cannot be compiled.
+    """
+    kwargs = {}
+    if fields is not None:
+        kwargs['fields'] = list(fields)
+    if expand:
+        kwargs['expand'] = list(expand)
+    try:
+        return ReadPlan(serializer_class(**kwargs), serializer_class.Meta.model)
+    except NotCompilable:
+        return None
+
+
+class CompiledListMixin:
+    """
+    Viewset mixin that serves list actions from a compiled read plan,
+    falling back to the serializer when a field cannot be compiled.
+    """
+    compiled_list = True
+
+    def get_read_plan(self):
+        if not self.compiled_list:
+            return None
+        options = self.get_flex_options() if hasattr(self, 'get_flex_options') else {}
+        fields = options.get('fields')
+        return compile_serializer(
+            self.get_serializer_class(),
+            tuple(fields) if fields is not None else None,
+            tuple(options.get('expand', ())),
+        )
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*plan.lookups)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page))
+        return Response(plan.render(queryset))
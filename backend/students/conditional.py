@@ -0,0 +1,152 @@
+"""
+Conditional GETs for list and detail endpoints.
+
+ConditionalGetMixin gives list and retrieve responses an ETag and a
+Last-Modified header, and answers If-None-Match and If-Modified-Since
+with 304 Not Modified before anything is serialized:
+
+- A list is validated by the newest updated_at in its table and the
+  newest export tombstone of its kind, read with one query that uses
+  their indexes. Saves and upserts set updated_at and deletes leave a
+  tombstone, so any write to the table changes them. Writes to the
+  other tables the filtered query reads, such as a course changing
+  teacher for a teacher's enrollments, are covered by their versions
+  (see versions.py). They are part of the ETag, and Last-Modified is
+  never older than the time they were handed out. No COUNT is run, so
+  long lists stay as cheap to validate as keyset pages are to read.
+  The filtered queryset is built once and reused for the response.
+- A detail response is validated by the object's updated_at.
+
+Validators are also keyed by the user, the query parameters and the
+response format, since those shape the payload. Responses with ?expand=
+embed rows of other tables that the validators do not cover, so they
+are sent without validators.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .counts import query_tables, table_versions
+from .models import ExportTombstone
+from .versions import version_time
+
+
+def as_datetime(value):
+    """An aware datetime from a raw column value (SQLite returns text)."""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def newest_change(model, tombstone_kind=None, using='default'):
+    """
+    The newest updated_at in the model's table and, given a kind, the
+    newest deletion recorded for it, from one query.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = f'SELECT (SELECT MAX({quote("updated_at")}) FROM {quote(model._meta.db_table)})'
+    params = []
+    if tombstone_kind is not None:
+        sql += (
+            f', (SELECT MAX({quote("deleted_at")}) FROM {quote(ExportTombstone._meta.db_table)} '
+            f'WHERE {quote("kind")} = %s)'
+        )
+        params.append(tombstone_kind)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        changes = [as_datetime(value) for value in cursor.fetchone()]
+    return max((value for value in changes if value is not None), default=None)
+
+
+def validator_etag(request, *parts):
+    """An ETag for the parts, keyed by the user, query and response format."""
+    user = request.user
+    key = repr((
+        user.pk, getattr(user, 'role', None), request.accepted_renderer.media_type,
+        sorted(request.query_params.lists()), *parts,
+    ))
+    return quote_etag(hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def conditional_response(request, etag, last_modified, handler):
+    """
+    304 if the request's validators match, else handler()'s response;
+    either way with the ETag and Last-Modified headers.
+    """
+    # Changes later in the same second would share a Last-Modified, so
+    # it is only sent once that second is over
+    if last_modified is not None and timezone.now() - last_modified < timedelta(seconds=1):
+        last_modified = None
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = handler()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Clients revalidate every time; responses differ per user
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin answering conditional list and retrieve requests with
+    304 Not Modified. tombstone_kind names the ExportTombstone kind that
+    records the model's deletions.
+    """
+    tombstone_kind = None
+
+    def conditional(self, request):
+        return not request.query_params.get('expand')
+
+    def filter_queryset(self, queryset):
+        # list() filters once for its validators; the response reuses it
+        validated = getattr(self, 'validated_queryset', None)
+        if validated is not None:
+            return validated
+        return super().filter_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        if not self.conditional(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.validated_queryset = self.filter_queryset(self.get_queryset())
+        last_modified = newest_change(queryset.model, self.tombstone_kind, queryset.db)
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            scope = None
+        else:
+            tables = query_tables(queryset, sql)
+            versions = table_versions(tables)
+            scope = (sql, params, versions)
+            # Rows can enter or leave the scope through other tables'
+            # writes, which only their versions record
+            last_modified = max(filter(None, [last_modified, *(
+                version_time(version) for table, version in zip(tables, versions)
+                if table != queryset.model._meta.db_table
+            )]), default=None)
+        etag = validator_etag(request, 'list', scope, last_modified)
+        return conditional_response(
+            request, etag, last_modified, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.conditional(request):
+            return super().retrieve(request, *args, **kwargs)
+        instance = self.get_object()
+        etag = validator_etag(request, 'detail', instance.pk, instance.updated_at)
+        return conditional_response(
+            request, etag, instance.updated_at, lambda: Response(self.get_serializer(instance).data)
+        )
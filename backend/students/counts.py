@@ -0,0 +1,92 @@
+"""
+Cached total counts for paginated lists.
+
+A list's total is cached under a key built from the view and the SQL of
+its filtered queryset, which already encodes the role scope (a teacher's
+own courses, a student's own rows) and the filter parameters. The key
+also carries a version for every table the query reads (see
+versions.py). Writing a row bumps its table's version, so only the
+counts that read that table stop matching. Writers that bypass the ORM
+call invalidate_counts() themselves.
+
+Unfiltered lists of very large tables are not counted at all on
+PostgreSQL: the planner's row estimate is reported instead.
+"""
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from .versions import bump, read_versions, table_scope
+
+
+def invalidate_counts(*models):
+    """Invalidate the cached counts of every query reading the models' tables."""
+    bump(*(table_scope(model._meta.db_table) for model in models))
+
+
+def table_versions(tables):
+    """Current version of each table (see versions.py)."""
+    return read_versions(*(table_scope(table) for table in tables))
+
+
+def query_tables(queryset, sql):
+    """Tables of the app's models that the SQL reads, subqueries included."""
+    quote = connections[queryset.db].ops.quote_name
+    return sorted({
+        model._meta.db_table
+        for model in apps.get_models()
+        if quote(model._meta.db_table) in sql
+    })
+
+
+def planner_estimate(queryset):
+    """The table's row estimate from PostgreSQL's statistics, or None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+def query_key(prefix, queryset):
+    """
+    Cache key for a result of the queryset. The key changes whenever a
+    table the query reads is written. Raises EmptyResultSet for querysets
+    that cannot match anything.
+    """
+    sql, params = queryset.query.sql_with_params()
+    versions = table_versions(query_tables(queryset, sql))
+    digest = hashlib.sha256(repr((sql, params, versions)).encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def cached_count(queryset, scope, count):
+    """
+    Return (count, exact) for the queryset, cached per scope (the view)
+    and query. count(queryset) computes it on a cache miss.
+    """
+    queryset = queryset.order_by()
+    if not queryset.query.has_filters():
+        estimate = planner_estimate(queryset)
+        if estimate is not None and estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+            return estimate, False
+
+    try:
+        key = query_key(f'count:{scope}', queryset)
+    except EmptyResultSet:
+        return 0, True
+
+    result = cache.get(key)
+    if result is None:
+        result = count(queryset)
+        cache.set(key, result, settings.COUNT_CACHE_TIMEOUT)
+    return tuple(result)
@@ -0,0 +1,18 @@
+"""
+Export engine shared by the streaming export views and the background
+export worker (``manage.py run_export_worker``).
+
+- specs: what each export contains, as columns over a values_list()
+- writers: how rows become bytes (CSV, NDJSON, gzip variants, XLSX)
+- renderers: DRF content negotiation of the writer formats
+- responses: streaming responses, delta watermarks and ranged downloads
+- jobs: background export jobs written to disk
+"""
+from .specs import Column, ExportSpec, EXPORTS
+from .writers import ExportWriter, WRITERS
+from .renderers import EXPORT_RENDERER_CLASSES
+from .responses import (
+    WATERMARK_HEADER, make_watermark, parse_since,
+    export_response, ranged_file_response
+)
+from .jobs import export_file_path, claim_next_job, run_export_job
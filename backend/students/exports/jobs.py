@@ -0,0 +1,123 @@
+"""
+Background export jobs, processed by ``manage.py run_export_worker``.
+"""
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import ExportJob
+from .specs import EXPORTS
+from .writers import WRITERS
+
+
+def export_file_path(job):
+    """Location of a job's finished export on disk."""
+    return Path(settings.EXPORT_ROOT) / f'export-{job.pk}-{job.kind}.{job.file_format}'
+
+
+def partial_file_path(job):
+    """Location of a job's export while it is being written."""
+    path = export_file_path(job)
+    return path.with_name(path.name + '.part')
+
+
+def fail_stale_jobs():
+    """
+    Mark running jobs failed when their worker recorded no progress for
+    EXPORT_JOB_LEASE seconds, and remove their partial files. Workers
+    touch updated_at after every chunk, so only jobs whose worker died
+    or hung get here. They are not retried, since a job that kills its
+    worker would otherwise kill every worker in turn.
+    """
+    now = timezone.now()
+    expired = dict(
+        status=ExportJob.STATUS_RUNNING,
+        updated_at__lt=now - timedelta(seconds=settings.EXPORT_JOB_LEASE),
+    )
+    for job in ExportJob.objects.filter(**expired).only('id', 'kind', 'file_format'):
+        failed = ExportJob.objects.filter(id=job.id, **expired).update(
+            status=ExportJob.STATUS_FAILED,
+            error='The export worker stopped before finishing',
+            finished_at=now,
+            updated_at=now,
+        )
+        if failed:
+            partial_file_path(job).unlink(missing_ok=True)
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest pending job to running and return it,
+    after failing running jobs whose lease expired (see fail_stale_jobs).
+    The conditional UPDATE makes this safe for several workers sharing a
+    database without row locks or a broker.
+    """
+    fail_stale_jobs()
+    pending = ExportJob.objects.filter(status=ExportJob.STATUS_PENDING).order_by('created_at')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        claimed = ExportJob.objects.filter(
+            id=job_id, status=ExportJob.STATUS_PENDING
+        ).update(
+            status=ExportJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            return ExportJob.objects.get(id=job_id)
+    return None
+
+
+def run_export_job(job):
+    """
+    Write a job's export to disk chunk by chunk, recording progress after
+    every chunk. The file is written under a temporary name and moved into
+    place only once complete.
+    """
+    jobs = ExportJob.objects.filter(pk=job.pk)
+    path = export_file_path(job)
+    partial_path = partial_file_path(job)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        spec = EXPORTS[job.kind]
+        writer = WRITERS[job.file_format]
+        queryset = spec.queryset(job.params)
+        jobs.update(total_rows=queryset.count(), updated_at=timezone.now())
+
+        rows = _track_progress(spec.rows(job.params, queryset), jobs)
+        with open(partial_path, 'wb') as handle:
+            for data in writer.stream(spec.columns, rows):
+                handle.write(data)
+        os.replace(partial_path, path)
+
+        jobs.update(
+            status=ExportJob.STATUS_COMPLETED,
+            file_name=path.name,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    except Exception as exc:
+        partial_path.unlink(missing_ok=True)
+        jobs.update(
+            status=ExportJob.STATUS_FAILED,
+            error=str(exc),
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+
+    job.refresh_from_db()
+    return job
+
+
+def _track_progress(rows, jobs):
+    """Pass rows through, saving the row count after every chunk."""
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % settings.EXPORT_CHUNK_SIZE == 0:
+            jobs.update(row_count=written, updated_at=timezone.now())
+    jobs.update(row_count=written, updated_at=timezone.now())
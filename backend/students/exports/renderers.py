@@ -0,0 +1,32 @@
+"""
+DRF renderers that let content negotiation pick an export format from
+?format= or the Accept header. The export itself is streamed by a
+writer, so these only ever render error payloads, as JSON.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .writers import WRITERS
+
+
+class ExportRenderer(BaseRenderer):
+    """Base renderer for export formats."""
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+def renderer_for(writer):
+    """Build the renderer class negotiating a writer's format."""
+    name = ''.join(part.capitalize() for part in writer.format.split('.'))
+    return type(f'{name}ExportRenderer', (ExportRenderer,), {
+        'format': writer.format,
+        'media_type': writer.media_type,
+    })
+
+
+# CSV comes first, so it is the default when the client accepts anything
+EXPORT_RENDERER_CLASSES = [renderer_for(writer) for writer in WRITERS.values()]
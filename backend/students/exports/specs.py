@@ -0,0 +1,142 @@
+"""
+Declarative export specs. Each export is a list of columns projected
+with values_list(), so rows are fetched as plain tuples from a
+server-side cursor and never instantiate models.
+"""
+from django.conf import settings
+
+from ..models import StudentProfile, Course, Enrollment, Grade, ExportTombstone
+
+
+class Column:
+    """One exported column: its CSV/XLSX header, NDJSON key and field lookup."""
+
+    def __init__(self, header, key, field=None, default=None):
+        self.header = header
+        self.key = key
+        self.field = field or key
+        self.default = default
+
+
+# Trailing column of delta exports: 'N' for changed rows, 'Y' for tombstones
+DELETED_COLUMN = Column('Deleted', 'deleted')
+
+
+class ExportSpec:
+    """
+    Describes one export: the model, its columns and the query
+    parameters it can be filtered by (mapped to queryset lookups).
+    """
+
+    def __init__(self, kind, model, columns, filters=None):
+        self.kind = kind
+        self.model = model
+        self.columns = columns
+        self.filters = filters or {}
+
+    @property
+    def delta_columns(self):
+        return self.columns + [DELETED_COLUMN]
+
+    def queryset(self, params):
+        """Return the values_list queryset backing this export."""
+        queryset = self.model.objects.all()
+        for param, lookup in self.filters.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        return queryset.values_list(*[column.field for column in self.columns])
+
+    def rows(self, params, queryset=None):
+        """Iterate the export rows from a server-side cursor, in chunks."""
+        if queryset is None:
+            queryset = self.queryset(params)
+        values = queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+        defaults = [
+            (index, column.default)
+            for index, column in enumerate(self.columns)
+            if column.default is not None
+        ]
+        if not defaults:
+            return values
+        return (self._fill_defaults(row, defaults) for row in values)
+
+    def delta_rows(self, params, since, until):
+        """
+        Yield rows updated in (since, until], flagged 'N', then the IDs of
+        rows deleted in the same window, flagged 'Y'. The window is a range
+        scan on the updated_at index.
+        """
+        changed = self.queryset(params).filter(
+            updated_at__gt=since,
+            updated_at__lte=until
+        )
+        for row in self.rows(params, changed):
+            yield (*row, 'N')
+
+        tombstones = ExportTombstone.objects.filter(
+            kind=self.kind,
+            deleted_at__gt=since,
+            deleted_at__lte=until
+        )
+        course_id = params.get('course_id')
+        if course_id and 'course_id' in self.filters:
+            tombstones = tombstones.filter(course_id=course_id)
+
+        padding = (None,) * (len(self.columns) - 1)
+        object_ids = tombstones.values_list('object_id', flat=True).iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE
+        )
+        for object_id in object_ids:
+            yield (object_id, *padding, 'Y')
+
+    @staticmethod
+    def _fill_defaults(row, defaults):
+        row = list(row)
+        for index, default in defaults:
+            if row[index] is None:
+                row[index] = default
+        return row
+
+
+EXPORTS = {spec.kind: spec for spec in [
+    ExportSpec('students', StudentProfile, [
+        Column('ID', 'id'),
+        Column('Username', 'username', 'user__username'),
+        Column('Email', 'email', 'user__email'),
+        Column('First Name', 'first_name', 'user__first_name'),
+        Column('Last Name', 'last_name', 'user__last_name'),
+        Column('Enrollment Number', 'enrollment_number'),
+        Column('Date of Birth', 'date_of_birth'),
+        Column('Phone Number', 'phone_number'),
+        Column('Address', 'address'),
+    ]),
+    ExportSpec('grades', Grade, [
+        Column('ID', 'id'),
+        Column('Student Username', 'student_username', 'student__user__username'),
+        Column('Student Enrollment', 'student_enrollment', 'student__enrollment_number'),
+        Column('Course Code', 'course_code', 'course__code'),
+        Column('Course Title', 'course_title', 'course__title'),
+        Column('Grade', 'grade', 'value'),
+        Column('Teacher', 'teacher', 'teacher__user__username', default='N/A'),
+        Column('Graded At', 'graded_at'),
+    ], filters={'course_id': 'course_id'}),
+    ExportSpec('courses', Course, [
+        Column('ID', 'id'),
+        Column('Code', 'code'),
+        Column('Title', 'title'),
+        Column('Description', 'description'),
+        Column('Teacher', 'teacher', 'teacher__user__username', default='N/A'),
+        Column('Active', 'is_active'),
+        Column('Created At', 'created_at'),
+    ]),
+    ExportSpec('enrollments', Enrollment, [
+        Column('ID', 'id'),
+        Column('Student Username', 'student_username', 'student__user__username'),
+        Column('Student Enrollment', 'student_enrollment', 'student__enrollment_number'),
+        Column('Course Code', 'course_code', 'course__code'),
+        Column('Course Title', 'course_title', 'course__title'),
+        Column('Enrolled At', 'enrolled_at'),
+    ], filters={'course_id': 'course_id'}),
+]}
@@ -0,0 +1,216 @@
+"""
+Pluggable export writers. A writer turns a column list and an iterator
+of row tuples into a stream of bytes, consuming the rows in chunks so
+memory stays flat whether the output goes to a response or a file.
+"""
+import csv
+import re
+import zipfile
+import zlib
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def chunked(rows, chunk_size=None):
+    """Group rows into lists of at most chunk_size rows."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ExportWriter:
+    """
+    Base class for export writers.
+    format is the name accepted by ?format=, media_type is matched against
+    the Accept header and content_type is sent with the result.
+    """
+    format = None
+    media_type = None
+
+    @property
+    def content_type(self):
+        return self.media_type
+
+    def stream(self, columns, rows):
+        raise NotImplementedError
+
+
+class Echo:
+    """
+    Pseudo-buffer that hands back whatever csv.writer writes to it,
+    so rows can be yielded one by one instead of accumulated.
+    """
+    def write(self, value):
+        return value
+
+
+class CSVWriter(ExportWriter):
+    """
+    Writes CSV. The header is yielded before rows is consumed, so the
+    first byte goes out before the export query runs.
+    """
+    format = 'csv'
+    media_type = 'text/csv'
+
+    def stream(self, columns, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow([column.header for column in columns]).encode()
+        for chunk in chunked(rows):
+            yield ''.join(writer.writerow(row) for row in chunk).encode()
+
+
+class NDJSONWriter(ExportWriter):
+    """Writes one JSON object per line, keyed by the column keys."""
+    format = 'ndjson'
+    media_type = 'application/x-ndjson'
+
+    def stream(self, columns, rows):
+        keys = [column.key for column in columns]
+        encoder = DjangoJSONEncoder()
+        for chunk in chunked(rows):
+            lines = (encoder.encode(dict(zip(keys, row))) for row in chunk)
+            yield ''.join(line + '\n' for line in lines).encode()
+
+
+class GzipWriter(ExportWriter):
+    """Gzip-compresses the output of another writer as it streams."""
+
+    def __init__(self, writer, media_type):
+        self.writer = writer
+        self.format = f'{writer.format}.gz'
+        self.media_type = media_type
+
+    @property
+    def content_type(self):
+        return 'application/gzip'
+
+    def stream(self, columns, rows):
+        # wbits=16+MAX_WBITS writes a gzip header and trailer
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for data in self.writer.stream(columns, rows):
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+class _ZipStream:
+    """
+    Write-only, unseekable file object for zipfile. Written bytes are
+    collected until drained, so the archive can be streamed as it grows.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class XLSXWriter(ExportWriter):
+    """
+    Writes a single-sheet XLSX workbook with inline strings. The sheet is
+    written into the zip archive chunk by chunk, so no shared-strings
+    table or whole-sheet buffer is ever held in memory.
+    """
+    format = 'xlsx'
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )
+    ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    WORKBOOK = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+    SHEET_START = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetData>'
+    )
+    SHEET_END = '</sheetData></worksheet>'
+
+    # Control characters are not allowed in XML 1.0 documents
+    ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+    def stream(self, columns, rows):
+        buffer = _ZipStream()
+        archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+        archive.writestr('[Content_Types].xml', self.CONTENT_TYPES)
+        archive.writestr('_rels/.rels', self.ROOT_RELS)
+        archive.writestr('xl/workbook.xml', self.WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', self.WORKBOOK_RELS)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(self.SHEET_START.encode())
+            sheet.write(self._row([column.header for column in columns]).encode())
+            yield buffer.drain()
+            for chunk in chunked(rows):
+                sheet.write(''.join(self._row(row) for row in chunk).encode())
+                yield buffer.drain()
+            sheet.write(self.SHEET_END.encode())
+
+        archive.close()
+        yield buffer.drain()
+
+    def _row(self, values):
+        return '<row>' + ''.join(self._cell(value) for value in values) + '</row>'
+
+    def _cell(self, value):
+        if value is None:
+            return '<c/>'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c><v>{value}</v></c>'
+        text = escape(self.ILLEGAL_XML_RE.sub('', str(value)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+WRITERS = {writer.format: writer for writer in [
+    CSVWriter(),
+    GzipWriter(CSVWriter(), 'application/gzip'),
+    NDJSONWriter(),
+    GzipWriter(NDJSONWriter(), 'application/x-ndjson+gzip'),
+    XLSXWriter(),
+]}
@@ -0,0 +1,108 @@
+"""
+Gradebook uploads: a course's grades as a CSV of enrollment numbers and
+letter grades. The upload is checked against the course roster and the
+grades already recorded with one query each, and only new or changed
+grades are written, in a single upsert on the (student, course) key.
+"""
+import csv
+import io
+
+from .models import Enrollment, Grade
+
+
+GRADEBOOK_COLUMNS = ('enrollment_number', 'grade')
+
+GRADE_VALUES = {value for value, _ in Grade.GRADE_CHOICES}
+
+
+def read_gradebook(file):
+    """
+    Parse an uploaded gradebook CSV into (line, enrollment number, grade)
+    rows. Raises ValueError when the file is not a gradebook CSV.
+    """
+    try:
+        text = file.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError('Gradebook must be a UTF-8 encoded CSV file.')
+
+    reader = csv.reader(io.StringIO(text))
+    header = [name.strip().lower() for name in next(reader, [])]
+    missing = [name for name in GRADEBOOK_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"Gradebook is missing columns: {', '.join(missing)}")
+
+    number_index, grade_index = (header.index(name) for name in GRADEBOOK_COLUMNS)
+    rows = []
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        cells = row + [''] * (len(header) - len(row))
+        rows.append((reader.line_num, cells[number_index].strip(), cells[grade_index].strip().upper()))
+    return rows
+
+
+class GradebookDiff:
+    """
+    How a gradebook upload compares with a course's recorded grades.
+    Each list holds one entry per CSV row.
+    """
+
+    def __init__(self):
+        self.inserted = []
+        self.changed = []
+        self.unchanged = []
+        self.rejected = []
+        # student_id -> new value for the rows to write
+        self.writes = {}
+
+    def as_dict(self):
+        return {
+            'inserted': self.inserted,
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'rejected': self.rejected,
+        }
+
+
+def diff_gradebook(course, rows):
+    """Compare gradebook rows with the course roster and its current grades."""
+    roster = dict(
+        Enrollment.objects.filter(course=course).values_list('student__enrollment_number', 'student_id')
+    )
+    current = dict(Grade.objects.filter(course=course).values_list('student_id', 'value'))
+
+    diff = GradebookDiff()
+    seen = set()
+    for line, number, value in rows:
+        entry = {'line': line, 'enrollment_number': number, 'grade': value}
+        student_id = roster.get(number)
+        if student_id is None:
+            diff.rejected.append({**entry, 'error': 'Student is not enrolled in this course.'})
+        elif value not in GRADE_VALUES:
+            diff.rejected.append({**entry, 'error': f"'{value}' is not a valid grade."})
+        elif student_id in seen:
+            diff.rejected.append({**entry, 'error': 'Student appears more than once.'})
+        elif student_id not in current:
+            diff.inserted.append(entry)
+            diff.writes[student_id] = value
+        elif current[student_id] != value:
+            diff.changed.append({**entry, 'previous': current[student_id]})
+            diff.writes[student_id] = value
+        else:
+            diff.unchanged.append(entry)
+        if student_id is not None:
+            seen.add(student_id)
+    return diff
+
+
+def apply_gradebook(course, diff, teacher):
+    """Upsert the inserted and changed grades of a diff, graded by teacher."""
+    Grade.objects.bulk_create(
+        [
+            Grade(student_id=student_id, course=course, teacher=teacher, value=value)
+            for student_id, value in diff.writes.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['student', 'course'],
+        update_fields=['value', 'teacher', 'graded_at', 'updated_at'],
+    )
@@ -0,0 +1,219 @@
+"""
+Bulk student imports from a CSV or NDJSON roster.
+
+The roster is read as a stream and handled in batches. Each batch is
+validated row by row, checked for taken usernames and emails with one
+query per field, has its passwords hashed in a process pool and is
+inserted with bulk_create() in its own transaction. Bulk inserts send no
+post_save signals, so the auto-profile receivers do not run; profiles
+are created alongside the users, numbered ENR{user id:06d} as the
+signal would, and both are added to the search index in the same
+transaction.
+"""
+import csv
+import io
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .exports.writers import chunked
+from .models import User, StudentProfile
+from .search import index_objects
+from .serializers import StudentImportSerializer
+
+
+ROSTER_FORMATS = ('csv', 'ndjson')
+
+
+def roster_format(filename):
+    """Guess a roster's format from its file name."""
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_roster(stream, file_format):
+    """
+    Iterate (line number, row) pairs from a binary roster stream. Rows
+    are dicts, or None for NDJSON lines that are not JSON objects.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'ndjson':
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+        else:
+            reader = csv.DictReader(text)
+            for row in reader:
+                # Blank cells, and cells missing from short rows, take the field's default
+                yield reader.line_num, {
+                    key.strip(): value.strip()
+                    for key, value in row.items()
+                    if key is not None and value is not None and value.strip()
+                }
+    finally:
+        # Leave the stream open for the caller
+        text.detach()
+
+
+def roster_exceeds(stream, file_format, limit):
+    """Whether a seekable roster stream has more than limit rows. It is rewound."""
+    rows = read_roster(stream, file_format)
+    try:
+        return next(itertools.islice(rows, limit, None), None) is not None
+    finally:
+        rows.close()
+        stream.seek(0)
+
+
+class ImportReport:
+    """Counts, timing and per-row errors of one import."""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.created / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'rejected': len(self.errors),
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+class StudentImporter:
+    """
+    Imports student users and their profiles from roster rows.
+    workers is the number of password hashing processes; 0 hashes in
+    the importing process.
+    """
+
+    def __init__(self, batch_size=None, workers=None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.workers = settings.IMPORT_HASH_WORKERS if workers is None else workers
+
+    @contextmanager
+    def password_hasher(self):
+        if not self.workers:
+            yield lambda passwords: [make_password(password) for password in passwords]
+            return
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as pool:
+            yield lambda passwords: list(pool.map(
+                make_password, passwords,
+                chunksize=max(1, len(passwords) // (self.workers * 4)),
+            ))
+
+    def run(self, rows):
+        report = ImportReport()
+        with self.password_hasher() as hash_passwords:
+            for batch in chunked(rows, self.batch_size):
+                self.import_batch(batch, hash_passwords, report)
+        report.finish()
+        return report
+
+    def validate_batch(self, batch, report):
+        serializer = StudentImportSerializer()
+        valid = []
+        for line, row in batch:
+            if row is None:
+                report.reject(line, {'non_field_errors': ['Line is not a JSON object.']})
+                continue
+            try:
+                valid.append((line, serializer.run_validation(row)))
+            except ValidationError as exc:
+                report.reject(line, exc.detail)
+
+        # Earlier batches are committed, so the database covers them too
+        taken_usernames = set(User.objects.filter(
+            username__in=[attrs['username'] for _, attrs in valid]
+        ).values_list('username', flat=True))
+        taken_emails = set(User.objects.filter(
+            email__in=[attrs['email'] for _, attrs in valid]
+        ).values_list('email', flat=True))
+
+        unique = []
+        for line, attrs in valid:
+            errors = {}
+            if attrs['username'] in taken_usernames:
+                errors['username'] = ['A user with that username already exists.']
+            if attrs['email'] in taken_emails:
+                errors['email'] = ['A user with that email already exists.']
+            taken_usernames.add(attrs['username'])
+            taken_emails.add(attrs['email'])
+            if errors:
+                report.reject(line, errors)
+            else:
+                unique.append((line, attrs))
+        return unique
+
+    def import_batch(self, batch, hash_passwords, report):
+        rows = self.validate_batch(batch, report)
+        if not rows:
+            return
+        passwords = [attrs.get('password') for _, attrs in rows]
+        hashed = iter(hash_passwords([password for password in passwords if password]))
+        users = [
+            User(
+                username=attrs['username'],
+                email=attrs['email'],
+                password=next(hashed) if password else make_password(None),
+                first_name=attrs['first_name'],
+                last_name=attrs['last_name'],
+                role='student',
+            )
+            for (_, attrs), password in zip(rows, passwords)
+        ]
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                profiles = StudentProfile.objects.bulk_create(
+                    StudentProfile(
+                        user=user,
+                        enrollment_number=f"ENR{user.id:06d}",
+                        date_of_birth=attrs['date_of_birth'],
+                        phone_number=attrs['phone_number'],
+                        address=attrs['address'],
+                    )
+                    for user, (_, attrs) in zip(users, rows)
+                )
+                index_objects(User, [user.pk for user in users])
+                index_objects(StudentProfile, [profile.pk for profile in profiles])
+        except DatabaseError as exc:
+            # A concurrent write took a username or email; the batch is rolled back
+            for line, _ in rows:
+                report.reject(line, {'non_field_errors': [f'Batch could not be saved: {exc}']})
+            return
+
+        report.created += len(users)
+
+
+def import_students(stream, file_format, batch_size=None, workers=None):
+    """Import a roster stream and return its ImportReport."""
+    return StudentImporter(batch_size, workers).run(read_roster(stream, file_format))
@@ -0,0 +1,104 @@
+"""
+Write-behind last_login updates for token logins.
+
+Instead of saving the user on every login, record_login() keeps the time
+in a per-process buffer, and flush_logins() writes the buffered users
+with one UPDATE ... CASE statement per LAST_LOGIN_BATCH_SIZE users. The
+buffer is flushed at the end of the first request that finds its oldest
+entry LAST_LOGIN_FLUSH_INTERVAL seconds old, and when the process exits.
+
+Times are truncated to LAST_LOGIN_PRECISION seconds, and a login that
+leaves the stored, truncated time unchanged is not buffered at all. A
+killed process loses up to one interval of logins; a flush interval of
+0 saves the user on each login instead.
+"""
+import atexit
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.signals import request_finished
+from django.db.models import Case, DateTimeField, Value, When
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import User
+
+
+_lock = threading.Lock()
+# user id -> last login time
+_pending = {}
+# time.monotonic() of the oldest pending login
+_pending_since = None
+
+
+def truncate_login_time(value):
+    """value rounded down to LAST_LOGIN_PRECISION seconds."""
+    precision = settings.LAST_LOGIN_PRECISION
+    if value is None or precision <= 1:
+        return value
+    return value - timedelta(seconds=value.timestamp() % precision)
+
+
+def record_login(user):
+    """Record that the user just logged in, writing it now or on a later flush."""
+    if not settings.LAST_LOGIN_FLUSH_INTERVAL:
+        update_last_login(None, user)
+        return
+    global _pending_since
+    now = truncate_login_time(timezone.now())
+    if truncate_login_time(user.last_login) == now:
+        return
+    user.last_login = now
+    with _lock:
+        if not _pending:
+            _pending_since = time.monotonic()
+        _pending[user.pk] = now
+
+
+def pending_logins():
+    """Number of buffered logins not yet written."""
+    return len(_pending)
+
+
+def flush_logins():
+    """Write every buffered login, returning the number of users updated."""
+    global _pending_since
+    with _lock:
+        pending = list(_pending.items())
+        _pending.clear()
+        _pending_since = None
+    # Saves are skipped, and so are cache version bumps (the base manager's
+    # update() does none): no list count, search document, cached account
+    # or cached payload reads last_login
+    size = settings.LAST_LOGIN_BATCH_SIZE
+    for start in range(0, len(pending), size):
+        batch = pending[start:start + size]
+        User._base_manager.filter(pk__in=[pk for pk, _ in batch]).update(
+            last_login=Case(*(When(pk=pk, then=Value(value)) for pk, value in batch), output_field=DateTimeField())
+        )
+    return len(pending)
+
+
+def discard_logins():
+    """Drop every buffered login without writing it."""
+    global _pending_since
+    with _lock:
+        _pending.clear()
+        _pending_since = None
+
+
+@receiver(request_finished)
+def flush_due_logins(sender, **kwargs):
+    """
+    Flush the buffer once its oldest login is LAST_LOGIN_FLUSH_INTERVAL
+    seconds old.
+    """
+    since = _pending_since
+    if since is not None and time.monotonic() - since >= settings.LAST_LOGIN_FLUSH_INTERVAL:
+        flush_logins()
+
+
+atexit.register(flush_logins)
@@ -0,0 +1,133 @@
+"""
+Typeahead lookups of students (by enrollment number or username) and
+courses (by code).
+
+Each process keeps a sorted array of (key, id, label) entries per kind
+and answers a prefix with two bisections, without touching the database.
+An index is built on first use and rebuilt when the count versions of
+the tables it reads change (see counts.py), so saves, deletes and bulk
+writes all refresh it.
+
+Results are limited to the rows the kind's list endpoint would show the
+user: the view passes that viewset's get_queryset() as the scope, and
+the ids it allows are kept per process under the query's versioned
+cache key.
+"""
+from bisect import bisect_left
+
+from django.core.exceptions import EmptyResultSet
+
+from .counts import query_key, table_versions
+from .models import Course, StudentProfile
+
+
+class PrefixIndex:
+    """Sorted (key, id, label) entries, searchable by key prefix."""
+
+    def __init__(self, entries):
+        self.entries = sorted(entries)
+        self.keys = [key for key, _, _ in self.entries]
+        self.by_id = {}
+        for entry in self.entries:
+            self.by_id.setdefault(entry[1], []).append(entry)
+        # versioned scope query key -> allowed ids
+        self.scopes = {}
+
+    def search(self, prefix, limit, allowed=None):
+        """
+        Up to limit entries whose key starts with prefix, in key order,
+        one per id. allowed restricts the ids; None allows every id.
+        """
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        matches = (self.entries[i] for i in range(start, end))
+        if allowed is None:
+            candidates = matches
+        elif len(allowed) < end - start:
+            # Fewer allowed ids than matches: check their own keys instead
+            candidates = sorted(
+                entry
+                for pk in allowed
+                for entry in self.by_id.get(pk, ())
+                if entry[0].startswith(prefix)
+            )
+        else:
+            candidates = (entry for entry in matches if entry[1] in allowed)
+
+        results = {}
+        for key, pk, label in candidates:
+            results.setdefault(pk, (key, pk, label))
+            if len(results) == limit:
+                break
+        return list(results.values())
+
+
+class LookupKind:
+    """A kind of lookup and the per-process index answering it."""
+
+    # Cached scopes per index; all are dropped past this many
+    max_scopes = 256
+
+    def __init__(self, name, tables):
+        self.name = name
+        self.tables = tables
+        self.versions = None
+        self.index = None
+
+    def entries(self):
+        raise NotImplementedError
+
+    def get_index(self):
+        versions = table_versions(self.tables)
+        if versions != self.versions:
+            self.index, self.versions = PrefixIndex(self.entries()), versions
+        return self.index
+
+    def allowed_ids(self, index, scope):
+        """Ids in the scope queryset, or None when it is unfiltered."""
+        if not scope.query.has_filters():
+            return None
+        try:
+            key = query_key(f'lookup:{self.name}', scope)
+        except EmptyResultSet:
+            return frozenset()
+        if key not in index.scopes:
+            if len(index.scopes) >= self.max_scopes:
+                index.scopes.clear()
+            index.scopes[key] = frozenset(scope.values_list('pk', flat=True))
+        return index.scopes[key]
+
+    def lookup(self, prefix, limit, scope):
+        """Up to limit matches of prefix among the rows of the scope queryset."""
+        index = self.get_index()
+        return [
+            {'id': pk, 'key': key, 'label': label}
+            for key, pk, label in index.search(prefix.lower(), limit, self.allowed_ids(index, scope))
+        ]
+
+
+class StudentLookup(LookupKind):
+
+    def entries(self):
+        rows = StudentProfile.objects.values_list(
+            'pk', 'enrollment_number', 'user__username', 'user__first_name', 'user__last_name'
+        )
+        for pk, number, username, first_name, last_name in rows:
+            label = f"{number} {f'{first_name} {last_name}'.strip() or username}"
+            yield number.lower(), pk, label
+            yield username.lower(), pk, label
+
+
+class CourseLookup(LookupKind):
+
+    def entries(self):
+        for pk, code, title in Course.objects.values_list('pk', 'code', 'title'):
+            yield code.lower(), pk, f'{code} {title}'
+
+
+LOOKUP_KINDS = {
+    kind.name: kind for kind in [
+        StudentLookup('students', ['student_profiles', 'users']),
+        CourseLookup('courses', ['courses']),
+    ]
+}
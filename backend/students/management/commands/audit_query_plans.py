@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from students.audit import PERSONAS, audit_viewsets, existing_personas, markdown_report, seed_audit_data
+from students.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every API viewset as an admin, a teacher and a student with '
+        'each filter and ordering, EXPLAIN the queries, and report full scans, '
+        'sorts outside an index and N+1 query patterns. Sample rows are created '
+        'inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json',
+            default='query_plan_audit.json',
+            help='JSON report path (default: query_plan_audit.json)',
+        )
+        parser.add_argument(
+            '--markdown',
+            default='query_plan_audit.md',
+            help='Markdown report path (default: query_plan_audit.md)',
+        )
+        parser.add_argument(
+            '--students',
+            type=int,
+            default=2000,
+            help='Sample students to create, each with five enrollments and grades (default: 2000)',
+        )
+        parser.add_argument(
+            '--existing',
+            action='store_true',
+            help='Audit the existing data instead of sample rows',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['existing']:
+                personas = existing_personas()
+                missing = [role for role in PERSONAS if role not in personas]
+                if missing:
+                    raise CommandError(f"No active {', '.join(missing)} user to audit as")
+            else:
+                self.stdout.write(f"Creating {options['students']} sample students...")
+                personas = seed_audit_data(options['students'])
+            entries = audit_viewsets(router.registry, personas)
+            transaction.set_rollback(True)
+
+        with open(options['json'], 'w') as file:
+            json.dump(entries, file, indent=2)
+        report = markdown_report(entries)
+        with open(options['markdown'], 'w') as file:
+            file.write(report)
+
+        flagged = sum(bool(entry['flags']) for entry in entries)
+        self.stdout.write(
+            f"Audited {len(entries)} requests, {flagged} flagged. "
+            f"Reports written to {options['json']} and {options['markdown']}"
+        )
@@ -0,0 +1,104 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from students.compiled import compile_serializer
+from students.models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
+from students.projection import serializer_projection
+from students.serializers import GradeSerializer, EnrollmentSerializer
+
+
+EXPAND = ('student_detail', 'course_detail.teacher_detail', 'teacher_detail')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare list serialization throughput of the DRF serializers and the '
+        'compiled read path. Sample rows are created inside a transaction that '
+        'is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Row counts to benchmark (default: 1000 10000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per measurement; the fastest is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_rows(max(options['rows']))
+            for serializer_class in (GradeSerializer, EnrollmentSerializer):
+                for expand in ((), EXPAND):
+                    if expand and serializer_class is EnrollmentSerializer:
+                        expand = ('student_detail', 'course_detail.teacher_detail')
+                    for rows in options['rows']:
+                        self.benchmark(serializer_class, expand, rows, options['repeat'])
+            transaction.set_rollback(True)
+
+    def benchmark(self, serializer_class, expand, rows, repeat):
+        model = serializer_class.Meta.model
+        serializer = serializer_class(expand=list(expand))
+        only, related = serializer_projection(serializer, model)
+        queryset = model.objects.select_related(*related).only(*only)
+        plan = compile_serializer(serializer_class, None, expand)
+
+        def serialize():
+            return serializer_class(queryset[:rows], many=True, expand=list(expand)).data
+
+        def compiled():
+            return plan.render(model.objects.values_list(*plan.lookups)[:rows])
+
+        serializer_time = self.fastest(serialize, repeat)
+        compiled_time = self.fastest(compiled, repeat)
+        label = f"{serializer_class.__name__} expand={','.join(expand) or '-'} rows={rows}"
+        self.stdout.write(
+            f'{label}: serializer {rows / serializer_time:,.0f} rows/s, '
+            f'compiled {rows / compiled_time:,.0f} rows/s '
+            + self.style.SUCCESS(f'({serializer_time / compiled_time:.1f}x)')
+        )
+
+    def fastest(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def create_rows(self, count):
+        self.stdout.write(f'Creating {count} grades and enrollments...')
+        teacher_user = User.objects.create(
+            username='benchmark-teacher', email='benchmark-teacher@example.com', role='teacher'
+        )
+        teacher = TeacherProfile.objects.get_or_create(user=teacher_user)[0]
+        courses = Course.objects.bulk_create(
+            Course(code=f'BENCH{i:03d}', title=f'Benchmark course {i}', teacher=teacher)
+            for i in range(10)
+        )
+        users = User.objects.bulk_create(
+            User(username=f'benchmark{i}', email=f'benchmark{i}@example.com', role='student')
+            for i in range(count)
+        )
+        students = StudentProfile.objects.bulk_create(
+            StudentProfile(user=user, enrollment_number=f'BENCH{i:07d}', date_of_birth=date(2000, 1, 1))
+            for i, user in enumerate(users)
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(student=student, course=courses[i % len(courses)])
+            for i, student in enumerate(students)
+        )
+        Grade.objects.bulk_create(
+            Grade(student=student, course=courses[i % len(courses)], teacher=teacher, value='ABCDF'[i % 5])
+            for i, student in enumerate(students)
+        )
@@ -0,0 +1,148 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from students.logins import flush_logins
+from students.models import User
+from students.token_serializers import CustomTokenObtainPairView
+from students.views import current_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare token login throughput, and the latency of other API calls '
+        'made meanwhile, with many logins at once: with last_login saved on '
+        'each login, written behind in batches, and with password hashing '
+        'unbounded or on the hash pool. Sample users are committed '
+        '(concurrent logins need their own connections) and deleted '
+        'afterwards. Passwords use a fast hasher, and the hash pool is left '
+        'out, unless --real-hasher is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=500,
+            help='Users logging in, once each (default: 500)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=500,
+            help='Threads logging in at the same time (default: 500)',
+        )
+        parser.add_argument(
+            '--real-hasher',
+            action='store_true',
+            help='Hash with PASSWORD_HASHERS instead of MD5, to measure hashing too',
+        )
+
+    def handle(self, *args, **options):
+        hashers = settings.PASSWORD_HASHERS
+        if not options['real_hasher']:
+            hashers = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        unbounded = {'PASSWORD_HASH_WORKERS': options['concurrency'], 'PASSWORD_HASH_QUEUE_DEPTH': 0}
+        rounds = [
+            ('save per login', {'LAST_LOGIN_FLUSH_INTERVAL': 0, **unbounded}),
+            ('write-behind', unbounded),
+        ]
+        if options['real_hasher']:
+            # The pool only matters when hashing is most of a login's work
+            rounds.append(('hash pool', {}))
+        with override_settings(PASSWORD_HASHERS=hashers):
+            password = make_password('benchmark')
+            admin = User.objects.create(
+                username='loginbench-admin', email='loginbench-admin@example.com', role='admin'
+            )
+            User.objects.bulk_create(
+                User(username=f'loginbench{i}', email=f'loginbench{i}@example.com', role='admin', password=password)
+                for i in range(options['logins'])
+            )
+            try:
+                for label, overrides in rounds:
+                    User.objects.filter(username__startswith='loginbench').update(last_login=None)
+                    with override_settings(**overrides):
+                        self.report(label, *self.run(options['logins'], options['concurrency'], admin))
+            finally:
+                User.objects.filter(username__startswith='loginbench').delete()
+
+    def run(self, logins, concurrency, admin):
+        view = CustomTokenObtainPairView.as_view()
+        factory = APIRequestFactory()
+        usernames = [f'loginbench{i}' for i in range(logins)]
+        latencies, failures, probes = [], [], []
+        start_gate = threading.Barrier(concurrency + 1)
+        done = threading.Event()
+
+        def worker(names):
+            start_gate.wait()
+            try:
+                for name in names:
+                    request = factory.post(
+                        '/api/v1/token/', {'username': name, 'password': 'benchmark'}, format='json',
+                        HTTP_HOST='localhost'
+                    )
+                    started = time.perf_counter()
+                    try:
+                        response = view(request)
+                        response.render()
+                        if response.status_code != 200:
+                            failures.append(response.status_code)
+                    except Exception as exc:
+                        failures.append(type(exc).__name__)
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        def probe():
+            # Another API call, made over and over while the logins run
+            start_gate.wait()
+            try:
+                while not done.is_set():
+                    request = factory.get('/api/v1/me/', HTTP_HOST='localhost')
+                    force_authenticate(request, user=admin)
+                    started = time.perf_counter()
+                    current_user(request).render()
+                    probes.append(time.perf_counter() - started)
+                    time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(usernames[i::concurrency],)) for i in range(concurrency)]
+        prober = threading.Thread(target=probe)
+        prober.start()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        prober.join()
+
+        flush_started = time.perf_counter()
+        flushed = flush_logins()
+        flush = time.perf_counter() - flush_started
+        return elapsed, latencies, failures, probes, flushed, flush
+
+    def report(self, label, elapsed, latencies, failures, probes, flushed, flush):
+        succeeded = len(latencies) - len(failures)
+        quantiles = statistics.quantiles(latencies, n=20)
+        line = (
+            f'{label:>15}: {succeeded / elapsed:8.1f} logins/s, '
+            f'p50 {quantiles[9] * 1000:7.1f} ms, p95 {quantiles[18] * 1000:7.1f} ms, '
+            f'{len(failures)} failed'
+        )
+        if len(probes) >= 2:
+            line += f'; /me/ p95 {statistics.quantiles(probes, n=20)[18] * 1000:.1f} ms over {len(probes)} calls'
+        if flushed:
+            line += f'; flushed {flushed} users in {flush * 1000:.1f} ms'
+        self.stdout.write(line)
@@ -0,0 +1,106 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from students.models import User, StudentProfile, Course, Grade
+from students.pagination import KeysetPagination
+from students.views import GradeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the latency of deep grade list pages with keyset cursors and '
+        'page numbers. Sample rows are created inside a transaction that is '
+        'rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            nargs='+',
+            default=[1, 10, 100, 1000, 10000],
+            help='Page numbers to fetch (default: 1 10 100 1000 10000)',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=10,
+            help='Rows per page (default: 10)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Requests per measurement; the fastest is reported (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        with transaction.atomic():
+            admin = User.objects.create(username='benchmark-admin', email='benchmark-admin@example.com', role='admin')
+            self.create_grades(max(options['pages']) * page_size)
+            view = GradeViewSet.as_view({'get': 'list'})
+            factory = APIRequestFactory()
+
+            def fetch(params):
+                request = factory.get(
+                    '/api/v1/grades/', {'page_size': page_size, 'fields': 'id', **params}, HTTP_HOST='localhost'
+                )
+                force_authenticate(request, user=admin)
+                response = view(request)
+                response.render()
+                assert response.status_code == 200, response.content
+
+            for page in options['pages']:
+                cursor = self.cursor_for(page, page_size)
+                keyset = self.fastest(lambda: fetch({'cursor': cursor} if cursor else {}), options['repeat'])
+                numbered = self.fastest(lambda: fetch({'page': page}), options['repeat'])
+                self.stdout.write(
+                    f'page {page:>6}: cursor {keyset * 1000:8.2f} ms, '
+                    f'page number {numbered * 1000:8.2f} ms'
+                )
+            transaction.set_rollback(True)
+
+    def cursor_for(self, page, page_size):
+        """The cursor a client following next links would hold for the page."""
+        if page == 1:
+            return None
+        previous_row = Grade.objects.order_by('-graded_at', '-pk').values_list('graded_at', 'pk')[
+            (page - 1) * page_size - 1
+        ]
+        paginator = KeysetPagination()
+        paginator.keys = [('graded_at', True), ('pk', True)]
+        return paginator.encode_cursor(previous_row, False)
+
+    def fastest(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def create_grades(self, count):
+        self.stdout.write(f'Creating {count} grades...')
+        courses = Course.objects.bulk_create(
+            Course(code=f'PAGE{i:03d}', title=f'Pagination course {i}') for i in range(100)
+        )
+        users = User.objects.bulk_create(
+            User(username=f'pagination{i}', email=f'pagination{i}@example.com', role='student')
+            for i in range(-(-count // len(courses)))
+        )
+        students = StudentProfile.objects.bulk_create(
+            StudentProfile(user=user, enrollment_number=f'PAGE{i:07d}', date_of_birth=date(2000, 1, 1))
+            for i, user in enumerate(users)
+        )
+        Grade.objects.bulk_create(
+            (
+                Grade(student=students[i // len(courses)], course=courses[i % len(courses)], value='ABCDF'[i % 5])
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from students.models import User
+from students.search import index_objects
+from students.views import UserViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ?search= latency on the user list with icontains lookups and '
+        'with the search index. Sample users are created inside a transaction '
+        'that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100000,
+            help='Sample users to create (default: 100000)',
+        )
+        parser.add_argument(
+            '--terms',
+            nargs='+',
+            default=['searchuser4242', 'Quinn', 'zz-no-match', 'example.com'],
+            help='Search terms to time',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Requests per measurement; the fastest is reported (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            admin = User.objects.create(username='benchmark-admin', email='benchmark-admin@example.com', role='admin')
+            self.create_users(options['users'])
+            factory = APIRequestFactory()
+
+            def fetch(view, term):
+                request = factory.get(
+                    '/api/v1/users/', {'search': term, 'page_size': 20, 'fields': 'id'}, HTTP_HOST='localhost'
+                )
+                force_authenticate(request, user=admin)
+                response = view(request)
+                response.render()
+                assert response.status_code == 200, response.content
+
+            indexed = UserViewSet.as_view({'get': 'list'})
+            icontains = UserViewSet.as_view({'get': 'list'}, filter_backends=[SearchFilter])
+            for term in options['terms']:
+                scan = self.fastest(lambda: fetch(icontains, term), options['repeat'])
+                index = self.fastest(lambda: fetch(indexed, term), options['repeat'])
+                self.stdout.write(f'{term!r:>18}: icontains {scan * 1000:8.2f} ms, index {index * 1000:8.2f} ms')
+            transaction.set_rollback(True)
+
+    def fastest(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def create_users(self, count):
+        self.stdout.write(f'Creating and indexing {count} users...')
+        names = ['Avery', 'Blake', 'Casey', 'Devon', 'Emery', 'Finley', 'Harper', 'Jordan', 'Morgan', 'Quinn']
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'searchuser{i}',
+                    email=f'searchuser{i}@example.com',
+                    first_name=names[i % len(names)],
+                    last_name=names[i // len(names) % len(names)],
+                    role='admin',
+                )
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
+        index_objects(User, User.objects.filter(username__startswith='searchuser').values('pk'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from students.imports import ROSTER_FORMATS, import_students, roster_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Import student users and profiles from a CSV or NDJSON roster with '
+        'username, email, password, first_name, last_name, date_of_birth, '
+        'phone_number and address fields'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Roster file to import')
+        parser.add_argument(
+            '--format',
+            choices=ROSTER_FORMATS,
+            help='Roster format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows inserted per transaction (default: IMPORT_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Password hashing processes (default: IMPORT_HASH_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or roster_format(path)
+        try:
+            stream = open(path, 'rb')
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+        self.stdout.write(f'Importing {file_format} roster {path}...')
+        with stream:
+            report = import_students(stream, file_format, options['batch_size'], options['workers'])
+
+        for error in report.errors:
+            self.stdout.write(self.style.ERROR(f"✗ line {error['line']}: {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Imported {report.created} students in {report.seconds:.1f}s '
+            f'({report.rows_per_second:,.0f} rows/s), {len(report.errors)} rejected'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from students.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of users, students, teachers and courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database whose index to rebuild (default: default)',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            counts = rebuild_index(options['database'])
+        if counts is None:
+            raise CommandError('This database has no search index; ?search= uses icontains lookups.')
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count} documents')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from students.visibility import rebuild_visibility
+
+
+class Command(BaseCommand):
+    help = 'Recompute which students each teacher can see from the enrollments in their courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database whose visibility table to rebuild (default: default)',
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_visibility(options['database'])
+        self.stdout.write(f'{rows} teacher-student pairs')
+        self.stdout.write(self.style.SUCCESS('Teacher visibility rebuilt'))
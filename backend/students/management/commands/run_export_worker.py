@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from students.exports import claim_next_job, run_export_job
+from students.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = 'Process queued export jobs, writing each export to disk in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently queued and exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Export worker started')
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Running {job}...')
+            job = run_export_job(job)
+            if job.status == ExportJob.STATUS_COMPLETED:
+                self.stdout.write(self.style.SUCCESS(f'✓ {job} wrote {job.row_count} rows'))
+            else:
+                self.stdout.write(self.style.ERROR(f'✗ {job}: {job.error}'))
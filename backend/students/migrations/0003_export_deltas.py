@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_export_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='grade',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='teacherprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ExportTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('students', 'Students'), ('grades', 'Grades')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('course_id', models.BigIntegerField(blank=True, help_text='Course of a deleted grade, for course-filtered exports', null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'export_tombstones',
+                'ordering': ['deleted_at'],
+                'indexes': [models.Index(fields=['kind', 'deleted_at'], name='export_tomb_kind_9fa290_idx')],
+            },
+        ),
+    ]
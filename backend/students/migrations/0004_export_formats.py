@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_export_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('csv.gz', 'CSV (gzip)'), ('ndjson', 'NDJSON'), ('ndjson.gz', 'NDJSON (gzip)'), ('xlsx', 'Excel (XLSX)')], default='csv', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('students', 'Students'), ('grades', 'Grades'), ('courses', 'Courses'), ('enrollments', 'Enrollments')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='exporttombstone',
+            name='course_id',
+            field=models.BigIntegerField(blank=True, help_text='Course of a deleted grade or enrollment, for course-filtered exports', null=True),
+        ),
+        migrations.AlterField(
+            model_name='exporttombstone',
+            name='kind',
+            field=models.CharField(choices=[('students', 'Students'), ('grades', 'Grades'), ('courses', 'Courses'), ('enrollments', 'Enrollments')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_export_formats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['enrolled_at', 'id'], name='enrollments_enrolle_13a894_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['graded_at', 'id'], name='grades_graded__c77608_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE search_index USING fts5("
+    "kind, document, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+]
+
+POSTGRESQL_CREATE = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE TABLE search_index ('
+    'id bigint PRIMARY KEY, kind varchar(16) NOT NULL, document text NOT NULL, '
+    "vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', document)) STORED)",
+    'CREATE INDEX search_index_vector ON search_index USING gin (vector)',
+    'CREATE INDEX search_index_document_trgm ON search_index USING gin (document gin_trgm_ops)',
+    'CREATE INDEX search_index_kind ON search_index (kind)',
+]
+
+# (rowid or id, kind, document) for every existing row; index keys are
+# object id * 8 + the kind's code, as in students.search
+SQLITE_POPULATE = """
+INSERT INTO search_index (rowid, kind, document)
+SELECT id * 8 + 1, 'users', username || ' ' || email || ' ' || first_name || ' ' || last_name FROM users
+UNION ALL
+SELECT p.id * 8 + 2, 'students', p.enrollment_number || ' ' || u.username || ' ' || u.email
+FROM student_profiles p JOIN users u ON u.id = p.user_id
+UNION ALL
+SELECT p.id * 8 + 3, 'teachers', u.username || ' ' || u.email || ' ' || p.department
+FROM teacher_profiles p JOIN users u ON u.id = p.user_id
+UNION ALL
+SELECT id * 8 + 4, 'courses', title || ' ' || code || ' ' || description FROM courses
+"""
+
+POSTGRESQL_POPULATE = """
+INSERT INTO search_index (id, kind, document)
+SELECT id * 8 + 1, 'users', concat_ws(' ', username, email, first_name, last_name) FROM users
+UNION ALL
+SELECT p.id * 8 + 2, 'students', concat_ws(' ', p.enrollment_number, u.username, u.email)
+FROM student_profiles p JOIN users u ON u.id = p.user_id
+UNION ALL
+SELECT p.id * 8 + 3, 'teachers', concat_ws(' ', u.username, u.email, p.department)
+FROM teacher_profiles p JOIN users u ON u.id = p.user_id
+UNION ALL
+SELECT id * 8 + 4, 'courses', concat_ws(' ', title, code, description) FROM courses
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_CREATE + [SQLITE_POPULATE]
+    elif vendor == 'postgresql':
+        statements = POSTGRESQL_CREATE + [POSTGRESQL_POPULATE]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'enrolled_at', 'id'], name='enrollments_course__2bb89f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['course', 'graded_at', 'id'], name='grades_course__25aa06_idx'),
+        ),
+    ]
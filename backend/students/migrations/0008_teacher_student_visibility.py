@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POPULATE = """
+INSERT INTO teacher_student_visibility (teacher_id, student_id, enrollment_count)
+SELECT c.teacher_id, e.student_id, COUNT(*)
+FROM enrollments e JOIN courses c ON c.id = e.course_id
+WHERE c.teacher_id IS NOT NULL
+GROUP BY c.teacher_id, e.student_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_course_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherStudentVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_count', models.PositiveIntegerField(default=0, help_text="Number of the student's enrollments in the teacher's courses")),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teacher_visibility', to='students.studentprofile')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_visibility', to='students.teacherprofile')),
+            ],
+            options={
+                'db_table': 'teacher_student_visibility',
+                'unique_together': {('teacher', 'student')},
+            },
+        ),
+        migrations.RunSQL(POPULATE, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:37
+
+import students.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_teacher_student_visibility'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', students.models.VersionedUserManager()),
+            ],
+        ),
+    ]
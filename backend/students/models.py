@@ -1,18 +1,93 @@
+import copy
+
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import RegexValidator
 
+from .versions import VersionedQuerySet
+
+
+class DirtyFieldsMixin:
+    """
+    Model mixin that remembers the values an instance was loaded or last
+    saved with. save() without update_fields then writes only the changed
+    columns (and auto_now timestamps), and does nothing, sending no
+    signals, when no column changed.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values()
+        return instance
+    
+    def _remember_values(self, names=None):
+        # Deferred fields are not in __dict__ and stay unknown until loaded;
+        # mutable values (JSON) are copied so in-place changes show
+        loaded = getattr(self, '_loaded_values', None) or {}
+        for field in self._meta.concrete_fields:
+            if (names is None or {field.name, field.attname} & names) and field.attname in self.__dict__:
+                loaded[field.attname] = copy.deepcopy(self.__dict__[field.attname])
+        self._loaded_values = loaded
+    
+    def loaded_values(self, *attnames):
+        """The stored values of the given columns, or None if any is unknown."""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None or not all(name in loaded for name in attnames):
+            return None
+        return tuple(loaded[name] for name in attnames)
+    
+    def dirty_fields(self):
+        """
+        Names of the fields changed since the instance was loaded or saved,
+        or None for an instance not in the database yet.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return None
+        return {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        }
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        self._remember_values(None if fields is None else set(fields))
+    
+    def save(self, *args, **kwargs):
+        dirty = self.dirty_fields()
+        tracked = (
+            dirty is not None and not args and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert') and kwargs.get('using', self._state.db) == self._state.db
+            and self._meta.pk.name not in dirty
+        )
+        if tracked:
+            if not dirty:
+                return
+            auto_now = {field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)}
+            kwargs['update_fields'] = dirty | auto_now
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._remember_values(None if update_fields is None else set(update_fields))
+
 
-class TimeStampedModel(models.Model):
+class TimeStampedModel(DirtyFieldsMixin, models.Model):
     """Abstract base model with created_at and updated_at timestamps."""
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = VersionedQuerySet.as_manager()
 
     class Meta:
         abstract = True
 
 
-class User(AbstractUser):
+class VersionedUserManager(UserManager.from_queryset(VersionedQuerySet)):
+    """UserManager whose bulk writes bump cache versions."""
+
+
+class User(DirtyFieldsMixin, AbstractUser):
     """Custom User model with role-based access control."""
     
     ROLE_CHOICES = [
@@ -30,6 +105,10 @@ class User(AbstractUser):
     )
     email = models.EmailField(unique=True)
     
+    objects = VersionedUserManager()
+    # Cache version scopes of a row (see versions.py): kind -> attname
+    version_scopes = {'user': 'id'}
+    
     class Meta:
         db_table = 'users'
         ordering = ['-date_joined']
@@ -65,6 +144,8 @@ class StudentProfile(TimeStampedModel):
     )
     address = models.TextField(blank=True)
     
+    version_scopes = {'student': 'id', 'user': 'user_id'}
+    
     class Meta:
         db_table = 'student_profiles'
         ordering = ['enrollment_number']
@@ -88,6 +169,8 @@ class TeacherProfile(TimeStampedModel):
         help_text='Academic department'
     )
     
+    version_scopes = {'teacher': 'id', 'user': 'user_id'}
+    
     class Meta:
         db_table = 'teacher_profiles'
         ordering = ['user__username']
@@ -118,6 +201,8 @@ class Course(TimeStampedModel):
         help_text='Whether the course is currently active'
     )
     
+    version_scopes = {'course': 'id', 'teacher': 'teacher_id'}
+    
     class Meta:
         db_table = 'courses'
         ordering = ['code']
@@ -141,10 +226,17 @@ class Enrollment(TimeStampedModel):
     )
     enrolled_at = models.DateTimeField(auto_now_add=True)
     
+    version_scopes = {'course': 'course_id', 'student': 'student_id'}
+    
     class Meta:
         db_table = 'enrollments'
         unique_together = [['student', 'course']]
         ordering = ['-enrolled_at']
+        # Serve keyset pages in the default ordering, overall and per course
+        indexes = [
+            models.Index(fields=['enrolled_at', 'id']),
+            models.Index(fields=['course', 'enrolled_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.student.user.username} enrolled in {self.course.code}"
@@ -185,11 +277,155 @@ class Grade(TimeStampedModel):
     )
     graded_at = models.DateTimeField(auto_now=True)
     
+    version_scopes = {'course': 'course_id', 'student': 'student_id', 'teacher': 'teacher_id'}
+    
     class Meta:
         db_table = 'grades'
         unique_together = [['student', 'course']]
         ordering = ['-graded_at']
+        # Serve keyset pages in the default ordering, overall and per course
+        indexes = [
+            models.Index(fields=['graded_at', 'id']),
+            models.Index(fields=['course', 'graded_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.student.user.username} - {self.course.code}: {self.value}"
 
+
+
+class ExportJob(TimeStampedModel):
+    """Export queued by an admin and written to disk by the export worker."""
+    
+    KIND_CHOICES = [
+        ('students', 'Students'),
+        ('grades', 'Grades'),
+        ('courses', 'Courses'),
+        ('enrollments', 'Enrollments'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('csv.gz', 'CSV (gzip)'),
+        ('ndjson', 'NDJSON'),
+        ('ndjson.gz', 'NDJSON (gzip)'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+    
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file_format = models.CharField(
+        max_length=10,
+        choices=FORMAT_CHOICES,
+        default='csv'
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Export filters, e.g. {"course_id": 1}'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='export_jobs'
+    )
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    file_name = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'export_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} export #{self.pk} ({self.status})"
+    
+    @property
+    def progress(self):
+        """Fraction of rows written, between 0 and 1."""
+        if self.status == self.STATUS_COMPLETED:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.row_count / self.total_rows, 1.0)
+
+
+class ExportTombstone(models.Model):
+    """Record of a deleted exported row, reported by delta exports."""
+    
+    KIND_CHOICES = ExportJob.KIND_CHOICES
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    course_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text='Course of a deleted grade or enrollment, for course-filtered exports'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = VersionedQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'export_tombstones'
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} deleted at {self.deleted_at}"
+
+
+class TeacherStudentVisibility(models.Model):
+    """
+    Students each teacher can see: one row per teacher and student enrolled
+    in at least one of the teacher's courses, counting those enrollments.
+    Maintained from enrollment and course writes (see visibility.py).
+    """
+    
+    teacher = models.ForeignKey(
+        TeacherProfile,
+        on_delete=models.CASCADE,
+        related_name='student_visibility'
+    )
+    student = models.ForeignKey(
+        StudentProfile,
+        on_delete=models.CASCADE,
+        related_name='teacher_visibility'
+    )
+    enrollment_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of the student's enrollments in the teacher's courses"
+    )
+    
+    objects = VersionedQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'teacher_student_visibility'
+        unique_together = [['teacher', 'student']]
+    
+    def __str__(self):
+        return f"Teacher #{self.teacher_id} sees student #{self.student_id} ({self.enrollment_count})"
@@ -0,0 +1,243 @@
+"""
+Keyset pagination for list endpoints.
+
+Pages are addressed by an opaque, signed cursor holding the sort key of
+the row they start after, so a page is an indexed range scan no matter
+how deep it is, and no COUNT(*) is run. Rows are ordered by the view's
+ordering (or ?ordering=) with the primary key as tie-breaker.
+
+Keyset pages are opted into with ?cursor= (empty for the first page).
+Other requests, with or without ?page=, get page-number pagination as
+before, with OFFSET paging and a cached, possibly estimated, total
+count, so existing page-number clients keep their response shape.
+"""
+import json
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counts import cached_count
+
+
+CURSOR_SALT = 'students.pagination.cursor'
+
+
+def max_page_size():
+    return settings.REST_FRAMEWORK.get('MAX_PAGE_SIZE', api_settings.PAGE_SIZE)
+
+
+def estimate_count(queryset, limit):
+    """
+    Return (count, exact). Rows are counted exactly up to limit; past
+    that the query planner's estimate is used where the database has
+    one, and limit + 1 otherwise.
+    """
+    count = queryset.order_by()[:limit + 1].count()
+    if count <= limit:
+        return count, True
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = queryset.order_by().explain(format='json')
+        count = max(count, int(json.loads(plan)[0]['Plan']['Plan Rows']))
+    return count, False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the view's ordering.
+    - ?cursor= switches to keyset pages; empty for the first one, then
+      from the next or previous link of a page
+    - ?page_size= picks the page size, up to MAX_PAGE_SIZE
+    - otherwise ?page= (default 1) numbers pages, with an estimated count
+    Ordering fields must not be nullable.
+    """
+    cursor_query_param = 'cursor'
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    # Exact counts in page-number mode stop at this many rows
+    count_limit = 10000
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(page_size, 1), max_page_size())
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ordering as (lookup, descending) pairs ending with the primary key."""
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+        if not ordering:
+            ordering = getattr(view, 'ordering', None) or queryset.model._meta.ordering or []
+        if isinstance(ordering, str):
+            ordering = [ordering]
+
+        keys = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        keys = [('pk' if field in ('id', 'pk') else field, descending) for field, descending in keys]
+        if not any(field == 'pk' for field, _ in keys):
+            keys.append(('pk', keys[-1][1] if keys else False))
+        return keys
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if self.cursor_query_param in request.query_params:
+            return self.paginate_by_cursor(queryset, request, view)
+        return self.paginate_by_page(queryset, request, view)
+
+    # Keyset pagination
+
+    def decode_cursor(self, request, keys):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            cursor = signing.loads(token, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            raise NotFound('Invalid cursor')
+        if cursor.get('o') != [f'{"-" if descending else ""}{field}' for field, descending in keys]:
+            raise NotFound('Invalid cursor')
+        return cursor['k'], cursor.get('r', False)
+
+    def encode_cursor(self, values, reverse):
+        cursor = {
+            'o': [f'{"-" if descending else ""}{field}' for field, descending in self.keys],
+            'k': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values],
+        }
+        if reverse:
+            cursor['r'] = True
+        return signing.dumps(cursor, salt=CURSOR_SALT, compress=True)
+
+    def position_filter(self, values, reverse):
+        """Rows after the given key in the (possibly reversed) ordering."""
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = equal & Q(**{f'{field}__{lookup}': value})
+            condition = clause if not condition else condition | clause
+            equal &= Q(**{field: value})
+        # A bound on the leading key alone lets the database seek an index
+        field, descending = self.keys[0]
+        return Q(**{f"{field}__{'lte' if descending != reverse else 'gte'}": values[0]}) & condition
+
+    def row_key(self, row):
+        if isinstance(row, tuple):
+            return row[-len(self.keys):]
+        return [getattr(row, f'keyset_{index}') for index in range(len(self.keys))]
+
+    def paginate_by_cursor(self, queryset, request, view):
+        self.count = None
+        self.keys = self.get_ordering(request, queryset, view)
+        values, reverse = self.decode_cursor(request, self.keys)
+        if values is not None and len(values) != len(self.keys):
+            raise NotFound('Invalid cursor')
+
+        # Sort keys are annotated so they can be read back from model
+        # instances and value tuples alike (as trailing columns)
+        queryset = queryset.annotate(**{
+            f'keyset_{index}': F(field) for index, (field, _) in enumerate(self.keys)
+        }).order_by(*(
+            f'{"-" if descending != reverse else ""}{field}' for field, descending in self.keys
+        ))
+        if values is not None:
+            queryset = queryset.filter(self.position_filter(values, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(self.row_key(rows[-1]), False)
+            if values is not None and (has_more or not reverse):
+                self.previous_cursor = self.encode_cursor(self.row_key(rows[0]), True)
+        return rows
+
+    def cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    # Page-number compatibility mode
+
+    def paginate_by_page(self, queryset, request, view):
+        try:
+            self.page_number = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+        except ValueError:
+            raise NotFound('Invalid page.')
+        self.count, self.count_exact = cached_count(
+            queryset, type(view).__name__, lambda queryset: estimate_count(queryset, self.count_limit)
+        )
+        offset = (self.page_number - 1) * self.page_size
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        if not rows and self.page_number > 1:
+            raise NotFound('Invalid page.')
+        self.has_next = len(rows) > self.page_size
+        return rows[:self.page_size]
+
+    def page_link(self, number):
+        url = self.request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, number)
+
+    def get_paginated_response(self, data):
+        if self.count is None:
+            return Response({
+                'next': self.cursor_link(self.next_cursor),
+                'previous': self.cursor_link(self.previous_cursor),
+                'results': data,
+            })
+        return Response({
+            'count': self.count,
+            'count_exact': self.count_exact,
+            'next': self.page_link(self.page_number + 1) if self.has_next else None,
+            'previous': self.page_link(self.page_number - 1) if self.page_number > 1 else None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        link = {'type': 'string', 'nullable': True, 'format': 'uri'}
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'description': 'Total, except with ?cursor='},
+                'count_exact': {'type': 'boolean', 'description': 'Whether count is exact rather than estimated'},
+                'next': link,
+                'previous': link,
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'Cursor from a next or previous link; empty for the first keyset page',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f'Results per page, at most {max_page_size()}', 'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.page_query_param, 'required': False, 'in': 'query',
+                'description': 'Page number, for page-number pagination', 'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,195 @@
+"""
+Password hashing for token logins on a bounded worker pool.
+
+PBKDF2 is almost all of a login's CPU. Token logins run it on a pool of
+PASSWORD_HASH_WORKERS threads (hashlib releases the GIL while hashing).
+The request waits for its hash, so the pool frees no request worker;
+what it bounds is how many logins hash at once.
+
+Logins first take one of PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_DEPTH
+slots, kept in the cache with cache.add(). With CACHES pointing at a
+shared backend the slots are shared by every process, so the limit
+holds under prefork servers, where each process serves one request at a
+time; with the default local-memory cache it is per process. When every
+slot is taken, logins are refused at once with 503 and Retry-After
+instead of queuing behind the burst. A slot left by a process that died
+frees itself after SLOT_LEASE seconds.
+
+The pool counts queue wait and hash time (HashPool.stats(), and a
+Server-Timing header on token responses). Passwords stored with older
+hasher parameters are rehashed on the pool after a successful login,
+as check_password() would.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashPoolFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+# Seconds before a taken slot frees itself, should its process die
+SLOT_LEASE = 60
+
+
+class HashPool:
+    """A size-limited executor for password hashing, with timing counters."""
+
+    def __init__(self, workers, queue_depth):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.slot_keys = [f'password-hash-slot:{slot}' for slot in range(workers + queue_depth)]
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = self.queue_wait_max = 0.0
+        self.hash_total = self.hash_max = 0.0
+
+    def acquire_slot(self):
+        """Take a free slot, returning its key, or None when all are taken."""
+        taken = cache.get_many(self.slot_keys)
+        token = uuid.uuid4().hex
+        for key in self.slot_keys:
+            # add() fails if another login took the slot since get_many()
+            if key not in taken and cache.add(key, token, SLOT_LEASE):
+                return key
+        return None
+
+    def release_slot(self, key):
+        cache.delete(key)
+
+    def run(self, func, *args):
+        """
+        Return (func(*args), queue wait, hash time), running func on a
+        worker. Raises HashPoolFull when every worker and queue slot is taken.
+        """
+        slot = self.acquire_slot()
+        if slot is None:
+            with self.lock:
+                self.rejected += 1
+            raise HashPoolFull()
+
+        def timed():
+            started = time.perf_counter()
+            return func(*args), started, time.perf_counter()
+
+        submitted = time.perf_counter()
+        with self.lock:
+            self.in_flight += 1
+        try:
+            result, started, finished = self.executor.submit(timed).result()
+        finally:
+            self.release_slot(slot)
+            with self.lock:
+                self.in_flight -= 1
+
+        wait, hashing = started - submitted, finished - started
+        with self.lock:
+            self.completed += 1
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+            self.hash_total += hashing
+            self.hash_max = max(self.hash_max, hashing)
+        return result, wait, hashing
+
+    def stats(self):
+        """Pool size and counters since start; times in milliseconds."""
+        with self.lock:
+            completed = self.completed or 1
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_wait_ms': {
+                    'mean': round(self.queue_wait_total / completed * 1000, 3),
+                    'max': round(self.queue_wait_max * 1000, 3),
+                },
+                'hash_ms': {
+                    'mean': round(self.hash_total / completed * 1000, 3),
+                    'max': round(self.hash_max * 1000, 3),
+                },
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_pool():
+    """The process's HashPool, (re)created when its settings change."""
+    global _pool
+    size = (settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_DEPTH)
+    with _pool_lock:
+        if _pool is None or (_pool.workers, _pool.queue_depth) != size:
+            if _pool is not None:
+                _pool.executor.shutdown(wait=False)
+            _pool = HashPool(*size)
+        return _pool
+
+
+def server_timing(request):
+    """Server-Timing header value for the hashing a request did, or None."""
+    timing = getattr(request, 'password_hash_timing', None)
+    if timing is None:
+        return None
+    wait, hashing = timing
+    return f'hash-queue;dur={wait * 1000:.1f}, hash;dur={hashing * 1000:.1f}'
+
+
+class PooledPasswordBackend(ModelBackend):
+    """
+    ModelBackend that hashes on the HashPool when authenticate() is called
+    with use_hash_pool=True, as token logins do. Other logins, such as the
+    admin site's, hash inline as ModelBackend does.
+    """
+
+    def authenticate(self, request, username=None, password=None, use_hash_pool=False, **kwargs):
+        if not use_hash_pool:
+            return super().authenticate(request, username, password, **kwargs)
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        pool = hash_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash once anyway, so unknown usernames take as long as known ones
+            _, wait, hashing = pool.run(make_password, password)
+            user = None
+            is_correct = False
+        else:
+            (is_correct, must_update), wait, hashing = pool.run(verify_password, password, user.password)
+            if is_correct and must_update:
+                # The hasher or its parameters changed since the password was set
+                try:
+                    encoded, _, _ = pool.run(make_password, password)
+                except HashPoolFull:
+                    pass  # Rehashed on a later login instead
+                else:
+                    user.password = encoded
+                    user.save(update_fields=['password'])
+        if request is not None:
+            request.password_hash_timing = (wait, hashing)
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
@@ -1,12 +1,14 @@
 from rest_framework import permissions
 
+from .roles import role_context
+
 
 class IsAdmin(permissions.BasePermission):
     """
     Permission class that allows access only to users with admin role.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == 'admin'
+        return role_context(request).role == 'admin'
 
 
 class IsTeacher(permissions.BasePermission):
@@ -14,7 +16,7 @@ class IsTeacher(permissions.BasePermission):
     Permission class that allows access only to users with teacher role.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == 'teacher'
+        return role_context(request).role == 'teacher'
 
 
 class IsStudent(permissions.BasePermission):
@@ -22,7 +24,7 @@ class IsStudent(permissions.BasePermission):
     Permission class that allows access only to users with student role.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == 'student'
+        return role_context(request).role == 'student'
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -31,9 +33,9 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     Expects the object to have a 'user' attribute.
     """
     def has_object_permission(self, request, view, obj):
-        if request.user.role == 'admin':
+        if role_context(request).is_admin:
             return True
-        return obj.user == request.user
+        return obj.user_id == request.user.pk
 
 
 class IsTeacherOfCourse(permissions.BasePermission):
@@ -42,15 +44,16 @@ class IsTeacherOfCourse(permissions.BasePermission):
     Expects the object to have a 'course' attribute with a 'teacher' relationship.
     """
     def has_object_permission(self, request, view, obj):
-        if request.user.role == 'admin':
+        role = role_context(request)
+        if role.is_admin:
             return True
-        if request.user.role == 'teacher' and hasattr(request.user, 'teacher_profile'):
-            # Check if the course's teacher matches the current user's teacher profile
-            if hasattr(obj, 'course'):
-                return obj.course.teacher == request.user.teacher_profile
+        if role.teacher_profile:
+            # Check if the course is one of the current user's courses
+            if hasattr(obj, 'course_id'):
+                return obj.course_id in role.taught_course_ids
             # If obj is a Course itself
-            if hasattr(obj, 'teacher'):
-                return obj.teacher == request.user.teacher_profile
+            if hasattr(obj, 'teacher_id'):
+                return obj.teacher_id == role.teacher_profile.pk
         return False
 
 
@@ -60,10 +63,11 @@ class IsStudentOwner(permissions.BasePermission):
     Expects the object to have a 'student' attribute.
     """
     def has_object_permission(self, request, view, obj):
-        if request.user.role == 'admin':
+        role = role_context(request)
+        if role.is_admin:
             return True
-        if request.user.role == 'student' and hasattr(request.user, 'student_profile'):
-            return obj.student == request.user.student_profile
+        if role.student_profile:
+            return obj.student_id == role.student_profile.pk
         return False
 
 
@@ -72,11 +76,7 @@ class IsAdminOrTeacher(permissions.BasePermission):
     Permission class that allows access to admin or teacher users.
     """
     def has_permission(self, request, view):
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.role in ['admin', 'teacher']
-        )
+        return role_context(request).role in ['admin', 'teacher']
 
 
 class IsAdminOrStudent(permissions.BasePermission):
@@ -84,9 +84,5 @@ class IsAdminOrStudent(permissions.BasePermission):
     Permission class that allows access to admin or student users.
     """
     def has_permission(self, request, view):
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.role in ['admin', 'student']
-        )
+        return role_context(request).role in ['admin', 'student']
 
@@ -0,0 +1,101 @@
+"""
+Queryset column projection derived from serializer fields.
+
+The active serializer's readable fields are walked, following nested
+serializers into related models, to find exactly which columns and
+joins the response needs. Viewsets then fetch those with only() and
+select_related() instead of SELECT * across every joined table.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def resolve_source(model, source):
+    """
+    Resolve a dotted serializer source against a model.
+    Returns (lookup parts, related model or None), or None when the
+    source is not a chain of forward relations ending in a concrete field
+    (a property, method or reverse relation).
+    """
+    parts = source.split('.')
+    for index, name in enumerate(parts):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        last = index == len(parts) - 1
+        if field.is_relation:
+            if last:
+                return parts, field.related_model
+            model = field.related_model
+        elif not last:
+            return None
+    return parts, None
+
+
+def serializer_projection(serializer, model, prefix=None):
+    """
+    Return (only, select_related) lookups for rendering the serializer
+    from the model. only is None when the serializer needs a column it
+    cannot name, in which case every column must be loaded.
+    """
+    prefix = prefix or []
+    only, related = [], []
+    complete = True
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        resolved = None
+        if field.source != '*' and not isinstance(field, ListSerializer):
+            resolved = resolve_source(model, field.source)
+        if resolved is None:
+            complete = False
+            continue
+
+        parts, related_model = resolved
+        lookup = '__'.join(prefix + parts)
+        if len(parts) > 1:
+            related.append('__'.join(prefix + parts[:-1]))
+
+        if isinstance(field, BaseSerializer):
+            if related_model is None:
+                complete = False
+                continue
+            related.append(lookup)
+            nested_only, nested_related = serializer_projection(
+                field, related_model, prefix + parts
+            )
+            related.extend(nested_related)
+            # Naming just the relation loads all of its columns
+            only.extend(nested_only if nested_only is not None else [lookup])
+        else:
+            only.append(lookup)
+
+    # Joins implied by a longer one are redundant
+    related = [
+        path for path in dict.fromkeys(related)
+        if not any(other.startswith(path + '__') for other in related)
+    ]
+    return (list(dict.fromkeys(only)) if complete else None), related
+
+
+class ProjectionViewSetMixin:
+    """
+    Viewset mixin that joins and selects only what the serializer renders.
+    The projection follows sparse fieldsets and expansion, since it walks
+    the serializer get_serializer() returns. Writes still load whole rows,
+    so saving never runs against deferred fields.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        only, related = serializer_projection(self.get_serializer(), queryset.model)
+        if related:
+            queryset = queryset.select_related(*related)
+        if only is not None and self.request.method in permissions.SAFE_METHODS:
+            queryset = queryset.only(*only)
+        return queryset
@@ -0,0 +1,85 @@
+"""
+Shared response cache for list endpoints.
+
+ResponseCacheMixin keeps a list's response data in the Django cache, so
+identical requests (every student browsing the course catalog) are
+answered without querying or serializing again. Entries are shared by
+every user with the same role scope. The key is built from:
+
+- the role, and the SQL and parameters of the role-scoped queryset
+  before any filter runs, so users only share entries when their scope
+  selects the same rows;
+- the query parameters and the URL the pagination links are built from;
+- the table version (see versions.py) of every model in cache_models.
+  Saving or deleting one of them bumps its version, so entries stop
+  matching at once and expire after LIST_CACHE_TIMEOUT seconds.
+
+Hits and misses are counted per view in each process.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from rest_framework.response import Response
+
+from .roles import role_context
+from .versions import read_versions, table_scope
+
+
+_lock = threading.Lock()
+# view basename -> {'hits': ..., 'misses': ...}
+_counters = {}
+
+
+def count_lookup(basename, outcome):
+    with _lock:
+        counters = _counters.setdefault(basename, {'hits': 0, 'misses': 0})
+        counters[outcome] += 1
+
+
+def response_cache_stats():
+    """Hits and misses of this process's list response cache, per view."""
+    with _lock:
+        return {basename: dict(counters) for basename, counters in _counters.items()}
+
+
+def reset_response_cache_stats():
+    with _lock:
+        _counters.clear()
+
+
+class ResponseCacheMixin:
+    """
+    Viewset mixin caching list responses per role scope and query.
+    cache_models are the models whose rows the response shows.
+    """
+    cache_models = ()
+
+    def response_cache_key(self, request):
+        """The list's cache key, or None if the scope cannot match anything."""
+        try:
+            sql, params = self.get_queryset().query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        versions = read_versions(*(table_scope(model._meta.db_table) for model in self.cache_models))
+        key = repr((
+            role_context(request).role, sql, params, request.build_absolute_uri(request.path),
+            sorted(request.query_params.lists()), versions,
+        ))
+        return f'list-response:{self.basename}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def list(self, request, *args, **kwargs):
+        key = self.response_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        data = cache.get(key)
+        if data is not None:
+            count_lookup(self.basename, 'hits')
+            return Response(data)
+        count_lookup(self.basename, 'misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.LIST_CACHE_TIMEOUT)
+        return response
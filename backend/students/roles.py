@@ -0,0 +1,59 @@
+"""
+Per-request role context.
+
+Viewsets and permission classes read the request user's role, profile
+and the rows that role scopes them to from role_context(request). It is
+built on first use and kept on the request. Each property is therefore
+resolved at most once per request, whether the user came from token
+claims (profiles pre-filled, no queries) or from the database.
+"""
+from functools import cached_property
+
+from .models import Course
+
+
+class RoleContext:
+    """The request user's role, its profile and the ids that role may see."""
+
+    def __init__(self, user):
+        self.user = user
+        self.role = user.role if user is not None and user.is_authenticated else None
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @cached_property
+    def student_profile(self):
+        """The user's student profile, or None unless the user is a student with one."""
+        if self.role != 'student':
+            return None
+        return getattr(self.user, 'student_profile', None)
+
+    @cached_property
+    def teacher_profile(self):
+        """The user's teacher profile, or None unless the user is a teacher with one."""
+        if self.role != 'teacher':
+            return None
+        return getattr(self.user, 'teacher_profile', None)
+
+    @cached_property
+    def taught_courses(self):
+        """Ids of the teacher's courses, as a subquery."""
+        return Course.objects.filter(teacher=self.teacher_profile).values('pk')
+
+    @cached_property
+    def taught_course_ids(self):
+        """Ids of the teacher's courses, loaded once for object checks."""
+        if self.teacher_profile is None:
+            return frozenset()
+        return frozenset(self.taught_courses.values_list('pk', flat=True))
+
+
+def role_context(request):
+    """The request's RoleContext, built on first use."""
+    context = getattr(request, '_role_context', None)
+    if context is None or context.user is not request.user:
+        context = RoleContext(request.user)
+        request._role_context = context
+    return context
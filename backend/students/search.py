@@ -0,0 +1,313 @@
+"""
+Full-text search index for users, students, teachers and courses.
+
+Each indexed object has one search document holding the text its list
+endpoint searches (names, usernames, emails, codes, titles). Documents
+live in the search_index table: an FTS5 table on SQLite, and a table
+with tsvector and trigram GIN indexes on PostgreSQL. They are kept up to
+date from model signals, and bulk writers index their rows explicitly.
+
+?search= is answered from the index with prefix matching on each word
+(PostgreSQL also matches substrings through the trigram index). Narrow
+searches are ranked by relevance (bm25 on SQLite, ts_rank on
+PostgreSQL); broad ones, where ranking every match would cost more than
+the scan it replaces, keep the list's ordering. Other databases, and
+terms without any word characters, fall back to SearchFilter's
+icontains lookups.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .counts import invalidate_counts
+from .exports.writers import chunked
+from .models import User, StudentProfile, TeacherProfile, Course
+
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedKind:
+    """
+    A model in the search index: the fields its document is built from.
+    Index keys are object_id * KIND_SLOTS + code, unique across kinds.
+    """
+
+    def __init__(self, name, code, model, fields):
+        self.name = name
+        self.code = code
+        self.model = model
+        self.fields = fields
+
+    def key(self, object_id):
+        return object_id * KIND_SLOTS + self.code
+
+    def documents(self, queryset):
+        """Iterate (index key, document) pairs for the queryset's objects."""
+        rows = queryset.values_list('pk', *self.fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        for pk, *values in rows:
+            yield self.key(pk), ' '.join(value for value in values if value)
+
+
+KIND_SLOTS = 8
+
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name']
+
+# Each kind indexes its list endpoint's search_fields
+SEARCH_KINDS = {
+    kind.model: kind for kind in [
+        IndexedKind('users', 1, User, USER_FIELDS),
+        IndexedKind('students', 2, StudentProfile, ['enrollment_number', 'user__username', 'user__email']),
+        IndexedKind('teachers', 3, TeacherProfile, ['user__username', 'user__email', 'department']),
+        IndexedKind('courses', 4, Course, ['title', 'code', 'description']),
+    ]
+}
+
+
+def indexed_fields(model):
+    """Names of the model's own fields its search documents are built from."""
+    kind = SEARCH_KINDS.get(model)
+    return {field.split('__')[0] for field in kind.fields} if kind else set()
+
+
+def search_tokens(terms):
+    """Lower-cased words of the search terms, as the index tokenizes them."""
+    return [token for term in terms for token in re.findall(r'\w+', term.lower())]
+
+
+class SQLiteSearchBackend:
+    """search_index as an FTS5 table; rowid is the index key."""
+
+    # As migration 0006 creates it
+    create_statements = [
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "kind, document, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ]
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def replace(self, kind, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM search_index WHERE rowid = %s', [[key] for key, _ in documents])
+            cursor.executemany(
+                'INSERT INTO search_index (rowid, kind, document) VALUES (%s, %s, %s)',
+                [[key, kind.name, document] for key, document in documents],
+            )
+
+    def delete(self, keys):
+        with self.connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM search_index WHERE rowid = %s', [[key] for key in keys])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM search_index')
+
+    def matches(self, kind, terms):
+        """SQL and params selecting the ids of the kind's matching objects."""
+        query = 'kind:{} AND document:({})'.format(
+            kind.name, ' '.join(f'"{token}"*' for token in search_tokens(terms))
+        )
+        return f'SELECT rowid / {KIND_SLOTS} FROM search_index WHERE search_index MATCH %s', [query]
+
+    def ranked(self, kind, terms, limit):
+        sql, params = self.matches(kind, terms)
+        # Weigh only the document column; kind matches every row
+        return sql + ' ORDER BY bm25(search_index, 0, 1) LIMIT %s', params + [limit]
+
+
+class PostgreSQLSearchBackend:
+    """search_index with a generated tsvector column and a trigram index."""
+
+    # As migration 0006 creates it
+    create_statements = [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE TABLE search_index ('
+        'id bigint PRIMARY KEY, kind varchar(16) NOT NULL, document text NOT NULL, '
+        "vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', document)) STORED)",
+        'CREATE INDEX search_index_vector ON search_index USING gin (vector)',
+        'CREATE INDEX search_index_document_trgm ON search_index USING gin (document gin_trgm_ops)',
+        'CREATE INDEX search_index_kind ON search_index (kind)',
+    ]
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def replace(self, kind, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO search_index (id, kind, document) VALUES (%s, %s, %s) '
+                'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document',
+                [[key, kind.name, document] for key, document in documents],
+            )
+
+    def delete(self, keys):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM search_index WHERE id = ANY(%s)', [list(keys)])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('TRUNCATE search_index')
+
+    def matches(self, kind, terms):
+        """SQL and params selecting the ids of the kind's matching objects."""
+        text = ' '.join(terms)
+        substring = '%{}%'.format(text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+        sql = (
+            f"SELECT id / {KIND_SLOTS} FROM search_index, to_tsquery('simple', %s) query "
+            "WHERE kind = %s AND (vector @@ query OR document ILIKE %s)"
+        )
+        return sql, [' & '.join(f"'{token}':*" for token in search_tokens(terms)), kind.name, substring]
+
+    def ranked(self, kind, terms, limit):
+        sql, params = self.matches(kind, terms)
+        return (
+            sql + ' ORDER BY ts_rank(vector, query) DESC, similarity(document, %s) DESC LIMIT %s',
+            params + [' '.join(terms), limit],
+        )
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+# Database alias -> whether its search_index table exists
+_index_tables = {}
+
+
+def has_index_table(connection):
+    """Whether the database has a search_index table, checked once per process."""
+    exists = _index_tables.get(connection.alias)
+    if exists is None:
+        exists = _index_tables[connection.alias] = 'search_index' in connection.introspection.table_names()
+        if not exists:
+            logger.warning(
+                'Database %r has no search_index table; ?search= uses icontains lookups '
+                'and writes are not indexed.', connection.alias
+            )
+    return exists
+
+
+def forget_index_tables():
+    """Check again whether search_index exists, after migrations ran."""
+    _index_tables.clear()
+
+
+def search_backend(using='default'):
+    """The search backend for a database, or None if it has no index."""
+    connection = connections[using]
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None or not has_index_table(connection):
+        return None
+    return backend_class(connection)
+
+
+def create_index(using='default'):
+    """
+    Create and fill search_index where migration 0006 did not run, as in
+    databases built with --run-syncdb or pytest --nomigrations. Returns
+    whether it was created.
+    """
+    connection = connections[using]
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    forget_index_tables()
+    if backend_class is None or 'search_index' in connection.introspection.table_names():
+        return False
+    with connection.cursor() as cursor:
+        for statement in backend_class.create_statements:
+            cursor.execute(statement)
+    forget_index_tables()
+    rebuild_index(using)
+    return True
+
+
+def index_objects(model, pks, using='default'):
+    """(Re)index the given objects of an indexed model."""
+    backend = search_backend(using)
+    kind = SEARCH_KINDS.get(model)
+    if backend is None or kind is None:
+        return
+    backend.replace(kind, list(kind.documents(model._default_manager.using(using).filter(pk__in=pks))))
+
+
+def unindex_objects(model, pks, using='default'):
+    """Remove the given objects of an indexed model from the index."""
+    backend = search_backend(using)
+    kind = SEARCH_KINDS.get(model)
+    if backend is None or kind is None:
+        return
+    backend.delete([kind.key(pk) for pk in pks])
+
+
+def rebuild_index(using='default'):
+    """Rebuild the whole index, returning the number of documents per kind."""
+    backend = search_backend(using)
+    if backend is None:
+        return None
+    backend.clear()
+    counts = {}
+    for model, kind in SEARCH_KINDS.items():
+        counts[kind.name] = 0
+        for documents in chunked(kind.documents(model._default_manager.using(using).all())):
+            backend.replace(kind, documents)
+            counts[kind.name] += len(documents)
+    # Searches of every indexed model may now match other rows
+    invalidate_counts(*SEARCH_KINDS)
+    return counts
+
+
+def rank(backend, kind, terms, limit):
+    """
+    Ids of the kind's objects matching every word of the terms as a
+    prefix, best match first, or None when more than limit objects match:
+    ranking them all would cost more than the search saves.
+    """
+    with backend.connection.cursor() as cursor:
+        sql, params = backend.matches(kind, terms)
+        cursor.execute(sql + ' LIMIT %s', params + [limit + 1])
+        if len(cursor.fetchall()) > limit:
+            return None
+        cursor.execute(*backend.ranked(kind, terms, limit))
+        return [row[0] for row in cursor.fetchall()]
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter answered from the search index. Up to SEARCH_RANK_LIMIT
+    matches are annotated with search_rank (0 for the best) so
+    RankedOrderingFilter can sort them by relevance; broader searches are
+    filtered through the index and keep the list's ordering.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        backend = search_backend(queryset.db)
+        kind = SEARCH_KINDS.get(queryset.model)
+        if not terms or backend is None or kind is None or not search_tokens(terms):
+            return super().filter_queryset(request, queryset, view)
+
+        ids = rank(backend, kind, terms, settings.SEARCH_RANK_LIMIT)
+        if ids is None:
+            return queryset.filter(pk__in=RawSQL(*backend.matches(kind, terms)))
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).annotate(search_rank=Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        ))
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """OrderingFilter that sorts search results by relevance unless ?ordering= is given."""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['search_rank']
+        return super().get_ordering(request, queryset, view)
@@ -1,9 +1,63 @@
+from datetime import date
+
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import reverse
+from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade, ExportJob
+from .exports import EXPORTS
+from .bulk import BulkListSerializer, BulkPrimaryKeyRelatedField, unique_together_errors
+from .visibility import grant_enrollments
+
+
+def split_field_paths(paths):
+    """
+    Split dotted field paths into a mapping of top-level field name to the
+    set of paths below it, e.g. ['a', 'b.c'] -> {'a': set(), 'b': {'c'}}.
+    """
+    tree = {}
+    for path in paths:
+        name, _, rest = path.partition('.')
+        tree.setdefault(name, set())
+        if rest:
+            tree[name].add(rest)
+    return tree
 
 
-class UserSerializer(serializers.ModelSerializer):
+class FlexFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets and opt-in expansion.
+    Fields listed in Meta.expandable_fields are omitted unless named in
+    `expand`, and `fields` limits the output to the named fields. Both
+    take dotted paths, which are handed down to nested serializers.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self.only_fields = kwargs.pop('fields', None)
+        self.expand_fields = kwargs.pop('expand', ())
+        super().__init__(*args, **kwargs)
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        only = split_field_paths(self.only_fields) if self.only_fields is not None else None
+        expand = split_field_paths(self.expand_fields)
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        
+        for name in list(fields):
+            if only is not None and name not in only:
+                del fields[name]
+            elif name in expandable and name not in expand:
+                del fields[name]
+            else:
+                nested = getattr(fields[name], 'child', fields[name])
+                if isinstance(nested, FlexFieldsMixin):
+                    nested.only_fields = (only[name] or None) if only is not None else None
+                    nested.expand_fields = expand.get(name, ())
+        return fields
+
+
+class UserSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     """Serializer for User model - read-only for nested representations."""
     
     class Meta:
@@ -12,7 +66,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     """Serializer for creating new users (admin only)."""
     
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -34,7 +88,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserUpdateSerializer(serializers.ModelSerializer):
+class UserUpdateSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     """Serializer for updating users."""
     
     class Meta:
@@ -43,7 +97,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class StudentProfileSerializer(serializers.ModelSerializer):
+class StudentProfileSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     """Serializer for StudentProfile with nested user information."""
     
     user = UserSerializer(read_only=True)
@@ -66,7 +120,36 @@ class StudentProfileCreateSerializer(serializers.ModelSerializer):
         fields = ['enrollment_number', 'date_of_birth', 'phone_number', 'address']
 
 
-class TeacherProfileSerializer(serializers.ModelSerializer):
+class StudentImportSerializer(serializers.Serializer):
+    """
+    Validates one row of a bulk student import. Uniqueness of usernames
+    and emails is checked per batch by the importer, not per row here.
+    """
+    
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(max_length=254)
+    password = serializers.CharField(required=False, allow_blank=True)
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    date_of_birth = serializers.DateField(required=False, default=date(2000, 1, 1))
+    phone_number = serializers.CharField(
+        max_length=20, required=False, allow_blank=True, default='',
+        validators=StudentProfile._meta.get_field('phone_number').validators
+    )
+    address = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate(self, attrs):
+        if attrs.get('password'):
+            user = User(username=attrs['username'], email=attrs['email'],
+                        first_name=attrs['first_name'], last_name=attrs['last_name'])
+            try:
+                validate_password(attrs['password'], user)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError({"password": list(exc.messages)})
+        return attrs
+
+
+class TeacherProfileSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     """Serializer for TeacherProfile with nested user information."""
     
     user = UserSerializer(read_only=True)
@@ -86,7 +169,7 @@ class TeacherProfileCreateSerializer(serializers.ModelSerializer):
         fields = ['department']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     """Serializer for Course model."""
     
     teacher_detail = TeacherProfileSerializer(source='teacher', read_only=True)
@@ -104,20 +187,21 @@ class CourseSerializer(serializers.ModelSerializer):
             'teacher_detail', 'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['teacher_detail']
 
 
-class EnrollmentSerializer(serializers.ModelSerializer):
-    """Serializer for Enrollment model."""
+class EnrollmentSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Enrollment model. Accepts a list of enrollments for bulk creation."""
 
     student_detail = StudentProfileSerializer(source='student', read_only=True)
     course_detail = CourseSerializer(source='course', read_only=True)
-    student_id = serializers.PrimaryKeyRelatedField(
+    student_id = BulkPrimaryKeyRelatedField(
         queryset=StudentProfile.objects.all(),
         source='student',
         required=False,  # Make optional for creation - will be set by view
         allow_null=True
     )
-    course_id = serializers.PrimaryKeyRelatedField(
+    course_id = BulkPrimaryKeyRelatedField(
         queryset=Course.objects.all(),
         source='course',
         required=True
@@ -125,12 +209,16 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Enrollment
+        list_serializer_class = BulkListSerializer
         fields = [
             'id', 'student', 'student_id', 'student_detail',
             'course', 'course_id', 'course_detail',
             'enrolled_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'enrolled_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'student', 'course', 'enrolled_at', 'created_at', 'updated_at']
+        expandable_fields = ['student_detail', 'course_detail']
+        # Uniqueness is checked by validate_rows()
+        validators = []
 
     def validate(self, attrs):
         # Ensure course is active
@@ -138,33 +226,47 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         if course and not course.is_active:
             raise serializers.ValidationError("Cannot enroll in an inactive course.")
 
-        # Check for existing enrollment
-        student = attrs.get('student')
-        if student and course:
-            if Enrollment.objects.filter(student=student, course=course).exists():
-                raise serializers.ValidationError("Student is already enrolled in this course.")
+        # Students always enroll themselves
+        if 'student' in self.context:
+            attrs['student'] = self.context['student']
+
+        # Bulk requests check every row at once
+        if not isinstance(self.parent, BulkListSerializer):
+            error = self.validate_rows([attrs])[0]
+            if error:
+                raise serializers.ValidationError(error)
 
         return attrs
 
+    def validate_rows(self, rows):
+        # Check for existing enrollments
+        return unique_together_errors(
+            Enrollment, ('student', 'course'), rows,
+            "Student is already enrolled in this course.", self.instance
+        )
+
+    def bulk_created(self, instances):
+        grant_enrollments((enrollment.student_id, enrollment.course_id) for enrollment in instances)
 
-class GradeSerializer(serializers.ModelSerializer):
-    """Serializer for Grade model."""
+
+class GradeSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Grade model. Accepts a list of grades for bulk creation."""
     
     student_detail = StudentProfileSerializer(source='student', read_only=True)
     course_detail = CourseSerializer(source='course', read_only=True)
     teacher_detail = TeacherProfileSerializer(source='teacher', read_only=True)
     
-    student_id = serializers.PrimaryKeyRelatedField(
+    student_id = BulkPrimaryKeyRelatedField(
         queryset=StudentProfile.objects.all(),
         source='student',
         required=True
     )
-    course_id = serializers.PrimaryKeyRelatedField(
+    course_id = BulkPrimaryKeyRelatedField(
         queryset=Course.objects.all(),
         source='course',
         required=True
     )
-    teacher_id = serializers.PrimaryKeyRelatedField(
+    teacher_id = BulkPrimaryKeyRelatedField(
         queryset=TeacherProfile.objects.all(),
         source='teacher',
         required=False,
@@ -173,13 +275,31 @@ class GradeSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Grade
+        list_serializer_class = BulkListSerializer
         fields = [
             'id', 'student', 'student_id', 'student_detail',
             'course', 'course_id', 'course_detail',
             'teacher', 'teacher_id', 'teacher_detail',
             'value', 'graded_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'graded_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'student', 'course', 'teacher', 'graded_at', 'created_at', 'updated_at']
+        expandable_fields = ['student_detail', 'course_detail', 'teacher_detail']
+        # Uniqueness is checked by validate_rows()
+        validators = []
+    
+    def validate(self, attrs):
+        # Bulk requests check every row at once
+        if not isinstance(self.parent, BulkListSerializer):
+            error = self.validate_rows([attrs])[0]
+            if error:
+                raise serializers.ValidationError(error)
+        return attrs
+    
+    def validate_rows(self, rows):
+        return unique_together_errors(
+            Grade, ('student', 'course'), rows,
+            "This student already has a grade for this course.", self.instance
+        )
 
 
 class CurrentUserSerializer(serializers.ModelSerializer):
@@ -196,3 +316,39 @@ class CurrentUserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'role', 'date_joined']
 
+
+
+class ExportJobSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    """Serializer for queuing background exports and reporting their progress."""
+    
+    course_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
+    progress = serializers.FloatField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'kind', 'file_format', 'course_id', 'params', 'status', 'total_rows', 'row_count',
+            'progress', 'download_url', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'params', 'status', 'total_rows', 'row_count', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def validate(self, attrs):
+        if attrs.get('course_id') and 'course_id' not in EXPORTS[attrs['kind']].filters:
+            raise serializers.ValidationError({"course_id": "This export cannot be filtered by course."})
+        return attrs
+    
+    def create(self, validated_data):
+        course_id = validated_data.pop('course_id', None)
+        validated_data['params'] = {'course_id': course_id} if course_id else {}
+        return super().create(validated_data)
+    
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.STATUS_COMPLETED:
+            return None
+        url = reverse('export-job-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
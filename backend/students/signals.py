@@ -1,6 +1,25 @@
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
 from django.dispatch import receiver
-from .models import User, StudentProfile, TeacherProfile
+from django.utils import timezone
+from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade, ExportTombstone
+from .authentication import forget_account
+from .exports.specs import EXPORTS
+from .serializers import UserSerializer
+from .versions import bump_instances
+from .search import create_index, forget_index_tables, indexed_fields, index_objects, unindex_objects
+from .visibility import grant_enrollments, revoke_enrollments, move_course
+
+
+PROFILE_MODELS = {'student': ('student_profile', StudentProfile), 'teacher': ('teacher_profile', TeacherProfile)}
+
+# User columns shown through a profile: in the students export and in
+# the user nested in profile payloads, such as a course's teacher_detail
+PROFILE_USER_FIELDS = {
+    column.field.removeprefix('user__') for column in EXPORTS['students'].columns
+    if column.field.startswith('user__')
+} | set(UserSerializer.Meta.fields) - {'id'}
 
 
 @receiver(post_save, sender=User)
@@ -25,12 +44,184 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, created, update_fields=None, using='default', **kwargs):
+    """
+    Save changes made to the user's profile through the user. A profile
+    that was never loaded has none, and an unchanged one skips its save
+    (see DirtyFieldsMixin). Its updated_at is still touched when user
+    columns shown through the profile changed, so delta exports and
+    caches keyed on the profile's table pick them up.
+    """
+    relation, model = PROFILE_MODELS.get(instance.role, (None, None))
+    if relation is None:
+        return
+    profile = getattr(instance, relation, None) if getattr(User, relation).is_cached(instance) else None
+    # dirty_fields() is None for a profile not saved yet
+    if profile is not None and profile.dirty_fields() != set():
+        profile.save()
+    elif not created and (update_fields is None or PROFILE_USER_FIELDS & set(update_fields)):
+        model.objects.using(using).filter(user=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=StudentProfile)
+def record_student_tombstone(sender, instance, **kwargs):
+    """
+    Remember deleted students so delta exports can report them.
+    """
+    ExportTombstone.objects.create(kind='students', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def record_course_tombstone(sender, instance, **kwargs):
+    """
+    Remember deleted courses so delta exports can report them.
+    """
+    ExportTombstone.objects.create(kind='courses', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Grade)
+def record_course_scoped_tombstone(sender, instance, **kwargs):
     """
-    Save the profile when the user is saved.
+    Remember deleted grades and enrollments so delta exports, including
+    course-filtered ones, can report them.
     """
-    if instance.role == 'student' and hasattr(instance, 'student_profile'):
-        instance.student_profile.save()
-    elif instance.role == 'teacher' and hasattr(instance, 'teacher_profile'):
-        instance.teacher_profile.save()
+    kind = 'grades' if sender is Grade else 'enrollments'
+    ExportTombstone.objects.create(
+        kind=kind,
+        object_id=instance.pk,
+        course_id=instance.course_id
+    )
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_cache_versions(sender, instance, using='default', **kwargs):
+    """
+    Bump the versions of the saved or deleted row's table and of its
+    scopes, before and after the write, so the cached counts, lists and
+    payloads built from them stop matching.
+    """
+    if sender._meta.app_label == 'students':
+        bump_instances(sender, [instance], using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_save, sender=Course)
+def index_search_document(sender, instance, update_fields=None, using='default', **kwargs):
+    """
+    Reindex saved users, profiles and courses. A user's profiles are
+    reindexed with it, since their documents include the username and
+    email. Saves of unindexed fields only, such as last_login, are skipped.
+    """
+    if update_fields is not None and not indexed_fields(sender) & set(update_fields):
+        return
+    index_objects(sender, [instance.pk], using)
+    if sender is User and (update_fields is None or {'username', 'email'} & set(update_fields)):
+        index_objects(StudentProfile, StudentProfile.objects.using(using).filter(user=instance).values('pk'), using)
+        index_objects(TeacherProfile, TeacherProfile.objects.using(using).filter(user=instance).values('pk'), using)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=TeacherProfile)
+@receiver(post_delete, sender=Course)
+def unindex_search_document(sender, instance, using='default', **kwargs):
+    """
+    Remove deleted users, profiles and courses from the search index.
+    """
+    unindex_objects(sender, [instance.pk], using)
+
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_account(sender, instance, **kwargs):
+    """
+    Make the next request re-check a saved or deleted user's active flag
+    and role.
+    """
+    forget_account(instance.pk)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=TeacherProfile)
+def forget_profile_account(sender, instance, created=False, **kwargs):
+    """
+    Make the next request re-check the profile ids of a user whose
+    profile was created or deleted.
+    """
+    if created or kwargs['signal'] is post_delete:
+        forget_account(instance.user_id)
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Enrollment)
+def remember_visibility_keys(sender, instance, raw=False, update_fields=None, using='default', **kwargs):
+    """
+    Remember the stored teacher of a course, or student and course of an
+    enrollment, before an update, so visibility can follow changes.
+    """
+    fields = ['teacher_id'] if sender is Course else ['student_id', 'course_id']
+    instance._visibility_keys = None
+    if raw or instance._state.adding or (
+        update_fields is not None and not {name.removesuffix('_id') for name in fields} & set(update_fields)
+    ):
+        return
+    # Loaded instances know their stored values (see DirtyFieldsMixin)
+    instance._visibility_keys = instance.loaded_values(*fields) or (
+        sender.objects.using(using).filter(pk=instance.pk).values_list(*fields).first()
+    )
+
+
+@receiver(post_save, sender=Course)
+def move_course_visibility(sender, instance, created, using='default', **kwargs):
+    """
+    Move a course's students to its new teacher's visibility.
+    """
+    previous = getattr(instance, '_visibility_keys', None)
+    if not created and previous is not None:
+        move_course(instance.pk, previous[0], instance.teacher_id, using)
+
+
+@receiver(post_save, sender=Enrollment)
+def grant_enrollment_visibility(sender, instance, created, raw=False, using='default', **kwargs):
+    """
+    Let the course's teacher see a newly enrolled student, and follow
+    enrollments moved to another student or course.
+    """
+    if raw:
+        return
+    current = (instance.student_id, instance.course_id)
+    previous = getattr(instance, '_visibility_keys', None)
+    if created:
+        grant_enrollments([current], using)
+    elif previous is not None and previous != current:
+        revoke_enrollments([previous], using)
+        grant_enrollments([current], using)
+
+
+@receiver(post_delete, sender=Enrollment)
+def revoke_enrollment_visibility(sender, instance, using='default', **kwargs):
+    """
+    Stop counting a deleted enrollment toward its teacher's visibility.
+    """
+    revoke_enrollments([(instance.student_id, instance.course_id)], using)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, app_config=None, using='default', **kwargs):
+    """
+    Create search_index when the app's tables were built without
+    migrations (--run-syncdb, pytest --nomigrations), since only
+    migration 0006 creates it otherwise.
+    """
+    if app_config is None or app_config.label != 'students':
+        return
+    forget_index_tables()
+    loader = MigrationLoader(connections[using], ignore_no_migrations=True)
+    if app_config.label in loader.unmigrated_apps:
+        create_index(using)
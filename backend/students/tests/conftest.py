@@ -0,0 +1,17 @@
+import pytest
+from django.core.cache import cache
+from students.logins import discard_logins
+
+
+@pytest.fixture(autouse=True)
+def discard_pending_logins():
+    """Keep buffered logins from leaking between tests, or into the dev database at exit."""
+    discard_logins()
+    yield
+    discard_logins()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start each test without cached counts, accounts or list responses of earlier tests."""
+    cache.clear()
@@ -1,5 +1,6 @@
 import factory
-from factory.django import DjangoModelFactory
+from django.db.models.signals import post_save
+from factory.django import DjangoModelFactory, mute_signals
 from students.models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
 
 
@@ -29,11 +30,23 @@ class StudentUserFactory(UserFactory):
     username = factory.Sequence(lambda n: f'student{n}')
 
 
+# Users backing an explicitly built profile must not get one from the
+# auto-profile signal as well.
+@mute_signals(post_save)
+class ProfilelessStudentUserFactory(StudentUserFactory):
+    pass
+
+
+@mute_signals(post_save)
+class ProfilelessTeacherUserFactory(TeacherUserFactory):
+    pass
+
+
 class StudentProfileFactory(DjangoModelFactory):
     class Meta:
         model = StudentProfile
     
-    user = factory.SubFactory(StudentUserFactory)
+    user = factory.SubFactory(ProfilelessStudentUserFactory)
     enrollment_number = factory.Sequence(lambda n: f'ENR{n:06d}')
     date_of_birth = factory.Faker('date_of_birth', minimum_age=18, maximum_age=25)
     phone_number = factory.Faker('phone_number')
@@ -44,7 +57,7 @@ class TeacherProfileFactory(DjangoModelFactory):
     class Meta:
         model = TeacherProfile
     
-    user = factory.SubFactory(TeacherUserFactory)
+    user = factory.SubFactory(ProfilelessTeacherUserFactory)
     department = factory.Faker('word')
 
 
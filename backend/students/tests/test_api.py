@@ -1,8 +1,27 @@
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+import zipfile
+from datetime import date, timedelta
+
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
-from students.models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
+from django.utils import timezone
+from students.models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade, ExportJob
+from students.logins import flush_logins, pending_logins
+from students.passwords import HashPool, hash_pool
+from students.authentication import ClaimsJWTAuthentication
+from students.token_serializers import CustomTokenObtainPairSerializer
+from students.exports import claim_next_job, export_file_path
 from .factories import (
     AdminUserFactory, TeacherUserFactory, StudentUserFactory,
     StudentProfileFactory, TeacherProfileFactory,
@@ -73,6 +92,219 @@ class TestAuthentication:
         response = api_client.get(url)
         
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_login_buffers_last_login(self, api_client, admin_user, teacher_user, settings):
+        settings.LAST_LOGIN_PRECISION = 86400
+        url = reverse('token_obtain_pair')
+        for user in [admin_user, teacher_user]:
+            with CaptureQueriesContext(connection) as queries:
+                api_client.post(url, {'username': user.username, 'password': 'password123'})
+            assert not any(query['sql'].startswith('UPDATE') for query in queries.captured_queries)
+        assert User.objects.filter(last_login__isnull=False).count() == 0
+        assert pending_logins() == 2
+        
+        with CaptureQueriesContext(connection) as queries:
+            assert flush_logins() == 2
+        
+        assert len(queries.captured_queries) == 1
+        last_login = User.objects.get(pk=admin_user.pk).last_login
+        assert (last_login.hour, last_login.minute, last_login.second, last_login.microsecond) == (0, 0, 0, 0)
+        assert User.objects.filter(last_login__isnull=False).count() == 2
+        
+        # Logging in again within the same day writes nothing
+        api_client.post(url, {'username': admin_user.username, 'password': 'password123'})
+        assert pending_logins() == 0
+    
+    def test_buffered_logins_flush_after_interval(self, api_client, admin_user, settings):
+        settings.LAST_LOGIN_FLUSH_INTERVAL = 0.001
+        api_client.post(reverse('token_obtain_pair'), {'username': admin_user.username, 'password': 'password123'})
+        api_client.get(reverse('current_user'))
+        
+        assert pending_logins() == 0
+        assert User.objects.get(pk=admin_user.pk).last_login is not None
+    
+    def test_zero_flush_interval_writes_each_login(self, api_client, admin_user, settings):
+        settings.LAST_LOGIN_FLUSH_INTERVAL = 0
+        api_client.post(reverse('token_obtain_pair'), {'username': admin_user.username, 'password': 'password123'})
+        
+        assert pending_logins() == 0
+        assert User.objects.get(pk=admin_user.pk).last_login is not None
+    
+    def test_login_reports_hash_timing(self, api_client, admin_user):
+        completed = hash_pool().stats()['completed']
+        response = api_client.post(
+            reverse('token_obtain_pair'), {'username': admin_user.username, 'password': 'password123'}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Server-Timing'].startswith('hash-queue;dur=')
+        assert hash_pool().stats()['completed'] == completed + 1
+    
+    def test_full_hash_pool_rejects_logins(self, api_client, admin_user, settings):
+        settings.PASSWORD_HASH_WORKERS = 1
+        settings.PASSWORD_HASH_QUEUE_DEPTH = 0
+        pool = hash_pool()
+        # As if another process held the only slot
+        slot = pool.acquire_slot()
+        try:
+            response = api_client.post(
+                reverse('token_obtain_pair'), {'username': admin_user.username, 'password': 'password123'}
+            )
+        finally:
+            pool.release_slot(slot)
+        
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response['Retry-After'] == '1'
+        assert pool.stats()['rejected'] == 1
+    
+    def test_slots_are_shared_through_the_cache(self):
+        # Pools of two processes sharing one cache
+        first, second = HashPool(1, 1), HashPool(1, 1)
+        
+        slots = [first.acquire_slot(), second.acquire_slot()]
+        assert None not in slots and slots[0] != slots[1]
+        assert first.acquire_slot() is None
+        second.release_slot(slots[1])
+        assert first.acquire_slot() == slots[1]
+    
+    def test_login_rehashes_outdated_passwords(self, api_client, admin_user, settings):
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        admin_user.set_password('password123')
+        admin_user.save()
+        settings.PASSWORD_HASHERS = [
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]
+        
+        response = api_client.post(
+            reverse('token_obtain_pair'), {'username': admin_user.username, 'password': 'password123'}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert User.objects.get(pk=admin_user.pk).password.startswith('pbkdf2_sha256$')
+    
+    def test_hash_pool_stats_are_admin_only(self, api_client, admin_user, teacher_user):
+        api_client.force_authenticate(user=teacher_user)
+        assert api_client.get(reverse('password_hash_stats')).status_code == status.HTTP_403_FORBIDDEN
+        
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('password_hash_stats'))
+        assert response.status_code == status.HTTP_200_OK
+        assert {'queue_wait_ms', 'hash_ms', 'rejected'} <= response.data.keys()
+
+
+def bearer_client(user):
+    """A client sending a freshly issued access token for user."""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}')
+    return client
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+    """Tests for authenticating from access token claims."""
+    
+    def test_token_carries_profile_ids(self, teacher_user):
+        token = CustomTokenObtainPairSerializer.get_token(teacher_user).access_token
+        
+        assert token['teacher_profile_id'] == teacher_user.teacher_profile.id
+        assert token['student_profile_id'] is None
+    
+    def test_scoped_list_runs_no_user_queries(self, teacher_user):
+        CourseFactory(teacher=teacher_user.teacher_profile)
+        client = bearer_client(teacher_user)
+        client.get(reverse('course-list'))
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('course-list'))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 1
+        # The conditional GET validator; the list comes from the response cache
+        assert len(queries.captured_queries) == 1
+        assert '"users"' not in queries.captured_queries[0]['sql']
+    
+    def test_current_user_loads_full_user(self, student_user):
+        response = bearer_client(student_user).get(reverse('current_user'))
+        
+        assert response.data['first_name'] == student_user.first_name
+        assert response.data['student_profile']['id'] == student_user.student_profile.id
+    
+    def test_current_user_is_cached_per_user_version(self, student_user):
+        client = bearer_client(student_user)
+        url = reverse('current_user')
+        with CaptureQueriesContext(connection) as queries:
+            first = client.get(url)
+        
+        # The account check, then one query joining only the profile the
+        # token says exists
+        assert len(queries.captured_queries) == 2
+        assert '"teacher_profiles"' not in queries.captured_queries[1]['sql']
+        assert first.data['teacher_profile'] is None
+        
+        with CaptureQueriesContext(connection) as queries:
+            cached = client.get(url)
+            not_modified = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        assert queries.captured_queries == []
+        assert cached.data == first.data
+        assert cached['ETag'] == first['ETag']
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_current_user_changes_with_user_and_profile(self, student_user):
+        client = bearer_client(student_user)
+        url = reverse('current_user')
+        etag = client.get(url)['ETag']
+        
+        student_user.first_name = 'Renamed'
+        student_user.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['first_name'] == 'Renamed'
+        
+        profile = StudentProfile.objects.get(user=student_user)
+        profile.phone_number = '+15550001111'
+        profile.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['student_profile']['phone_number'] == '+15550001111'
+        assert response.data['student_profile']['user']['first_name'] == 'Renamed'
+    
+    def test_current_user_payloads_are_not_shared(self, student_user, teacher_user):
+        student = bearer_client(student_user).get(reverse('current_user'))
+        teacher = bearer_client(teacher_user).get(reverse('current_user'))
+        
+        assert student['ETag'] != teacher['ETag']
+        assert teacher.data['id'] == teacher_user.id
+        assert teacher.data['teacher_profile']['id'] == teacher_user.teacher_profile.id
+    
+    def test_deactivation_applies_to_issued_tokens(self, student_user):
+        client = bearer_client(student_user)
+        assert client.get(reverse('course-list')).status_code == status.HTTP_200_OK
+        
+        student_user.is_active = False
+        student_user.save()
+        
+        assert client.get(reverse('course-list')).status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_changed_role_falls_back_to_database(self, teacher_user):
+        client = bearer_client(teacher_user)
+        
+        teacher_user.role = 'admin'
+        teacher_user.save()
+        
+        assert client.get(reverse('user-list')).status_code == status.HTTP_200_OK
+    
+    def test_changed_username_and_email_fall_back_to_database(self, student_user):
+        token = CustomTokenObtainPairSerializer.get_token(student_user).access_token
+        assert ClaimsJWTAuthentication().get_user(token).username == student_user.username
+        
+        student_user.username = 'renamed'
+        student_user.email = 'renamed@example.com'
+        student_user.save()
+        user = ClaimsJWTAuthentication().get_user(token)
+        
+        assert (user.username, user.email) == ('renamed', 'renamed@example.com')
 
 
 @pytest.mark.django_db
@@ -165,6 +397,20 @@ class TestCourse:
         assert response.status_code == status.HTTP_201_CREATED
         assert Course.objects.filter(code='NC101').exists()
     
+    def test_course_creation_rolls_back_with_its_signals(self, api_client, teacher_user):
+        def fail(**kwargs):
+            raise DatabaseError('visibility write failed')
+        
+        post_save.connect(fail, sender=Course, dispatch_uid='test-fail')
+        api_client.force_authenticate(user=teacher_user)
+        try:
+            with pytest.raises(DatabaseError):
+                api_client.post(reverse('course-list'), {'title': 'New Course', 'code': 'NC101'})
+        finally:
+            post_save.disconnect(sender=Course, dispatch_uid='test-fail')
+        
+        assert not Course.objects.filter(code='NC101').exists()
+    
     def test_student_can_view_courses(self, api_client, student_user):
         CourseFactory.create_batch(3)
         api_client.force_authenticate(user=student_user)
@@ -259,6 +505,390 @@ class TestGrade:
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
 
+@pytest.mark.django_db
+class TestBulkCreate:
+    """Tests for creating grades and enrollments from a JSON array."""
+    
+    def grade_rows(self, course, count):
+        return [
+            {'student_id': student.id, 'course_id': course.id, 'value': 'B'}
+            for student in StudentProfileFactory.create_batch(count)
+        ]
+    
+    def test_teacher_can_bulk_create_grades(self, api_client, teacher_user):
+        course = CourseFactory(teacher=teacher_user.teacher_profile)
+        api_client.force_authenticate(user=teacher_user)
+        response = api_client.post(reverse('grade-list'), self.grade_rows(course, 5), format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data) == 5
+        assert all(row['id'] and row['teacher'] == teacher_user.teacher_profile.id for row in response.data)
+        assert Grade.objects.filter(course=course, teacher=teacher_user.teacher_profile).count() == 5
+    
+    def test_bulk_query_count_is_independent_of_rows(self, api_client, admin_user):
+        course = CourseFactory()
+        small, large = self.grade_rows(course, 2), self.grade_rows(course, 20)
+        api_client.force_authenticate(user=admin_user)
+        
+        with CaptureQueriesContext(connection) as small_queries:
+            api_client.post(reverse('grade-list'), small, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            response = api_client.post(reverse('grade-list'), large, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(large_queries) == len(small_queries)
+    
+    def test_bulk_reports_errors_per_row(self, api_client, admin_user):
+        course = CourseFactory()
+        graded = GradeFactory(course=course)
+        rows = self.grade_rows(course, 2)
+        rows += [
+            {'student_id': graded.student.id, 'course_id': course.id, 'value': 'A'},
+            dict(rows[0]),
+            {'student_id': 999999, 'course_id': course.id, 'value': 'A'},
+            {'student_id': rows[1]['student_id'], 'course_id': 'x', 'value': 'Z'},
+        ]
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.post(reverse('grade-list'), rows, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.json()
+        assert errors[:2] == [{}, {}]
+        assert 'already has a grade' in errors[2]['non_field_errors'][0]
+        assert 'already has a grade' in errors[3]['non_field_errors'][0]
+        assert 'student_id' in errors[4]
+        assert set(errors[5]) == {'course_id', 'value'}
+        assert Grade.objects.count() == 1
+    
+    def test_bulk_dry_run_creates_nothing(self, api_client, admin_user):
+        course = CourseFactory()
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('grade-list') + '?dry_run=1'
+        response = api_client.post(url, self.grade_rows(course, 3), format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'count': 3}
+        assert not Grade.objects.exists()
+    
+    def test_bulk_enrollments_reject_inactive_courses(self, api_client, admin_user):
+        student = StudentProfileFactory()
+        active, inactive = CourseFactory(), CourseFactory(is_active=False)
+        api_client.force_authenticate(user=admin_user)
+        rows = [
+            {'student_id': student.id, 'course_id': active.id},
+            {'student_id': student.id, 'course_id': inactive.id},
+        ]
+        response = api_client.post(reverse('enrollment-list'), rows, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()[0] == {}
+        assert 'inactive' in response.json()[1]['non_field_errors'][0]
+        assert not Enrollment.objects.exists()
+    
+    def test_student_bulk_enrolls_themselves(self, api_client, student_user):
+        courses = CourseFactory.create_batch(3)
+        api_client.force_authenticate(user=student_user)
+        rows = [{'course_id': course.id} for course in courses]
+        response = api_client.post(reverse('enrollment-list'), rows, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Enrollment.objects.filter(student=student_user.student_profile).count() == 3
+        
+        response = api_client.post(reverse('enrollment-list'), rows[:1], format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'already enrolled' in response.json()[0]['non_field_errors'][0]
+    
+    def test_bulk_rejects_oversized_batches(self, api_client, admin_user, settings):
+        settings.BULK_CREATE_MAX_ROWS = 2
+        course = CourseFactory()
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.post(reverse('grade-list'), self.grade_rows(course, 3), format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Grade.objects.exists()
+
+
+@pytest.mark.django_db
+class TestGradebook:
+    """Tests for uploading a course gradebook CSV."""
+    
+    def upload(self, api_client, course, lines, **params):
+        url = reverse('course-gradebook', args=[course.id])
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        content = '\n'.join(['enrollment_number,grade'] + lines).encode()
+        upload = SimpleUploadedFile('grades.csv', content, content_type='text/csv')
+        return api_client.post(url, {'file': upload}, format='multipart')
+    
+    @pytest.fixture
+    def roster(self, teacher_user):
+        course = CourseFactory(teacher=teacher_user.teacher_profile)
+        students = [EnrollmentFactory(course=course).student for _ in range(4)]
+        GradeFactory(student=students[0], course=course, value='A')
+        GradeFactory(student=students[1], course=course, value='C')
+        return course, [student.enrollment_number for student in students]
+    
+    def test_dry_run_reports_diff(self, api_client, teacher_user, roster):
+        course, numbers = roster
+        api_client.force_authenticate(user=teacher_user)
+        response = self.upload(api_client, course, [
+            f'{numbers[0]},a', f'{numbers[1]},B', f'{numbers[2]},D',
+            'ENR999999,A', f'{numbers[3]},Q', f'{numbers[2]},C',
+        ], dry_run=1)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert [row['enrollment_number'] for row in response.data['unchanged']] == [numbers[0]]
+        assert response.data['changed'] == [
+            {'line': 3, 'enrollment_number': numbers[1], 'grade': 'B', 'previous': 'C'}
+        ]
+        assert [row['enrollment_number'] for row in response.data['inserted']] == [numbers[2]]
+        assert [row['line'] for row in response.data['rejected']] == [5, 6, 7]
+        assert not Grade.objects.filter(course=course, value='B').exists()
+    
+    def test_upload_upserts_grades(self, api_client, teacher_user, roster):
+        course, numbers = roster
+        api_client.force_authenticate(user=teacher_user)
+        lines = [f'{numbers[0]},A', f'{numbers[1]},B', f'{numbers[2]},D', f'{numbers[3]},F']
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(api_client, course, lines)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['inserted']) == 2
+        grades = dict(Grade.objects.filter(course=course).values_list('student__enrollment_number', 'value'))
+        assert grades == dict(zip(numbers, 'ABDF'))
+        assert Grade.objects.filter(course=course, teacher=teacher_user.teacher_profile).count() == 3
+        assert sum('INSERT' in query['sql'] for query in queries.captured_queries) == 1
+    
+    def test_rejected_rows_block_upload(self, api_client, teacher_user, roster):
+        course, numbers = roster
+        api_client.force_authenticate(user=teacher_user)
+        response = self.upload(api_client, course, [f'{numbers[2]},B', 'ENR999999,A'])
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['rejected'][0]['error'] == 'Student is not enrolled in this course.'
+        assert Grade.objects.filter(course=course).count() == 2
+    
+    def test_missing_columns_rejected(self, api_client, admin_user, roster):
+        course, _ = roster
+        api_client.force_authenticate(user=admin_user)
+        upload = SimpleUploadedFile('grades.csv', b'student,value\nENR1,A\n')
+        response = api_client.post(reverse('course-gradebook', args=[course.id]), {'file': upload})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'enrollment_number' in response.data['error']
+    
+    def test_teacher_cannot_upload_other_courses(self, api_client, teacher_user):
+        course = CourseFactory()
+        api_client.force_authenticate(user=teacher_user)
+        
+        assert self.upload(api_client, course, []).status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_student_cannot_upload(self, api_client, student_user, roster):
+        course, _ = roster
+        api_client.force_authenticate(user=student_user)
+        
+        assert self.upload(api_client, course, []).status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestStudentImport:
+    """Tests for bulk student imports."""
+    
+    ROSTER = (
+        'username,email,password,first_name,last_name,date_of_birth\n'
+        'fresh1,fresh1@example.com,,Ada,Lovelace,2006-12-10\n'
+        'fresh2,fresh2@example.com,,Alan,Turing,\n'
+        'fresh3,not-an-email,,,,\n'
+        'fresh4,fresh1@example.com,,,,\n'
+        'fresh5,fresh5@example.com,123,,,\n'
+    )
+    
+    def test_command_imports_students(self, tmp_path):
+        path = tmp_path / 'roster.csv'
+        path.write_text(self.ROSTER)
+        out = io.StringIO()
+        
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_students', str(path), '--workers=0', '--batch-size=3', stdout=out)
+        
+        profiles = StudentProfile.objects.select_related('user').order_by('user__username')
+        assert [profile.user.username for profile in profiles] == ['fresh1', 'fresh2']
+        assert all(profile.enrollment_number == f'ENR{profile.user_id:06d}' for profile in profiles)
+        assert profiles[0].date_of_birth == date(2006, 12, 10)
+        assert profiles[1].date_of_birth == date(2000, 1, 1)
+        assert not profiles[0].user.has_usable_password()
+        # One batch with valid rows, inserting users and profiles in one statement each
+        inserts = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        assert sum('search_index' not in sql for sql in inserts) == 2
+        assert 'Imported 2 students' in out.getvalue()
+        assert '2 rejected' not in out.getvalue()
+        assert '3 rejected' in out.getvalue()
+    
+    def test_import_rejects_taken_usernames(self, tmp_path, student_user):
+        path = tmp_path / 'roster.csv'
+        path.write_text(f'username,email\n{student_user.username},other@example.com\n')
+        out = io.StringIO()
+        
+        call_command('import_students', str(path), '--workers=0', stdout=out)
+        
+        assert 'line 2' in out.getvalue() and 'username already exists' in out.getvalue()
+        assert StudentProfile.objects.count() == 1
+    
+    def test_passwords_are_hashed_in_worker_processes(self, tmp_path):
+        path = tmp_path / 'roster.ndjson'
+        path.write_text(
+            json.dumps({'username': 'hashed', 'email': 'hashed@example.com', 'password': 'Correct-Horse-42'})
+            + '\n'
+        )
+        
+        call_command('import_students', str(path), '--workers=2', stdout=io.StringIO())
+        
+        assert User.objects.get(username='hashed').check_password('Correct-Horse-42')
+    
+    def test_admin_can_import_ndjson(self, api_client, admin_user, settings, monkeypatch):
+        # Uploads hash in the request's process, whatever the setting
+        settings.IMPORT_HASH_WORKERS = 4
+        monkeypatch.setattr('students.imports.ProcessPoolExecutor', None)
+        roster = '\n'.join([
+            json.dumps({'username': 'nd1', 'email': 'nd1@example.com', 'phone_number': '+123456789'}),
+            '{not json',
+            json.dumps({'username': 'nd2', 'email': 'nd2@example.com', 'phone_number': 'call me'}),
+        ]).encode()
+        api_client.force_authenticate(user=admin_user)
+        upload = SimpleUploadedFile('roster.ndjson', roster)
+        response = api_client.post(reverse('user-import-students'), {'file': upload})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 1
+        assert [error['line'] for error in response.data['errors']] == [2, 3]
+        assert 'phone_number' in response.data['errors'][1]['errors']
+        assert StudentProfile.objects.get(user__username='nd1').phone_number == '+123456789'
+    
+    def test_large_uploads_are_refused(self, api_client, admin_user, settings):
+        settings.IMPORT_UPLOAD_MAX_ROWS = 4
+        api_client.force_authenticate(user=admin_user)
+        
+        upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode())
+        response = api_client.post(reverse('user-import-students'), {'file': upload})
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert not User.objects.filter(username__startswith='fresh').exists()
+        
+        settings.IMPORT_UPLOAD_MAX_ROWS = 5
+        upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode())
+        response = api_client.post(reverse('user-import-students'), {'file': upload})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 2
+    
+    def test_teacher_cannot_import(self, api_client, teacher_user):
+        api_client.force_authenticate(user=teacher_user)
+        upload = SimpleUploadedFile('roster.csv', b'username,email\n')
+        response = api_client.post(reverse('user-import-students'), {'file': upload})
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestFlexFields:
+    """Tests for sparse fieldsets and opt-in expansion."""
+    
+    def test_details_omitted_by_default(self, api_client, admin_user):
+        GradeFactory()
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('grade-list'))
+        
+        grade = response.data['results'][0]
+        assert 'student_detail' not in grade
+        assert 'course_detail' not in grade
+        assert 'teacher_detail' not in grade
+        assert grade['value'] == 'A'
+    
+    def test_expand_nested_details(self, api_client, admin_user):
+        GradeFactory()
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('grade-list')
+        
+        response = api_client.get(url, {'expand': 'student_detail,course_detail'})
+        grade = response.data['results'][0]
+        assert grade['student_detail']['user']['username']
+        assert 'teacher_detail' not in grade['course_detail']
+        
+        response = api_client.get(url, {'expand': 'course_detail.teacher_detail'})
+        grade = response.data['results'][0]
+        assert grade['course_detail']['teacher_detail']['user']['username']
+    
+    def test_sparse_fieldsets(self, api_client, admin_user):
+        EnrollmentFactory()
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('enrollment-list'), {
+            'fields': 'id,student_detail.enrollment_number,course_detail.code',
+            'expand': 'student_detail,course_detail',
+        })
+        
+        enrollment = response.data['results'][0]
+        assert set(enrollment) == {'id', 'student_detail', 'course_detail'}
+        assert set(enrollment['student_detail']) == {'enrollment_number'}
+        assert set(enrollment['course_detail']) == {'code'}
+    
+    def test_joins_follow_expansion(self, api_client, admin_user):
+        GradeFactory.create_batch(3)
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('grade-list')
+        
+        with CaptureQueriesContext(connection) as queries:
+            api_client.get(url)
+        assert not any('JOIN' in query['sql'] for query in queries.captured_queries)
+        
+        with CaptureQueriesContext(connection) as queries:
+            api_client.get(url, {'expand': 'student_detail,course_detail,teacher_detail'})
+        expanded_queries = len(queries.captured_queries)
+        GradeFactory.create_batch(3)
+        with CaptureQueriesContext(connection) as queries:
+            api_client.get(url, {'expand': 'student_detail,course_detail,teacher_detail'})
+        assert len(queries.captured_queries) == expanded_queries
+    
+    def test_fields_ignored_on_write(self, api_client, admin_user):
+        course = CourseFactory()
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('course-detail', args=[course.id]) + '?fields=id'
+        response = api_client.patch(url, {'title': 'Renamed'})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['title'] == 'Renamed'
+
+
+def read_streamed_csv(response):
+    content = b''.join(response.streaming_content).decode()
+    return list(csv.reader(io.StringIO(content)))
+
+
+def create_students(count, offset=0):
+    users = User.objects.bulk_create([
+        User(username=f'bulk{n}', email=f'bulk{n}@example.com', role='student')
+        for n in range(offset, offset + count)
+    ])
+    StudentProfile.objects.bulk_create([
+        StudentProfile(
+            user=user,
+            enrollment_number=f'BULK{n:07d}',
+            date_of_birth=date(2000, 1, 1),
+            address='1 Long Street, Somewhere ' * 4,
+        )
+        for n, user in enumerate(users, start=offset)
+    ])
+
+
+def peak_export_memory(api_client, url):
+    tracemalloc.start()
+    try:
+        response = api_client.get(url)
+        for _ in response.streaming_content:
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
 @pytest.mark.django_db
 class TestExports:
     """Tests for CSV export endpoints."""
@@ -287,4 +917,328 @@ class TestExports:
         response = api_client.get(url)
         
         assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_students_export_rows(self, api_client, admin_user):
+        students = StudentProfileFactory.create_batch(3)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_students'))
+        
+        assert response.streaming
+        rows = read_streamed_csv(response)
+        assert rows[0][0] == 'ID'
+        expected = [
+            [
+                str(s.id), s.user.username, s.user.email, s.user.first_name,
+                s.user.last_name, s.enrollment_number, str(s.date_of_birth),
+                s.phone_number, s.address,
+            ]
+            for s in sorted(students, key=lambda s: s.enrollment_number)
+        ]
+        assert rows[1:] == expected
+    
+    def test_grades_export_rows_and_course_filter(self, api_client, admin_user):
+        grade = GradeFactory(value='B')
+        GradeFactory(teacher=None)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_grades'))
+        
+        rows = read_streamed_csv(response)
+        assert len(rows) == 3
+        assert 'N/A' in [row[6] for row in rows[1:]]
+        
+        response = api_client.get(reverse('export_grades'), {'course_id': grade.course_id})
+        rows = read_streamed_csv(response)
+        assert rows[1:] == [[
+            str(grade.id), grade.student.user.username, grade.student.enrollment_number,
+            grade.course.code, grade.course.title, 'B', grade.teacher.user.username,
+            str(grade.graded_at),
+        ]]
+    
+    def test_export_header_sent_before_query(self, api_client, admin_user, django_assert_num_queries):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_grades'))
+        
+        with django_assert_num_queries(0):
+            first_chunk = next(iter(response.streaming_content))
+        assert first_chunk.startswith(b'ID,')
+    
+    def test_export_memory_stays_flat(self, api_client, admin_user, settings):
+        settings.EXPORT_CHUNK_SIZE = 100
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('export_students')
+        
+        create_students(200)
+        peak_export_memory(api_client, url)  # warm up imports and caches
+        small_peak = peak_export_memory(api_client, url)
+        create_students(4000, offset=200)
+        large_peak = peak_export_memory(api_client, url)
+        
+        # 20x the rows must not mean a proportionally larger peak
+        assert large_peak < small_peak * 2
+
+
+@pytest.mark.django_db
+class TestExportFormats:
+    """Tests for the export writers and format negotiation."""
+    
+    def test_ndjson_export(self, api_client, admin_user):
+        grade = GradeFactory(teacher=None)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_grades'), {'format': 'ndjson'})
+        
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        record = json.loads(lines[0])
+        assert record['id'] == grade.id
+        assert record['course_code'] == grade.course.code
+        assert record['teacher'] == 'N/A'
+    
+    def test_gzip_export(self, api_client, admin_user):
+        StudentProfileFactory.create_batch(3)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_students'), {'format': 'csv.gz'})
+        
+        assert response['Content-Type'] == 'application/gzip'
+        assert 'students.csv.gz' in response['Content-Disposition']
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        assert rows[0][0] == 'ID'
+        assert len(rows) == 4
+    
+    def test_xlsx_export(self, api_client, admin_user):
+        course = CourseFactory(code='CS<1>')
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_courses'), {'format': 'xlsx'})
+        
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        assert f'<c><v>{course.id}</v></c>' in sheet
+        assert 'CS&lt;1&gt;' in sheet
+        assert 'xl/workbook.xml' in archive.namelist()
+    
+    def test_format_from_accept_header(self, api_client, admin_user):
+        EnrollmentFactory()
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(
+            reverse('export_enrollments'), HTTP_ACCEPT='application/x-ndjson'
+        )
+        
+        assert response['Content-Type'] == 'application/x-ndjson'
+    
+    def test_unknown_format_not_found(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_grades'), {'format': 'pdf'})
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_errors_rendered_as_json(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_grades'), {'since': 'yesterday'})
+        
+        assert response['Content-Type'] == 'application/json'
+        assert 'error' in json.loads(response.content)
+
+
+@pytest.mark.django_db
+class TestDeltaExports:
+    """Tests for incremental exports driven by updated_at watermarks."""
+    
+    @pytest.fixture(autouse=True)
+    def no_lag(self, settings):
+        # Rows written by the test itself are committed at once
+        settings.EXPORT_DELTA_LAG = 0
+    
+    def test_full_export_returns_watermark(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_students'))
+        
+        assert response['X-Export-Watermark']
+        assert read_streamed_csv(response)[0][-1] == 'Address'
+    
+    def test_watermark_returns_only_changed_rows(self, api_client, admin_user):
+        unchanged, changed = StudentProfileFactory.create_batch(2)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_students'))
+        read_streamed_csv(response)
+        watermark = response['X-Export-Watermark']
+        
+        changed.address = 'New address'
+        changed.save()
+        created = StudentProfileFactory()
+        response = api_client.get(reverse('export_students'), {'watermark': watermark})
+        
+        rows = read_streamed_csv(response)
+        assert rows[0][-1] == 'Deleted'
+        assert sorted(row[0] for row in rows[1:]) == sorted([str(changed.id), str(created.id)])
+        assert all(row[-1] == 'N' for row in rows[1:])
+        assert response['X-Export-Watermark'] != watermark
+    
+    def test_user_only_changes_are_exported(self, api_client, admin_user):
+        unchanged, changed = StudentProfileFactory.create_batch(2)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export_students'))
+        read_streamed_csv(response)
+        watermark = response['X-Export-Watermark']
+        
+        user = User.objects.get(pk=changed.user_id)
+        user.email = 'renamed@example.com'
+        user.save()
+        response = api_client.get(reverse('export_students'), {'watermark': watermark})
+        
+        rows = read_streamed_csv(response)
+        assert [(row[0], row[2]) for row in rows[1:]] == [(str(changed.id), 'renamed@example.com')]
+    
+    def test_watermark_trails_open_transactions(self, api_client, admin_user, settings):
+        settings.EXPORT_DELTA_LAG = 60
+        api_client.force_authenticate(user=admin_user)
+        since = (timezone.now() - timedelta(minutes=5)).isoformat()
+        # Written by a transaction that started 10 seconds ago
+        late = StudentProfileFactory()
+        StudentProfile.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=10))
+        
+        response = api_client.get(reverse('export_students'), {'since': since})
+        assert read_streamed_csv(response)[1:] == []
+        
+        settings.EXPORT_DELTA_LAG = 0
+        response = api_client.get(reverse('export_students'), {'watermark': response['X-Export-Watermark']})
+        assert [row[0] for row in read_streamed_csv(response)[1:]] == [str(late.id)]
+    
+    def test_since_timestamp_and_tombstones(self, api_client, admin_user):
+        grade = GradeFactory()
+        deleted = GradeFactory(course=grade.course)
+        other_course = GradeFactory()
+        Grade.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        deleted_id = deleted.id
+        deleted.delete()
+        other_course.delete()
+        api_client.force_authenticate(user=admin_user)
+        
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = api_client.get(
+            reverse('export_grades'), {'since': since, 'course_id': grade.course_id}
+        )
+        
+        rows = read_streamed_csv(response)
+        assert rows[1:] == [[str(deleted_id), '', '', '', '', '', '', '', 'Y']]
+    
+    def test_invalid_watermark_rejected(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+        
+        response = api_client.get(reverse('export_grades'), {'watermark': 'forged'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = api_client.get(reverse('export_grades'), {'since': 'yesterday'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
 
+@pytest.mark.django_db
+class TestExportJobs:
+    """Tests for background export jobs."""
+    
+    @pytest.fixture(autouse=True)
+    def export_root(self, settings, tmp_path):
+        settings.EXPORT_ROOT = tmp_path
+        settings.EXPORT_CHUNK_SIZE = 2
+    
+    def test_admin_can_queue_and_download_export(self, api_client, admin_user):
+        grade = GradeFactory()
+        GradeFactory.create_batch(4)
+        api_client.force_authenticate(user=admin_user)
+        
+        response = api_client.post(reverse('export-job-list'), {'kind': 'grades', 'course_id': grade.course_id})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['status'] == 'pending'
+        assert response.data['download_url'] is None
+        job_id = response.data['id']
+        
+        call_command('run_export_worker', '--once', stdout=io.StringIO())
+        
+        response = api_client.get(reverse('export-job-detail', args=[job_id]))
+        assert response.data['status'] == 'completed'
+        assert response.data['total_rows'] == 1
+        assert response.data['row_count'] == 1
+        assert response.data['progress'] == 1.0
+        
+        response = api_client.get(reverse('export-job-download', args=[job_id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Accept-Ranges'] == 'bytes'
+        rows = read_streamed_csv(response)
+        assert rows[1][0] == str(grade.id)
+    
+    def test_worker_writes_all_rows_in_chunks(self, api_client, admin_user):
+        StudentProfileFactory.create_batch(5)
+        job = ExportJob.objects.create(kind='students', requested_by=admin_user)
+        
+        call_command('run_export_worker', '--once', stdout=io.StringIO())
+        
+        job.refresh_from_db()
+        assert job.status == ExportJob.STATUS_COMPLETED
+        assert job.row_count == job.total_rows == 5
+    
+    def test_download_supports_ranges(self, api_client, admin_user):
+        StudentProfileFactory.create_batch(2)
+        job = ExportJob.objects.create(kind='students', requested_by=admin_user)
+        call_command('run_export_worker', '--once', stdout=io.StringIO())
+        api_client.force_authenticate(user=admin_user)
+        url = reverse('export-job-download', args=[job.id])
+        full = b''.join(api_client.get(url).streaming_content)
+        
+        response = api_client.get(url, HTTP_RANGE='bytes=3-9')
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response['Content-Range'] == f'bytes 3-9/{len(full)}'
+        assert b''.join(response.streaming_content) == full[3:10]
+        
+        response = api_client.get(url, HTTP_RANGE='bytes=-5')
+        assert b''.join(response.streaming_content) == full[-5:]
+        
+        response = api_client.get(url, HTTP_RANGE=f'bytes={len(full)}-')
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    
+    def test_job_in_other_format(self, api_client, admin_user):
+        EnrollmentFactory.create_batch(3)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.post(
+            reverse('export-job-list'), {'kind': 'enrollments', 'file_format': 'ndjson.gz'}
+        )
+        call_command('run_export_worker', '--once', stdout=io.StringIO())
+        
+        response = api_client.get(reverse('export-job-download', args=[response.data['id']]))
+        assert response['Content-Type'] == 'application/gzip'
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        assert len(lines) == 3
+    
+    def test_jobs_of_dead_workers_fail(self, admin_user):
+        stale = ExportJob.objects.create(kind='students', status=ExportJob.STATUS_RUNNING, requested_by=admin_user)
+        ExportJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        partial = export_file_path(stale).with_name(export_file_path(stale).name + '.part')
+        partial.write_bytes(b'ID,')
+        busy = ExportJob.objects.create(kind='grades', status=ExportJob.STATUS_RUNNING, requested_by=admin_user)
+        pending = ExportJob.objects.create(kind='courses', requested_by=admin_user)
+        
+        assert claim_next_job() == pending
+        
+        stale.refresh_from_db()
+        assert stale.status == ExportJob.STATUS_FAILED
+        assert stale.error and stale.finished_at
+        assert not partial.exists()
+        busy.refresh_from_db()
+        assert busy.status == ExportJob.STATUS_RUNNING
+    
+    def test_download_before_completion_conflicts(self, api_client, admin_user):
+        job = ExportJob.objects.create(kind='students', requested_by=admin_user)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse('export-job-download', args=[job.id]))
+        
+        assert response.status_code == status.HTTP_409_CONFLICT
+    
+    def test_course_filter_only_for_grades(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.post(reverse('export-job-list'), {'kind': 'students', 'course_id': 1})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_non_admin_cannot_queue_export(self, api_client, teacher_user):
+        api_client.force_authenticate(user=teacher_user)
+        response = api_client.post(reverse('export-job-list'), {'kind': 'grades'})
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
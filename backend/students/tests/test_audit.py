@@ -0,0 +1,40 @@
+import pytest
+from students.audit import audit_viewsets, markdown_report, plan_flags, query_shape, seed_audit_data
+from students.urls import router
+
+
+def test_plan_flags():
+    plan = [
+        'SCAN grades',
+        'SEARCH courses USING INTEGER PRIMARY KEY (rowid=?)',
+        'SCAN subquery_1',
+        'USE TEMP B-TREE FOR ORDER BY',
+        '->  Seq Scan on enrollments  (cost=0.00..35.50 rows=2550 width=8)',
+    ]
+
+    assert [flag for flag, _ in plan_flags(plan)] == ['full_scan', 'temp_sort', 'full_scan']
+
+
+def test_query_shape_masks_literals():
+    first = query_shape("SELECT * FROM users WHERE id = 1 AND username = 'ada' AND id IN (1, 2)")
+    second = query_shape("SELECT * FROM users WHERE id = 22 AND username = 'o''hara' AND id IN (3)")
+
+    assert first == second
+
+
+@pytest.mark.django_db
+def test_audit_covers_every_viewset_and_persona():
+    personas = seed_audit_data(students=30, courses=6, teachers=2)
+
+    entries = audit_viewsets(router.registry, personas)
+
+    assert {entry['viewset'] for entry in entries} == {viewset.__name__ for _, viewset, _ in router.registry}
+    assert {entry['persona'] for entry in entries} == {'admin', 'teacher', 'student'}
+    grades_by_course = next(
+        entry for entry in entries
+        if entry['viewset'] == 'GradeViewSet' and entry['persona'] == 'admin' and 'course' in entry['params']
+    )
+    assert grades_by_course['status'] == 200
+    assert grades_by_course['queries'][0]['plan']
+    assert not any(flag['flag'] == 'n_plus_one' for entry in entries for flag in entry['flags'])
+    assert markdown_report(entries).startswith('# Query plan audit')
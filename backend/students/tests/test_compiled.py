@@ -0,0 +1,71 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from students.compiled import CompiledListMixin, compile_serializer
+from students.serializers import GradeSerializer, ExportJobSerializer
+from .factories import (
+    AdminUserFactory, CourseFactory, EnrollmentFactory, GradeFactory, StudentProfileFactory
+)
+
+
+PARITY_CASES = [
+    ('user-list', {}),
+    ('student-list', {}),
+    ('teacher-list', {}),
+    ('course-list', {}),
+    ('course-list', {'expand': 'teacher_detail'}),
+    ('enrollment-list', {}),
+    ('enrollment-list', {'expand': 'student_detail,course_detail.teacher_detail'}),
+    ('grade-list', {}),
+    ('grade-list', {'expand': 'student_detail,course_detail.teacher_detail,teacher_detail'}),
+    ('grade-list', {'fields': 'id,value,course_detail.code', 'expand': 'course_detail', 'ordering': 'value'}),
+]
+
+
+@pytest.fixture
+def admin_client():
+    client = APIClient()
+    client.force_authenticate(user=AdminUserFactory())
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name,params', PARITY_CASES)
+def test_compiled_list_matches_serializer(admin_client, monkeypatch, url_name, params):
+    GradeFactory.create_batch(3)
+    GradeFactory(teacher=None, course=CourseFactory(teacher=None), value='F')
+    EnrollmentFactory.create_batch(2)
+    StudentProfileFactory(phone_number='', address='')
+    url = reverse(url_name)
+
+    compiled = admin_client.get(url, params)
+    monkeypatch.setattr(CompiledListMixin, 'compiled_list', False)
+    serialized = admin_client.get(url, params)
+
+    assert compiled.status_code == serialized.status_code == 200
+    assert compiled.content == serialized.content
+
+
+@pytest.mark.django_db
+def test_compiled_list_matches_serializer_outside_utc(admin_client, monkeypatch, settings):
+    settings.TIME_ZONE = 'Asia/Phnom_Penh'
+    GradeFactory.create_batch(2)
+    url = reverse('grade-list')
+
+    compiled = admin_client.get(url)
+    monkeypatch.setattr(CompiledListMixin, 'compiled_list', False)
+    serialized = admin_client.get(url)
+
+    assert b'+07:00' in compiled.content
+    assert compiled.content == serialized.content
+
+
+def test_plan_is_built_once_per_serializer_options():
+    plan = compile_serializer(GradeSerializer, None, ('course_detail',))
+
+    assert compile_serializer(GradeSerializer, None, ('course_detail',)) is plan
+    assert 'course__code' in plan.lookups
+
+
+def test_method_fields_fall_back_to_serializer():
+    assert compile_serializer(ExportJobSerializer) is None
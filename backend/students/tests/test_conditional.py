@@ -0,0 +1,149 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from students import search
+from students.models import Enrollment, Grade
+from .factories import (
+    AdminUserFactory, CourseFactory, EnrollmentFactory, GradeFactory, TeacherProfileFactory, TeacherUserFactory,
+)
+
+
+@pytest.fixture
+def admin_client():
+    client = APIClient()
+    client.force_authenticate(user=AdminUserFactory())
+    return client
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def test_unchanged_list_is_not_modified_after_one_query(self, admin_client):
+        GradeFactory.create_batch(3)
+        url = reverse('grade-list')
+        etag = admin_client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert not response.content
+        # Only the validator: no rows are loaded or counted
+        assert len(queries.captured_queries) == 1
+        assert 'COUNT(' not in queries.captured_queries[0]['sql']
+
+    def test_unchanged_object_is_not_modified_after_one_query(self, admin_client):
+        course = CourseFactory()
+        url = reverse('course-detail', args=[course.pk])
+        etag = admin_client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+        assert len(queries.captured_queries) == 1
+
+    def test_updates_change_validators(self, admin_client):
+        course = CourseFactory()
+        list_etag = admin_client.get(reverse('course-list'))['ETag']
+        detail_etag = admin_client.get(reverse('course-detail', args=[course.pk]))['ETag']
+
+        course.title = 'Renamed'
+        course.save()
+
+        response = admin_client.get(reverse('course-list'), HTTP_IF_NONE_MATCH=list_etag)
+        assert response.status_code == 200
+        assert response['ETag'] != list_etag
+        response = admin_client.get(reverse('course-detail', args=[course.pk]), HTTP_IF_NONE_MATCH=detail_etag)
+        assert response.status_code == 200
+        assert response.data['title'] == 'Renamed'
+
+    def test_deletes_change_list_validators(self, admin_client):
+        older, newer = GradeFactory.create_batch(2)
+        url = reverse('grade-list')
+        etag = admin_client.get(url)['ETag']
+
+        # The newest updated_at is unchanged; the tombstone records the delete
+        older.delete()
+        response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert [row['id'] for row in response.data['results']] == [newer.pk]
+
+    def test_filters_and_users_have_their_own_validators(self, admin_client):
+        CourseFactory.create_batch(2)
+        url = reverse('course-list')
+        etag = admin_client.get(url)['ETag']
+
+        assert admin_client.get(url, {'search': 'x'})['ETag'] != etag
+        other = APIClient()
+        other.force_authenticate(user=AdminUserFactory())
+        assert other.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_if_modified_since(self, admin_client):
+        GradeFactory.create_batch(2)
+        changed = timezone.now() - timedelta(minutes=5)
+        Grade.objects.update(updated_at=changed)
+        url = reverse('grade-list')
+
+        response = admin_client.get(url)
+        assert response['Last-Modified'] == http_date(int(changed.timestamp()))
+
+        response = admin_client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+        response = admin_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(changed.timestamp() - 60))
+        assert response.status_code == 200
+
+    def test_scope_changes_through_other_tables_are_dated(self):
+        teacher = TeacherUserFactory()
+        enrollment = EnrollmentFactory(course=CourseFactory(teacher=teacher.teacher_profile))
+        Enrollment.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        client = APIClient()
+        client.force_authenticate(user=teacher)
+        url = reverse('enrollment-list')
+        assert len(client.get(url).data['results']) == 1
+
+        course = enrollment.course
+        course.teacher = TeacherProfileFactory()
+        course.save()
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() - 60))
+
+        assert response.status_code == 200
+        assert response.data['results'] == []
+
+    def test_searches_are_filtered_once(self, admin_client, monkeypatch):
+        CourseFactory(title='Algebra')
+        calls = []
+        original = search.rank
+        monkeypatch.setattr(search, 'rank', lambda *args: calls.append(args) or original(*args))
+
+        response = admin_client.get(reverse('course-list'), {'search': 'algebra'})
+
+        assert len(response.data['results']) == 1
+        assert len(calls) == 1
+
+    def test_fresh_changes_are_not_dated(self, admin_client):
+        # A Last-Modified within the current second could hide later changes
+        CourseFactory()
+
+        response = admin_client.get(reverse('course-list'))
+
+        assert 'ETag' in response
+        assert 'Last-Modified' not in response
+        assert response['Cache-Control'] == 'private, no-cache'
+
+    def test_expanded_responses_have_no_validators(self, admin_client):
+        GradeFactory()
+
+        response = admin_client.get(reverse('grade-list'), {'expand': 'course_detail'})
+
+        assert response.status_code == 200
+        assert 'ETag' not in response
@@ -1,5 +1,9 @@
+from datetime import timedelta
+
 import pytest
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from students.models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
 from .factories import (
     UserFactory, StudentUserFactory, TeacherUserFactory,
@@ -137,3 +141,100 @@ class TestGradeModel:
         grade = GradeFactory(value='A')
         assert 'A' in str(grade)
 
+
+
+def writes(queries):
+    """The UPDATE and INSERT statements among captured queries."""
+    return [query['sql'] for query in queries.captured_queries if query['sql'].startswith(('UPDATE', 'INSERT'))]
+
+
+@pytest.mark.django_db
+class TestDirtyFields:
+    """Tests for saving only changed columns."""
+    
+    def test_unchanged_save_writes_nothing(self):
+        profile = StudentProfile.objects.get(pk=StudentProfileFactory().pk)
+        updated_at = profile.updated_at
+        
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        
+        assert len(queries.captured_queries) == 0
+        profile.refresh_from_db()
+        assert profile.updated_at == updated_at
+    
+    def test_save_writes_changed_columns_only(self):
+        profile = StudentProfile.objects.get(pk=StudentProfileFactory().pk)
+        profile.address = 'Somewhere else'
+        
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        
+        [update] = writes(queries)
+        assert '"address"' in update and '"updated_at"' in update
+        assert '"enrollment_number"' not in update and '"phone_number"' not in update
+        assert StudentProfile.objects.get(pk=profile.pk).address == 'Somewhere else'
+        
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        assert len(queries.captured_queries) == 0
+    
+    def test_user_save_skips_unchanged_profile(self):
+        user = User.objects.select_related('student_profile').get(pk=StudentProfileFactory().user_id)
+        user.first_name = 'Changed'
+        
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        
+        [update, touch] = writes(queries)
+        assert update.startswith('UPDATE "users"') and '"first_name"' in update
+        assert '"password"' not in update
+        # The exported first_name changed, so only updated_at is written
+        assert touch.startswith('UPDATE "student_profiles" SET "updated_at"')
+        assert '"address"' not in touch
+    
+    def test_user_save_does_not_load_profile(self):
+        user = User.objects.get(pk=StudentProfileFactory().user_id)
+        user.is_staff = True
+        
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        
+        assert not any('student_profiles' in query['sql'] for query in queries.captured_queries)
+    
+    def test_exported_user_changes_touch_unloaded_profile(self):
+        profile = StudentProfileFactory()
+        StudentProfile.objects.filter(pk=profile.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        user = User.objects.get(pk=profile.user_id)
+        
+        user.last_login = timezone.now()
+        user.save()
+        touched = StudentProfile.objects.get(pk=profile.pk).updated_at
+        assert touched < timezone.now() - timedelta(hours=1)
+        
+        user.email = 'moved@example.com'
+        user.save()
+        assert StudentProfile.objects.get(pk=profile.pk).updated_at > touched
+    
+    def test_profile_changes_are_saved_with_the_user(self):
+        user = User.objects.select_related('student_profile').get(pk=StudentProfileFactory().user_id)
+        user.last_name = 'Changed'
+        user.student_profile.phone_number = '+1234567890'
+        
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        
+        assert [sql.split()[1] for sql in writes(queries)] == ['"users"', '"student_profiles"']
+        assert StudentProfile.objects.get(user=user).phone_number == '+1234567890'
+    
+    def test_deferred_fields_are_tracked_once_loaded(self):
+        user = User.objects.only('id', 'username').get(pk=UserFactory().pk)
+        assert user.email  # loads the deferred field
+        
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        assert writes(queries) == []
+        
+        user.email = 'moved@example.com'
+        user.save()
+        assert User.objects.get(pk=user.pk).email == 'moved@example.com'
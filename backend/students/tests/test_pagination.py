@@ -0,0 +1,182 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from students import counts
+from students.models import Course, Grade
+from students.pagination import KeysetPagination, estimate_count
+from .factories import AdminUserFactory, CourseFactory, GradeFactory, StudentProfileFactory, TeacherUserFactory
+
+
+@pytest.fixture
+def admin_client():
+    client = APIClient()
+    client.force_authenticate(user=AdminUserFactory())
+    return client
+
+
+def walk(client, url, params, link='next'):
+    """Follow next (or previous) links from url, returning every page's ids."""
+    pages = []
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        pages.append([row['id'] for row in response.data['results']])
+        if not response.data[link]:
+            return pages, response
+        response = client.get(response.data[link])
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+
+    def test_pages_cover_every_row_in_order(self, admin_client):
+        grades = GradeFactory.create_batch(8)
+        # Ties on the sort key are broken by primary key
+        Grade.objects.filter(pk__in=[grade.pk for grade in grades[:5]]).update(graded_at=grades[0].graded_at)
+        expected = list(Grade.objects.order_by('-graded_at', '-pk').values_list('pk', flat=True))
+
+        pages, last = walk(admin_client, reverse('grade-list'), {'cursor': '', 'page_size': 3})
+
+        assert [len(page) for page in pages] == [3, 3, 2]
+        assert sum(pages, []) == expected
+        assert 'count' not in last.data
+
+        back, first = walk(admin_client, last.data['previous'], {}, link='previous')
+        assert back == pages[-2::-1]
+        assert first.data['previous'] is None
+
+    def test_cursor_follows_requested_ordering(self, admin_client):
+        for value in 'CABDF':
+            GradeFactory(value=value)
+
+        pages, _ = walk(admin_client, reverse('grade-list'), {'cursor': '', 'page_size': 2, 'ordering': 'value', 'fields': 'id'})
+
+        expected = list(Grade.objects.order_by('value', 'pk').values_list('pk', flat=True))
+        assert sum(pages, []) == expected
+
+    def test_deep_pages_use_no_offset(self, admin_client):
+        GradeFactory.create_batch(3)
+        first = admin_client.get(reverse('grade-list'), {'cursor': '', 'page_size': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.get(first.data['next'])
+
+        assert response.status_code == 200
+        assert not any('OFFSET' in query['sql'] or 'COUNT(' in query['sql'] for query in queries.captured_queries)
+
+    def test_page_size_is_capped(self, admin_client, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'MAX_PAGE_SIZE': 2}
+        GradeFactory.create_batch(3)
+
+        response = admin_client.get(reverse('grade-list'), {'page_size': 500})
+
+        assert len(response.data['results']) == 2
+
+    def test_tampered_or_mismatched_cursor_is_rejected(self, admin_client):
+        GradeFactory.create_batch(2)
+        url = reverse('grade-list')
+        cursor = admin_client.get(url, {'cursor': '', 'page_size': 1}).data['next'].split('cursor=')[1]
+
+        assert admin_client.get(url, {'cursor': cursor[:-2] + 'xx'}).status_code == 404
+        assert admin_client.get(url, {'cursor': cursor, 'ordering': 'value'}).status_code == 404
+
+
+@pytest.mark.django_db
+class TestPageNumberCompatibility:
+
+    def test_page_numbers_are_the_default(self, admin_client):
+        CourseFactory.create_batch(3)
+
+        response = admin_client.get(reverse('course-list'), {'page_size': 2})
+
+        assert response.data['count'] == 3
+        assert 'page=2' in response.data['next']
+
+    def test_page_numbers_report_count(self, admin_client):
+        CourseFactory.create_batch(5)
+        url = reverse('course-list')
+
+        response = admin_client.get(url, {'page': 2, 'page_size': 2})
+
+        assert response.data['count'] == 5
+        assert response.data['count_exact'] is True
+        codes = sorted(Course.objects.values_list('code', flat=True))
+        assert [course['code'] for course in response.data['results']] == codes[2:4]
+        assert 'page=3' in response.data['next']
+        assert 'page=' not in response.data['previous']
+        assert admin_client.get(url, {'page': 9}).status_code == 404
+
+    def test_counts_past_limit_are_estimated(self):
+        GradeFactory.create_batch(3)
+
+        assert estimate_count(Grade.objects.all(), 5) == (3, True)
+        assert estimate_count(Grade.objects.all(), 2) == (3, False)
+
+
+def count_queries(queries):
+    return sum('COUNT(' in query['sql'] for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+class TestCachedCounts:
+
+    def test_counts_are_cached_until_rows_change(self, admin_client):
+        CourseFactory.create_batch(3)
+        url = reverse('course-list')
+        assert admin_client.get(url, {'page': 1}).data['count'] == 3
+
+        with CaptureQueriesContext(connection) as queries:
+            assert admin_client.get(url, {'page': 1}).data['count'] == 3
+        assert count_queries(queries) == 0
+
+        CourseFactory()
+        assert admin_client.get(url, {'page': 1}).data['count'] == 4
+        Course.objects.first().delete()
+        assert admin_client.get(url, {'page': 1}).data['count'] == 3
+
+    def test_filters_and_role_scopes_are_counted_separately(self, admin_client):
+        teacher_user = TeacherUserFactory()
+        CourseFactory.create_batch(2, teacher=teacher_user.teacher_profile)
+        CourseFactory(is_active=False)
+        teacher_client = APIClient()
+        teacher_client.force_authenticate(user=teacher_user)
+        url = reverse('course-list')
+
+        assert admin_client.get(url, {'page': 1}).data['count'] == 3
+        assert admin_client.get(url, {'page': 1, 'is_active': 'false'}).data['count'] == 1
+        assert teacher_client.get(url, {'page': 1}).data['count'] == 2
+
+    def test_bulk_writes_invalidate_counts(self, admin_client):
+        course = CourseFactory()
+        GradeFactory(course=course)
+        url = reverse('grade-list')
+        assert admin_client.get(url, {'page': 1}).data['count'] == 1
+
+        rows = [
+            {'student_id': student.id, 'course_id': course.id, 'value': 'B'}
+            for student in StudentProfileFactory.create_batch(2)
+        ]
+        assert admin_client.post(url, rows, format='json').status_code == 201
+        assert admin_client.get(url, {'page': 1}).data['count'] == 3
+
+    def test_counts_past_limit_are_flagged(self, admin_client, monkeypatch):
+        monkeypatch.setattr(KeysetPagination, 'count_limit', 2)
+        GradeFactory.create_batch(3)
+
+        response = admin_client.get(reverse('grade-list'), {'page': 1})
+
+        assert response.data['count_exact'] is False
+
+    def test_large_unfiltered_lists_use_planner_estimate(self, admin_client, monkeypatch, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 1000
+        monkeypatch.setattr(counts, 'planner_estimate', lambda queryset: 5000)
+        CourseFactory.create_batch(2)
+        url = reverse('course-list')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.get(url, {'page': 1})
+        assert (response.data['count'], response.data['count_exact']) == (5000, False)
+        assert count_queries(queries) == 0
+        assert admin_client.get(url, {'page': 1, 'is_active': 'true'}).data['count'] == 2
@@ -0,0 +1,147 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from students.models import ExportJob
+from .factories import AdminUserFactory, EnrollmentFactory, GradeFactory
+
+
+def columns(table, *names):
+    return {f'{table}.{name}' for name in names}
+
+
+TIMESTAMPS = ('created_at', 'updated_at')
+USER = ('id', 'username', 'email', 'role', 'first_name', 'last_name', 'date_joined')
+STUDENT = ('id', 'user_id', 'enrollment_number', 'date_of_birth', 'phone_number', 'address') + TIMESTAMPS
+TEACHER = ('id', 'user_id', 'department') + TIMESTAMPS
+COURSE = ('id', 'title', 'code', 'description', 'teacher_id', 'is_active') + TIMESTAMPS
+ENROLLMENT = ('id', 'student_id', 'course_id', 'enrolled_at') + TIMESTAMPS
+GRADE = ('id', 'student_id', 'course_id', 'teacher_id', 'value', 'graded_at') + TIMESTAMPS
+EXPORT_JOB = (
+    'id', 'kind', 'file_format', 'params', 'status', 'requested_by_id', 'total_rows',
+    'row_count', 'file_name', 'error', 'started_at', 'finished_at'
+) + TIMESTAMPS
+
+
+# (basename, query params, columns the detail query selects, columns the list
+# query selects). List actions read rows through a compiled values_list()
+# plan, which takes related keys from the foreign key columns instead of
+# selecting the joined tables' primary keys.
+PROJECTIONS = [
+    ('user', {}, columns('users', *USER), columns('users', *USER)),
+    (
+        'student',
+        {},
+        columns('student_profiles', *STUDENT) | columns('users', *USER),
+        columns('student_profiles', *STUDENT) | columns('users', *USER[1:]),
+    ),
+    (
+        'teacher',
+        {},
+        columns('teacher_profiles', *TEACHER) | columns('users', *USER),
+        columns('teacher_profiles', *TEACHER) | columns('users', *USER[1:]),
+    ),
+    ('course', {}, columns('courses', *COURSE), columns('courses', *COURSE)),
+    (
+        'course',
+        {'expand': 'teacher_detail'},
+        columns('courses', *COURSE) | columns('teacher_profiles', *TEACHER) | columns('users', *USER),
+        columns('courses', *COURSE) | columns('teacher_profiles', *TEACHER[1:]) | columns('users', *USER[1:]),
+    ),
+    (
+        'course',
+        {'fields': 'code,title'},
+        columns('courses', 'id', 'code', 'title'),
+        columns('courses', 'code', 'title'),
+    ),
+    ('enrollment', {}, columns('enrollments', *ENROLLMENT), columns('enrollments', *ENROLLMENT)),
+    (
+        'enrollment',
+        {'fields': 'id,student_detail.user.username,course_detail.code', 'expand': 'student_detail,course_detail'},
+        columns('enrollments', 'id', 'student_id', 'course_id')
+        | columns('student_profiles', 'id', 'user_id')
+        | columns('users', 'id', 'username')
+        | columns('courses', 'id', 'code'),
+        columns('enrollments', 'id', 'student_id', 'course_id')
+        | columns('student_profiles', 'user_id')
+        | columns('users', 'username')
+        | columns('courses', 'code'),
+    ),
+    ('grade', {}, columns('grades', *GRADE), columns('grades', *GRADE)),
+    (
+        'grade',
+        {'fields': 'id,value,teacher_detail.department', 'expand': 'teacher_detail'},
+        columns('grades', 'id', 'value', 'teacher_id') | columns('teacher_profiles', 'id', 'department'),
+        columns('grades', 'id', 'value', 'teacher_id') | columns('teacher_profiles', 'department'),
+    ),
+    ('export-job', {}, columns('export_jobs', *EXPORT_JOB), columns('export_jobs', *EXPORT_JOB)),
+]
+
+
+def selected_columns(sql):
+    """
+    Parse the column list of a SELECT statement into table.column names,
+    leaving out the sort keys keyset pagination reads back.
+    """
+    select = sql[len('SELECT '):sql.index(' FROM ')]
+    columns = {column.strip().replace('"', '') for column in select.split(', ')}
+    return {column for column in columns if ' AS keyset_' not in column}
+
+
+def main_query(queries, table):
+    """
+    The SELECT that loads the rows, skipping pagination COUNT queries and
+    conditional GET validators.
+    """
+    for query in queries:
+        sql = query['sql']
+        if (
+            sql.startswith('SELECT') and not sql.startswith('SELECT (SELECT MAX(')
+            and 'COUNT(' not in sql and f'FROM "{table}"' in sql
+        ):
+            return sql
+    raise AssertionError(f'No query against {table}')
+
+
+@pytest.fixture
+def objects():
+    grade = GradeFactory()
+    return {
+        'user': AdminUserFactory(),
+        'student': grade.student,
+        'teacher': grade.teacher,
+        'course': grade.course,
+        'enrollment': EnrollmentFactory(),
+        'grade': grade,
+        'export-job': ExportJob.objects.create(kind='grades'),
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action', ['list', 'detail'])
+@pytest.mark.parametrize('basename,params,detail_columns,list_columns', PROJECTIONS)
+def test_viewset_projection(objects, basename, params, detail_columns, list_columns, action):
+    client = APIClient()
+    client.force_authenticate(user=objects['user'])
+    obj = objects[basename]
+    url = reverse(f'{basename}-list') if action == 'list' else reverse(f'{basename}-detail', args=[obj.pk])
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+
+    assert response.status_code == 200
+    table = obj._meta.db_table
+    expected = list_columns if action == 'list' else detail_columns
+    assert selected_columns(main_query(queries.captured_queries, table)) == expected
+
+
+@pytest.mark.django_db
+def test_projection_never_selects_passwords(objects):
+    client = APIClient()
+    client.force_authenticate(user=objects['user'])
+
+    with CaptureQueriesContext(connection) as queries:
+        client.get(reverse('grade-list'), {'expand': 'student_detail,course_detail.teacher_detail,teacher_detail'})
+
+    assert not any('password' in query['sql'] for query in queries.captured_queries)
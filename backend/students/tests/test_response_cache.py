@@ -0,0 +1,118 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from students.models import User
+from students.response_cache import reset_response_cache_stats, response_cache_stats
+from .factories import AdminUserFactory, CourseFactory, StudentUserFactory, TeacherUserFactory
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def course_ids(client, **params):
+    response = client.get(reverse('course-list'), params)
+    assert response.status_code == 200
+    return sorted(row['id'] for row in response.data['results'])
+
+
+@pytest.fixture(autouse=True)
+def stats():
+    reset_response_cache_stats()
+    yield
+    reset_response_cache_stats()
+
+
+@pytest.mark.django_db
+class TestCourseCatalogCache:
+
+    def test_students_share_the_catalog(self):
+        courses = CourseFactory.create_batch(3)
+        first, second = StudentUserFactory(), StudentUserFactory()
+
+        assert course_ids(client_for(first)) == sorted(course.pk for course in courses)
+        with CaptureQueriesContext(connection) as queries:
+            response = client_for(second).get(reverse('course-list'), {'expand': 'teacher_detail'})
+            response = client_for(second).get(reverse('course-list'), {'expand': 'teacher_detail'})
+
+        assert len(response.data['results']) == 3
+        assert response_cache_stats() == {'course': {'hits': 1, 'misses': 2}}
+        # Only the first expanded list queried courses, for its rows and count
+        assert sum('FROM "courses"' in query['sql'] for query in queries.captured_queries) == 2
+
+    def test_scopes_are_never_shared(self):
+        teacher = TeacherUserFactory()
+        taught = CourseFactory(teacher=teacher.teacher_profile, is_active=False)
+        other = CourseFactory()
+        inactive = CourseFactory(is_active=False)
+
+        assert course_ids(client_for(AdminUserFactory())) == sorted([taught.pk, other.pk, inactive.pk])
+        assert course_ids(client_for(teacher)) == [taught.pk]
+        assert course_ids(client_for(TeacherUserFactory())) == []
+        assert course_ids(client_for(StudentUserFactory())) == [other.pk]
+        # An admin filter selecting the student scope's rows is still its own entry
+        assert course_ids(client_for(AdminUserFactory()), is_active='true') == [other.pk]
+        assert response_cache_stats()['course']['hits'] == 0
+
+    def test_query_parameters_have_their_own_entries(self):
+        student = client_for(StudentUserFactory())
+        first = CourseFactory(code='CS101')
+        second = CourseFactory(code='MA201')
+
+        assert course_ids(student) == sorted([first.pk, second.pk])
+        assert course_ids(student, code='CS') == [first.pk]
+        assert course_ids(student, code='MA') == [second.pk]
+        assert response_cache_stats()['course'] == {'hits': 0, 'misses': 3}
+
+    def test_course_teacher_and_user_writes_invalidate(self):
+        course = CourseFactory(title='Algebra')
+        student = client_for(StudentUserFactory())
+        url = reverse('course-list')
+
+        def teacher_detail():
+            return student.get(url, {'expand': 'teacher_detail'}).data['results'][0]
+
+        teacher_detail()
+        course.title = 'Linear Algebra'
+        course.save()
+        assert teacher_detail()['title'] == 'Linear Algebra'
+
+        profile = course.teacher
+        profile.department = 'Mathematics'
+        profile.save()
+        assert teacher_detail()['teacher_detail']['department'] == 'Mathematics'
+
+        user = profile.user
+        user.first_name = 'Ada'
+        user.save()
+        assert teacher_detail()['teacher_detail']['user']['first_name'] == 'Ada'
+
+        course.delete()
+        assert student.get(url).data['results'] == []
+        assert response_cache_stats()['course']['hits'] == 0
+
+    def test_logins_keep_the_catalog(self):
+        course = CourseFactory()
+        student = client_for(StudentUserFactory())
+        course_ids(student)
+        
+        user = User.objects.get(pk=course.teacher.user_id)
+        user.set_password('rehashed')
+        user.last_login = timezone.now()
+        user.save()
+        
+        assert course_ids(student) == [course.pk]
+        assert response_cache_stats()['course'] == {'hits': 1, 'misses': 1}
+    
+    def test_stats_are_admin_only(self):
+        course_ids(client_for(StudentUserFactory()))
+
+        assert client_for(StudentUserFactory()).get(reverse('course-cache-stats')).status_code == 403
+        response = client_for(AdminUserFactory()).get(reverse('course-cache-stats'))
+        assert response.status_code == 200
+        assert response.data == {'course': {'hits': 0, 'misses': 1}}
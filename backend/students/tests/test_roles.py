@@ -0,0 +1,94 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from students.models import User
+from students.roles import RoleContext
+from students.token_serializers import CustomTokenObtainPairSerializer
+from .factories import CourseFactory, EnrollmentFactory, GradeFactory, TeacherUserFactory
+
+
+def profile_lookups(queries):
+    """Queries fetching a profile by its user, as hasattr(user, ...) does."""
+    return [
+        query['sql'] for query in queries.captured_queries
+        if '_profiles"."user_id" =' in query['sql'] and 'JOIN' not in query['sql']
+    ]
+
+
+def validator_queries(name, action):
+    """Queries a conditional GET validator adds (see conditional.py)."""
+    return int(action == 'list' and name in ('course', 'enrollment', 'grade'))
+
+
+@pytest.fixture
+def school():
+    teacher = TeacherUserFactory().teacher_profile
+    course = CourseFactory(teacher=teacher)
+    enrollment = EnrollmentFactory(course=course)
+    grade = GradeFactory(course=course, student=enrollment.student, teacher=teacher)
+    return {
+        'teacher': teacher.user,
+        'student': enrollment.student.user,
+        'objects': {
+            'student': enrollment.student.pk,
+            'teacher': teacher.pk,
+            'course': course.pk,
+            'enrollment': enrollment.pk,
+            'grade': grade.pk,
+        },
+    }
+
+
+@pytest.mark.django_db
+class TestRoleContext:
+
+    @pytest.mark.parametrize('persona', ['teacher', 'student'])
+    @pytest.mark.parametrize('name', ['student', 'teacher', 'course', 'enrollment', 'grade'])
+    @pytest.mark.parametrize('action', ['list', 'detail'])
+    def test_profile_is_resolved_at_most_once(self, school, persona, name, action):
+        # A user loaded from the database, with no profile cached yet
+        client = APIClient()
+        client.force_authenticate(user=User.objects.get(pk=school[persona].pk))
+        if action == 'list':
+            url = reverse(f'{name}-list')
+        else:
+            url = reverse(f'{name}-detail', args=[school['objects'][name]])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+
+        assert response.status_code in (200, 404)
+        assert len(profile_lookups(queries)) <= 1
+        # The profile lookup plus the list or object query, and on lists
+        # the page count and the conditional GET validator where they have one
+        assert len(queries.captured_queries) <= 2 + int(action == 'list') + validator_queries(name, action)
+
+    @pytest.mark.parametrize('persona', ['teacher', 'student'])
+    @pytest.mark.parametrize('name', ['student', 'teacher', 'course', 'enrollment', 'grade'])
+    def test_token_users_need_no_profile_queries(self, school, persona, name):
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(school[persona]).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        client.get(reverse(f'{name}-list'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse(f'{name}-list'))
+
+        assert response.status_code == 200
+        assert profile_lookups(queries) == []
+        # Repeated course lists come from the response cache
+        list_queries = 0 if name == 'course' else 1
+        assert len(queries.captured_queries) == list_queries + validator_queries(name, 'list')
+
+    def test_scoped_ids_are_loaded_once(self, school):
+        role = RoleContext(User.objects.get(pk=school['teacher'].pk))
+
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                assert role.taught_course_ids == {school['objects']['course']}
+                assert role.teacher_profile.pk == school['objects']['teacher']
+                assert role.student_profile is None
+
+        assert len(queries.captured_queries) == 2
@@ -0,0 +1,202 @@
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from students import search as search_module
+from students.lookup import PrefixIndex
+from students.models import Course, User
+from .factories import (
+    AdminUserFactory, CourseFactory, EnrollmentFactory, StudentProfileFactory, TeacherUserFactory, UserFactory
+)
+
+
+@pytest.fixture
+def admin_client():
+    client = APIClient()
+    client.force_authenticate(user=AdminUserFactory())
+    return client
+
+
+def search(client, name, term, **params):
+    response = client.get(reverse(f'{name}-list'), {'search': term, **params})
+    assert response.status_code == 200
+    return [row['id'] for row in response.data['results']]
+
+
+@pytest.mark.django_db
+class TestFullTextSearch:
+
+    def test_matches_word_prefixes_best_first(self, admin_client):
+        partial = CourseFactory(title='Applied statistics for biology and chemistry', description='')
+        exact = CourseFactory(title='Statistics', description='')
+        CourseFactory(title='Linear algebra', description='')
+
+        assert search(admin_client, 'course', 'stat') == [exact.id, partial.id]
+        assert search(admin_client, 'course', 'stat bio') == [partial.id]
+
+    def test_requested_ordering_overrides_rank(self, admin_client):
+        first = CourseFactory(code='AAA100', title='Applied statistics for biology and chemistry', description='')
+        second = CourseFactory(code='BBB100', title='Statistics', description='')
+
+        assert search(admin_client, 'course', 'statistics', ordering='code') == [first.id, second.id]
+
+    def test_broad_searches_keep_list_ordering(self, admin_client, settings):
+        settings.SEARCH_RANK_LIMIT = 1
+        courses = [CourseFactory(code=code, title='Statistics', description='') for code in ['CS3', 'CS1', 'CS2']]
+
+        assert search(admin_client, 'course', 'statistics') == [courses[1].id, courses[2].id, courses[0].id]
+
+    def test_index_follows_saves_and_deletes(self, admin_client):
+        profile = StudentProfileFactory(user__username='ada', user__email='pupil@example.com')
+        user = profile.user
+
+        user.username = 'lovelace'
+        user.save()
+        assert search(admin_client, 'student', 'lovel') == [profile.id]
+        assert search(admin_client, 'user', 'lovel') == [user.id]
+        assert search(admin_client, 'student', 'ada') == []
+
+        user.delete()
+        assert search(admin_client, 'user', 'lovel') == []
+        assert search(admin_client, 'student', 'lovel') == []
+
+    def test_unindexed_field_saves_skip_the_index(self):
+        user = UserFactory()
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_login'])
+
+        assert not any('search_index' in query['sql'] for query in queries.captured_queries)
+
+    def test_search_respects_role_scope(self):
+        own = StudentProfileFactory(user__username='scoped1')
+        StudentProfileFactory(user__username='scoped2')
+        client = APIClient()
+        client.force_authenticate(user=own.user)
+
+        assert search(client, 'student', 'scoped') == [own.id]
+
+    def test_terms_without_words_use_icontains(self, admin_client):
+        user = UserFactory(email='odd+tag@example.com')
+
+        assert search(admin_client, 'user', '+') == [user.id]
+
+    def test_writes_and_searches_work_without_index_table(self, admin_client, monkeypatch):
+        monkeypatch.setitem(search_module._index_tables, 'default', False)
+
+        course = CourseFactory(title='Thermodynamics', description='')
+        course.title = 'Thermodynamics II'
+        course.save()
+
+        # Answered by icontains lookups instead
+        assert search(admin_client, 'course', 'thermo') == [course.id]
+        course.delete()
+
+    def test_rebuild_command_restores_index(self, admin_client):
+        course = CourseFactory(title='Thermodynamics', description='')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM search_index')
+        assert search(admin_client, 'course', 'thermo') == []
+
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+
+        assert search(admin_client, 'course', 'thermo') == [course.id]
+        assert f'users: {User.objects.count()} documents' in out.getvalue()
+        assert f'courses: {Course.objects.count()} documents' in out.getvalue()
+
+
+def lookup(client, kind, prefix, **params):
+    response = client.get(reverse(f'lookup_{kind}'), {'q': prefix, **params})
+    assert response.status_code == 200
+    return [(row['id'], row['key']) for row in response.data['results']]
+
+
+class TestPrefixIndex:
+
+    def test_returns_prefix_matches_in_key_order_once_per_id(self):
+        index = PrefixIndex([('ada', 1, 'A'), ('enr2', 2, 'B'), ('enr1', 1, 'A'), ('enr10', 3, 'C'), ('f', 4, 'D')])
+
+        assert index.search('enr', 10) == [('enr1', 1, 'A'), ('enr10', 3, 'C'), ('enr2', 2, 'B')]
+        assert index.search('enr', 2) == [('enr1', 1, 'A'), ('enr10', 3, 'C')]
+        assert index.search('enr1', 10, allowed={3}) == [('enr10', 3, 'C')]
+        assert index.search('enr', 10, allowed={1, 2, 3, 4, 5}) == index.search('enr', 10)
+        assert index.search('x', 10) == []
+
+
+@pytest.mark.django_db
+class TestLookup:
+
+    def test_students_by_enrollment_number_or_username(self, admin_client):
+        ada = StudentProfileFactory(enrollment_number='ENR900001', user__username='ada')
+        alan = StudentProfileFactory(enrollment_number='ENR900002', user__username='alan')
+
+        assert lookup(admin_client, 'students', 'enr9000') == [(ada.id, 'enr900001'), (alan.id, 'enr900002')]
+        assert lookup(admin_client, 'students', 'AD') == [(ada.id, 'ada')]
+        assert lookup(admin_client, 'students', 'enr9', limit=1) == [(ada.id, 'enr900001')]
+
+    def test_index_follows_writes(self, admin_client):
+        course = CourseFactory(code='BIO101')
+        assert lookup(admin_client, 'courses', 'bio') == [(course.id, 'bio101')]
+
+        course.code = 'CHEM101'
+        course.save()
+        assert lookup(admin_client, 'courses', 'bio') == []
+        assert lookup(admin_client, 'courses', 'chem') == [(course.id, 'chem101')]
+
+        course.delete()
+        assert lookup(admin_client, 'courses', 'chem') == []
+
+    def test_results_follow_list_scope(self):
+        teacher_user = TeacherUserFactory()
+        taught = EnrollmentFactory(course__teacher=teacher_user.teacher_profile).student
+        StudentProfileFactory()
+        CourseFactory(code='OFF100', is_active=False)
+        teacher = APIClient()
+        teacher.force_authenticate(user=teacher_user)
+        student = APIClient()
+        student.force_authenticate(user=taught.user)
+
+        assert lookup(teacher, 'students', 'enr') == [(taught.id, taught.enrollment_number.lower())]
+        assert lookup(student, 'students', 'enr') == [(taught.id, taught.enrollment_number.lower())]
+        assert lookup(student, 'courses', 'off') == []
+
+        EnrollmentFactory(course__teacher=teacher_user.teacher_profile)
+        assert len(lookup(teacher, 'students', 'enr')) == 2
+
+    def test_repeated_lookups_skip_the_database(self, admin_client):
+        CourseFactory(code='PHY200')
+        lookup(admin_client, 'courses', 'phy')
+
+        with CaptureQueriesContext(connection) as queries:
+            assert len(lookup(admin_client, 'courses', 'phy')) == 1
+
+        assert len(queries.captured_queries) == 0
+
+
+def test_documented_pytest_options_create_index():
+    """
+    The documented pytest.ini runs with --nomigrations, which builds tables
+    without migration 0006; the index must still be created.
+    """
+    backend = Path(__file__).resolve().parents[2]
+    result = subprocess.run(
+        [
+            sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+            '-c', str(backend.parent / 'document' / 'pytest.ini'), '--rootdir', str(backend), '--create-db',
+            f'{Path(__file__).resolve()}::TestFullTextSearch::test_matches_word_prefixes_best_first',
+            str(backend / 'students' / 'tests' / 'test_models.py'),
+        ],
+        cwd=backend, capture_output=True, text=True,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'student_mgmt.settings'},
+    )
+
+    assert result.returncode == 0, result.stdout[-2000:]
@@ -0,0 +1,181 @@
+import threading
+
+import pytest
+from django.core.cache import cache
+from students import versions
+from students.models import Course, Enrollment, Grade
+from students.versions import bump, read_versions
+from .factories import CourseFactory, EnrollmentFactory, GradeFactory, StudentProfileFactory, TeacherProfileFactory
+
+
+class Versions:
+    """Snapshot of scope versions, to check which ones a write bumps."""
+
+    def __init__(self, *scopes):
+        self.scopes = scopes
+        self.before = dict(zip(scopes, read_versions(*scopes)))
+
+    def bumped(self):
+        return {
+            scope for scope, version in zip(self.scopes, read_versions(*self.scopes))
+            if version != self.before[scope]
+        }
+
+
+@pytest.fixture(params=['locmem', 'filebased'])
+def any_cache(request, settings, tmp_path):
+    if request.param == 'filebased':
+        settings.CACHES = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': str(tmp_path),
+            }
+        }
+    cache.clear()
+    return request.param
+
+
+@pytest.mark.django_db
+class TestVersionScopes:
+
+    def test_saves_bump_old_and_new_scopes(self):
+        old, new = TeacherProfileFactory(), TeacherProfileFactory()
+        course = CourseFactory(teacher=old)
+        course = Course.objects.get(pk=course.pk)
+        other = CourseFactory()
+        scopes = Versions(
+            'table:courses', f'course:{course.pk}', f'teacher:{old.pk}', f'teacher:{new.pk}',
+            f'course:{other.pk}', 'table:grades',
+        )
+
+        course.teacher = new
+        course.save()
+
+        assert scopes.bumped() == {'table:courses', f'course:{course.pk}', f'teacher:{old.pk}', f'teacher:{new.pk}'}
+
+    def test_deletes_bump_cascaded_rows(self):
+        grade = GradeFactory()
+        enrollment = EnrollmentFactory(course=grade.course)
+        scopes = Versions('table:courses', 'table:grades', 'table:enrollments', f'student:{enrollment.student_id}')
+
+        Course.objects.filter(pk=grade.course_id).delete()
+
+        assert scopes.bumped() == {'table:courses', 'table:grades', 'table:enrollments', f'student:{enrollment.student_id}'}
+
+    def test_bulk_create_bumps(self):
+        course = CourseFactory()
+        student = StudentProfileFactory()
+        scopes = Versions('table:enrollments', f'course:{course.pk}', f'student:{student.pk}', 'table:courses')
+
+        Enrollment.objects.bulk_create([Enrollment(course=course, student=student)])
+
+        assert scopes.bumped() == {'table:enrollments', f'course:{course.pk}', f'student:{student.pk}'}
+
+    def test_update_bumps_rows_before_and_after(self):
+        grade = GradeFactory()
+        old, new = grade.teacher_id, TeacherProfileFactory().pk
+        untouched = GradeFactory()
+        scopes = Versions(
+            'table:grades', f'teacher:{old}', f'teacher:{new}', f'course:{grade.course_id}',
+            f'course:{untouched.course_id}',
+        )
+
+        assert Grade.objects.filter(pk=grade.pk).update(teacher_id=new) == 1
+
+        assert scopes.bumped() == {'table:grades', f'teacher:{old}', f'teacher:{new}', f'course:{grade.course_id}'}
+
+    def test_large_updates_bump_whole_kinds(self, settings):
+        settings.VERSION_SCOPE_LIMIT = 1
+        grades = GradeFactory.create_batch(2)
+        scopes = Versions(f'course:{grades[0].course_id}', 'course:*', f'teacher:{grades[0].teacher_id}')
+
+        Grade.objects.update(value='B')
+
+        # course:{id} reads are paired with course:*, so they change too
+        assert scopes.bumped() == {f'course:{grades[0].course_id}', 'course:*', f'teacher:{grades[0].teacher_id}'}
+
+    def test_bumps_repeat_on_commit(self, django_capture_on_commit_callbacks):
+        course = CourseFactory()
+        scopes = Versions(f'course:{course.pk}')
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            course.title = 'Renamed'
+            course.save()
+        bumped = read_versions(f'course:{course.pk}')
+        for callback in callbacks:
+            callback()
+
+        assert scopes.bumped() == {f'course:{course.pk}'}
+        assert read_versions(f'course:{course.pk}') != bumped
+
+    def test_versions_are_read_in_one_cache_call(self, monkeypatch):
+        read_versions('table:courses', 'course:1', 'teacher:2')
+        calls = []
+
+        class CountingCache:
+            def __getattr__(self, name):
+                calls.append(name)
+                return getattr(cache, name)
+
+        monkeypatch.setattr(versions, 'cache', CountingCache())
+        read_versions('table:courses', 'course:1', 'teacher:2')
+
+        assert calls == ['get_many']
+
+
+class TestConcurrentBumps:
+
+    def test_concurrent_bumps_are_unique_and_increasing(self, any_cache):
+        issued = []
+        threads = [
+            threading.Thread(target=lambda: issued.extend(versions.write_versions(['course:1']) for _ in range(50)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(issued)) == len(issued) == 400
+        assert read_versions('course:1')[0][0] == max(issued)
+
+    def test_readers_never_see_versions_go_back(self, any_cache):
+        done = threading.Event()
+        seen = []
+
+        def read():
+            while not done.is_set():
+                seen.append(read_versions('table:courses')[0])
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        writers = [
+            threading.Thread(target=lambda: [bump('table:courses') for _ in range(50)])
+            for _ in range(4)
+        ]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        done.set()
+        reader.join()
+
+        assert seen == sorted(seen)
+        assert read_versions('table:courses')[0] >= seen[-1]
+
+    def test_missing_counters_start_once(self, any_cache):
+        results = []
+        start = threading.Barrier(8)
+
+        def read():
+            start.wait()
+            results.append(read_versions('student:7'))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 8
+        assert read_versions('student:7') in results
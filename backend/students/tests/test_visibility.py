@@ -0,0 +1,101 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from students.models import TeacherStudentVisibility
+from .factories import (
+    AdminUserFactory, CourseFactory, EnrollmentFactory, StudentProfileFactory, TeacherProfileFactory
+)
+
+
+def visibility():
+    """{(teacher id, student id): enrollment count} for every row."""
+    return {
+        (row.teacher_id, row.student_id): row.enrollment_count
+        for row in TeacherStudentVisibility.objects.all()
+    }
+
+
+@pytest.mark.django_db
+class TestTeacherStudentVisibility:
+
+    def test_counts_enrollments_per_teacher_and_student(self):
+        teacher = TeacherProfileFactory()
+        student = StudentProfileFactory()
+        first = EnrollmentFactory(student=student, course__teacher=teacher)
+        second = EnrollmentFactory(student=student, course__teacher=teacher)
+        assert visibility() == {(teacher.pk, student.pk): 2}
+
+        first.delete()
+        assert visibility() == {(teacher.pk, student.pk): 1}
+
+        second.delete()
+        assert visibility() == {}
+
+    def test_course_teacher_changes_move_students(self):
+        old, new = TeacherProfileFactory(), TeacherProfileFactory()
+        enrollment = EnrollmentFactory(course__teacher=old)
+        course, student = enrollment.course, enrollment.student
+        EnrollmentFactory(student=student, course__teacher=old)
+
+        course.teacher = new
+        course.save()
+        assert visibility() == {(old.pk, student.pk): 1, (new.pk, student.pk): 1}
+
+        course.teacher = None
+        course.save(update_fields=['teacher'])
+        assert visibility() == {(old.pk, student.pk): 1}
+
+    def test_moved_and_cascaded_enrollments(self):
+        enrollment = EnrollmentFactory()
+        other = CourseFactory()
+
+        enrollment.course = other
+        enrollment.save()
+        assert visibility() == {(other.teacher_id, enrollment.student_id): 1}
+
+        other.delete()
+        assert visibility() == {}
+
+    def test_bulk_enrollments_are_counted(self):
+        courses = CourseFactory.create_batch(2)
+        students = StudentProfileFactory.create_batch(3)
+        client = APIClient()
+        client.force_authenticate(user=AdminUserFactory())
+
+        rows = [{'student_id': student.pk, 'course_id': course.pk} for student in students for course in courses]
+        response = client.post(reverse('enrollment-list'), rows, format='json')
+
+        assert response.status_code == 201
+        assert visibility() == {
+            (course.teacher_id, student.pk): 1 for student in students for course in courses
+        }
+
+    def test_teacher_student_list_joins_visibility(self):
+        teacher = TeacherProfileFactory()
+        taught = EnrollmentFactory(course__teacher=teacher).student
+        EnrollmentFactory()
+        client = APIClient()
+        client.force_authenticate(user=teacher.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('student-list'))
+
+        assert [row['id'] for row in response.data['results']] == [taught.pk]
+        assert not any('"enrollments"' in query['sql'] for query in queries.captured_queries)
+
+    def test_rebuild_command_recomputes_table(self):
+        enrollment = EnrollmentFactory()
+        EnrollmentFactory(student=enrollment.student, course__teacher=enrollment.course.teacher)
+        expected = visibility()
+        TeacherStudentVisibility.objects.update(enrollment_count=7)
+
+        out = io.StringIO()
+        call_command('rebuild_teacher_visibility', stdout=out)
+
+        assert visibility() == expected == {(enrollment.course.teacher_id, enrollment.student_id): 2}
+        assert '1 teacher-student pairs' in out.getvalue()
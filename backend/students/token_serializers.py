@@ -1,11 +1,19 @@
+from django.contrib.auth import authenticate
+from rest_framework import exceptions
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from .authentication import profile_claims
+from .logins import record_login
+from .passwords import server_timing
+
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Custom JWT serializer that adds the user's role to the access token claims.
-    This allows the frontend to determine user permissions without additional API calls.
+    This allows the frontend to determine user permissions without additional API calls,
+    and, with the profile ids, lets ClaimsJWTAuthentication skip loading the user.
     """
     
     @classmethod
@@ -16,13 +24,47 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['role'] = user.role
         token['username'] = user.username
         token['email'] = user.email
+        for claim, value in profile_claims(user).items():
+            token[claim] = value
         
         return token
+    
+    def validate(self, attrs):
+        # TokenObtainPairSerializer.validate, with the password checked on
+        # the hash pool (see passwords.py) and last_login written behind
+        credentials = {
+            self.username_field: attrs[self.username_field],
+            'password': attrs['password'],
+            'use_hash_pool': True,
+        }
+        if 'request' in self.context:
+            credentials['request'] = self.context['request']
+        self.user = authenticate(**credentials)
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise exceptions.AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        
+        data = {}
+        refresh = self.get_token(self.user)
+        data['refresh'] = str(refresh)
+        data['access'] = str(refresh.access_token)
+        
+        if api_settings.UPDATE_LAST_LOGIN:
+            record_login(self.user)
+        
+        return data
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """
-    Custom token view that uses our custom serializer.
+    Custom token view that uses our custom serializer, and reports the
+    password check's queue wait and hash time in a Server-Timing header.
     """
     serializer_class = CustomTokenObtainPairSerializer
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        timing = server_timing(request)
+        if timing is not None:
+            response['Server-Timing'] = timing
+        return response
 
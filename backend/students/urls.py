@@ -5,14 +5,16 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from .token_serializers import CustomTokenObtainPairView
 from .views import (
     current_user,
+    password_hash_stats,
     UserViewSet,
     StudentProfileViewSet,
     TeacherProfileViewSet,
     CourseViewSet,
     EnrollmentViewSet,
     GradeViewSet,
-    export_students_csv,
-    export_grades_csv,
+    ExportJobViewSet,
+    export_data,
+    lookup,
 )
 
 router = DefaultRouter()
@@ -22,18 +24,26 @@ router.register(r'teachers', TeacherProfileViewSet, basename='teacher')
 router.register(r'courses', CourseViewSet, basename='course')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
 router.register(r'grades', GradeViewSet, basename='grade')
+router.register(r'exports/jobs', ExportJobViewSet, basename='export-job')
 
 urlpatterns = [
     # Authentication endpoints
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/hash-pool/', password_hash_stats, name='password_hash_stats'),
     
     # Current user endpoint
     path('me/', current_user, name='current_user'),
     
     # Export endpoints
-    path('exports/students/', export_students_csv, name='export_students'),
-    path('exports/grades/', export_grades_csv, name='export_grades'),
+    path('exports/students/', export_data, {'kind': 'students'}, name='export_students'),
+    path('exports/grades/', export_data, {'kind': 'grades'}, name='export_grades'),
+    path('exports/courses/', export_data, {'kind': 'courses'}, name='export_courses'),
+    path('exports/enrollments/', export_data, {'kind': 'enrollments'}, name='export_enrollments'),
+    
+    # Typeahead lookups
+    path('lookup/students/', lookup, {'kind': 'students'}, name='lookup_students'),
+    path('lookup/courses/', lookup, {'kind': 'courses'}, name='lookup_courses'),
     
     # Router URLs
     path('', include(router.urls)),
@@ -0,0 +1,207 @@
+"""
+Version counters for cache invalidation.
+
+Caches build their keys from versions instead of deleting keys when
+data changes. Each version belongs to a scope:
+
+- table:{db_table} for every row of a model's table;
+- {kind}:{id} for the rows related to one object, as each model's
+  version_scopes lists them. A grade is in course:{course_id},
+  student:{student_id} and teacher:{teacher_id}, for example;
+- {kind}:* for every {kind}:{id} scope at once. It is bumped instead
+  when a bulk write touches more than VERSION_SCOPE_LIMIT rows.
+
+Saves and deletes bump the scopes of the row, both before and after the
+write, from signals. Bulk writes send no signals, so the managers'
+VersionedQuerySet bumps for bulk_create(), bulk_update(), update() and
+delete() itself. Writers that bypass the ORM call bump() themselves.
+
+A bump writes all of its scopes in one cache call, and again when the
+transaction commits. Otherwise a reader could cache data from before
+the commit under the new version. read_versions() reads any number of
+scopes in one cache call.
+
+Versions come from time.time_ns(). Within a process they strictly
+increase, even for bumps at the same moment. They never repeat a value
+that an evicted key may have handed out. The backend needs no atomic
+increment, so the locmem and file-based caches both work. Bumps only
+reach other processes when CACHES points at a shared backend.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+
+
+_lock = threading.RLock()
+_last_version = 0
+_deferred = threading.local()
+
+
+def version_key(scope):
+    return f'version:{scope}'
+
+
+def table_scope(table):
+    return f'table:{table}'
+
+
+def version_time(version):
+    """When a version was handed out, as an aware datetime."""
+    return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+
+
+def next_version():
+    """A version greater than any this process handed out before."""
+    global _last_version
+    with _lock:
+        _last_version = max(_last_version + 1, time.time_ns())
+        return _last_version
+
+
+def write_versions(scopes):
+    """Give the scopes one new version, returning it."""
+    # The lock is held across the write, so the process never sets an
+    # older version over a newer one
+    with _lock:
+        version = next_version()
+        cache.set_many({version_key(scope): version for scope in scopes}, None)
+    return version
+
+
+def bump(*scopes, using=DEFAULT_DB_ALIAS):
+    """Bump the scopes now and, inside a transaction, again on commit."""
+    scopes = set(scopes)
+    if not scopes:
+        return
+    pending = getattr(_deferred, 'scopes', None)
+    if pending is not None:
+        pending.update(scopes)
+        return
+    write_versions(scopes)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: write_versions(scopes), using=using)
+
+
+@contextmanager
+def deferred_bumps(using=DEFAULT_DB_ALIAS):
+    """Collect the bumps made in the block and write them once at its end."""
+    if getattr(_deferred, 'scopes', None) is not None:
+        yield
+        return
+    _deferred.scopes = set()
+    try:
+        yield
+    finally:
+        scopes, _deferred.scopes = _deferred.scopes, None
+        bump(*scopes, using=using)
+
+
+def read_versions(*scopes):
+    """
+    The current version of each scope, starting new counters where
+    missing. A {kind}:{id} scope's version is paired with {kind}:*'s.
+    """
+    keys = {scope: [version_key(scope)] for scope in scopes}
+    for scope, scope_keys in keys.items():
+        kind = scope.partition(':')[0]
+        if kind != 'table' and not scope.endswith(':*'):
+            scope_keys.append(version_key(f'{kind}:*'))
+    wanted = {key for scope_keys in keys.values() for key in scope_keys}
+    found = cache.get_many(wanted)
+    missing = wanted - found.keys()
+    if missing:
+        version = next_version()
+        for key in missing:
+            cache.add(key, version, None)
+        found.update(cache.get_many(missing))
+    return [
+        found.get(scope_keys[0]) if len(scope_keys) == 1 else tuple(found.get(key) for key in scope_keys)
+        for scope_keys in (keys[scope] for scope in scopes)
+    ]
+
+
+def row_scopes(model, rows):
+    """
+    The table and {kind}:{id} scopes of rows, given as dicts of attnames.
+    Past VERSION_SCOPE_LIMIT rows, {kind}:* replaces the single scopes.
+    """
+    scopes = {table_scope(model._meta.db_table)}
+    version_scopes = getattr(model, 'version_scopes', {})
+    if len(rows) > settings.VERSION_SCOPE_LIMIT:
+        return scopes | {f'{kind}:*' for kind in version_scopes}
+    for row in rows:
+        for kind, attname in version_scopes.items():
+            if row.get(attname) is not None:
+                scopes.add(f'{kind}:{row[attname]}')
+    return scopes
+
+
+def instance_rows(instance):
+    """Attname dicts of the instance's scope columns: as stored, and as loaded."""
+    attnames = list(getattr(instance, 'version_scopes', {}).values())
+    rows = [{attname: instance.__dict__.get(attname) for attname in attnames}]
+    loaded = instance.loaded_values(*attnames) if hasattr(instance, 'loaded_values') else None
+    if loaded is not None:
+        rows.append(dict(zip(attnames, loaded)))
+    return rows
+
+
+def bump_instances(model, instances, using=DEFAULT_DB_ALIAS):
+    """Bump the scopes of saved or deleted instances of the model."""
+    rows = [row for instance in instances for row in instance_rows(instance)]
+    bump(*row_scopes(model, rows), using=using)
+
+
+class VersionedQuerySet(models.QuerySet):
+    """QuerySet whose bulk writes, which send no signals, bump versions."""
+
+    def scope_attnames(self):
+        return sorted(set(getattr(self.model, 'version_scopes', {}).values()) | {self.model._meta.pk.attname})
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_instances(self.model, objs, using=self.db)
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, batch_size)
+        bump_instances(self.model, objs, using=self.db)
+        return rows
+
+    def update(self, **kwargs):
+        if not getattr(self.model, 'version_scopes', None):
+            rows = super().update(**kwargs)
+            bump(table_scope(self.model._meta.db_table), using=self.db)
+            return rows
+        attnames = self.scope_attnames()
+        # Rows are read first: the update may move them out of the filter
+        # or to other scopes
+        before = list(self.values(*attnames)[:settings.VERSION_SCOPE_LIMIT + 1])
+        rows = super().update(**kwargs)
+        after = []
+        fields = {self.model._meta.get_field(name).attname for name in kwargs}
+        if fields & set(attnames) and len(before) <= settings.VERSION_SCOPE_LIMIT:
+            pk = self.model._meta.pk.attname
+            after = list(
+                self.model._base_manager.using(self.db)
+                .filter(pk__in=[row[pk] for row in before]).values(*attnames)
+            )
+        bump(*row_scopes(self.model, before + after), using=self.db)
+        return rows
+
+    def delete(self):
+        # Deleted rows, cascades included, bump from signals; once in all
+        with deferred_bumps(self.db):
+            result = super().delete()
+            bump(table_scope(self.model._meta.db_table), using=self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+    update.alters_data = True
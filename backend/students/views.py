@@ -1,18 +1,20 @@
-import csv
-from django.http import HttpResponse
-from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import mixins, viewsets, status, permissions
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
-from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade
+from .models import User, StudentProfile, TeacherProfile, Course, Enrollment, Grade, ExportJob
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
     StudentProfileSerializer, StudentProfileCreateSerializer,
     TeacherProfileSerializer, TeacherProfileCreateSerializer,
     CourseSerializer, EnrollmentSerializer, GradeSerializer,
-    CurrentUserSerializer
+    CurrentUserSerializer, ExportJobSerializer, FlexFieldsMixin
 )
 from .permissions import (
     IsAdmin, IsTeacher, IsStudent, IsOwnerOrAdmin,
@@ -22,6 +24,97 @@ from .filters import (
     UserFilter, StudentProfileFilter, TeacherProfileFilter,
     CourseFilter, EnrollmentFilter, GradeFilter
 )
+from .projection import ProjectionViewSetMixin
+from .compiled import CompiledListMixin
+from .conditional import ConditionalGetMixin, conditional_response, validator_etag
+from .response_cache import ResponseCacheMixin, response_cache_stats
+from .bulk import BulkCreateMixin
+from .search import FullTextSearchFilter, RankedOrderingFilter
+from .gradebook import read_gradebook, diff_gradebook, apply_gradebook
+from .imports import import_students, roster_exceeds, roster_format
+from .lookup import LOOKUP_KINDS
+from .passwords import hash_pool
+from .roles import role_context
+from .versions import read_versions
+from .exports import (
+    EXPORTS, WRITERS, EXPORT_RENDERER_CLASSES, parse_since, export_response,
+    export_file_path, ranged_file_response
+)
+
+
+def split_query_list(value):
+    """Split a comma-separated query parameter into a list of names."""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class FlexFieldsViewSetMixin:
+    """
+    Viewset mixin for sparse fieldsets and opt-in expansion.
+    - ?fields=id,value,student_detail.enrollment_number limits the output
+    - ?expand=student_detail,course_detail.teacher_detail adds nested objects
+    """
+    
+    def get_flex_options(self):
+        if self.request is None:
+            return {}
+        params = self.request.query_params
+        options = {'expand': split_query_list(params.get('expand', ''))}
+        # Sparse fieldsets only shape responses; writes need every field
+        if params.get('fields') and self.request.method in permissions.SAFE_METHODS:
+            options['fields'] = split_query_list(params['fields'])
+        return options
+    
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), FlexFieldsMixin):
+            for key, value in self.get_flex_options().items():
+                kwargs.setdefault(key, value)
+        return super().get_serializer(*args, **kwargs)
+
+
+class AtomicWritesMixin:
+    """
+    Viewset mixin that saves and deletes in a transaction, so the rows
+    signals maintain from a write (teacher-student visibility) commit or
+    roll back with it.
+    """
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+
+PROFILE_RELATIONS = ('student_profile', 'teacher_profile')
+
+
+def current_user_data(user, etag):
+    """CurrentUserSerializer data for the request user, cached under its ETag."""
+    key = f'current-user:{etag}'
+    data = cache.get(key)
+    if data is not None:
+        return data
+    # request.user may only hold the token's claims; load the whole user
+    # once, joining the profiles it is not known to lack (token users
+    # carry their profile ids)
+    absent = [
+        relation for relation in PROFILE_RELATIONS
+        if getattr(User, relation).is_cached(user) and getattr(user, relation, None) is None
+    ]
+    loaded = User.objects.select_related(
+        *(relation for relation in PROFILE_RELATIONS if relation not in absent)
+    ).get(pk=user.pk)
+    for relation in absent:
+        getattr(User, relation).related.set_cached_value(loaded, None)
+    data = CurrentUserSerializer(loaded).data
+    cache.set(key, data, settings.CURRENT_USER_CACHE_TIMEOUT)
+    return data
 
 
 @api_view(['GET'])
@@ -29,20 +122,35 @@ from .filters import (
 def current_user(request):
     """
     Get the current authenticated user's information.
+    The payload is cached per user version: saving the user or one of
+    its profiles bumps it (see versions.py). If-None-Match is answered
+    with 304.
     GET /api/v1/me/
     """
-    serializer = CurrentUserSerializer(request.user)
-    return Response(serializer.data)
+    etag = validator_etag(request, 'me', read_versions(f'user:{request.user.pk}'))
+    return conditional_response(request, etag, None, lambda: Response(current_user_data(request.user, etag)))
 
 
-class UserViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def password_hash_stats(request):
+    """
+    Size, queue wait and hash time of this process's pool for token
+    login password checks (admin only).
+    GET /api/v1/token/hash-pool/
+    """
+    return Response(hash_pool().stats())
+
+
+class UserViewSet(CompiledListMixin, ProjectionViewSetMixin, FlexFieldsViewSetMixin,
+                  viewsets.ModelViewSet):
     """
     ViewSet for User management (admin only).
-    Provides full CRUD operations on users.
+    Provides full CRUD operations on users and bulk student imports.
     """
     queryset = User.objects.all()
     permission_classes = [IsAdmin]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_class = UserFilter
     search_fields = ['username', 'email', 'first_name', 'last_name']
     ordering_fields = ['username', 'email', 'date_joined', 'role']
@@ -54,18 +162,43 @@ class UserViewSet(viewsets.ModelViewSet):
         elif self.action in ['update', 'partial_update']:
             return UserUpdateSerializer
         return UserSerializer
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_students(self, request):
+        """
+        Import student users and profiles from an uploaded CSV or NDJSON
+        roster `file` (.ndjson or .jsonl for NDJSON). Reports the number
+        created, throughput and the errors of rejected rows. Rosters over
+        IMPORT_UPLOAD_MAX_ROWS rows are refused with 413.
+        POST /api/v1/users/import/
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No roster file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = roster_format(upload.name)
+        if roster_exceeds(upload.file, file_format, settings.IMPORT_UPLOAD_MAX_ROWS):
+            return Response(
+                {'error': f'Rosters over {settings.IMPORT_UPLOAD_MAX_ROWS} rows must be imported '
+                          'with the import_students command'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        # Passwords are hashed in the request's process: a pool per request
+        # would fork the web worker. Large rosters go through the command.
+        report = import_students(upload.file, file_format, workers=0)
+        return Response(report.as_dict())
 
 
-class StudentProfileViewSet(viewsets.ModelViewSet):
+class StudentProfileViewSet(CompiledListMixin, ProjectionViewSetMixin, FlexFieldsViewSetMixin,
+                            viewsets.ModelViewSet):
     """
     ViewSet for StudentProfile management.
     - Students can view/edit their own profile
     - Teachers can view students in their courses
     - Admins can view/edit all profiles
     """
-    queryset = StudentProfile.objects.select_related('user').all()
+    queryset = StudentProfile.objects.all()
     serializer_class = StudentProfileSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_class = StudentProfileFilter
     search_fields = ['enrollment_number', 'user__username', 'user__email']
     ordering_fields = ['enrollment_number', 'created_at']
@@ -83,19 +216,16 @@ class StudentProfileViewSet(viewsets.ModelViewSet):
             return [IsAdmin()]
     
     def get_queryset(self):
-        user = self.request.user
+        role = role_context(self.request)
         
-        if user.role == 'admin':
+        if role.is_admin:
             return self.queryset
-        elif user.role == 'teacher' and hasattr(user, 'teacher_profile'):
+        elif role.teacher_profile:
             # Teachers can see students enrolled in their courses
-            student_ids = Enrollment.objects.filter(
-                course__teacher=user.teacher_profile
-            ).values_list('student_id', flat=True)
-            return self.queryset.filter(id__in=student_ids)
-        elif user.role == 'student' and hasattr(user, 'student_profile'):
+            return self.queryset.filter(teacher_visibility__teacher=role.teacher_profile)
+        elif role.student_profile:
             # Students can only see their own profile
-            return self.queryset.filter(user=user)
+            return self.queryset.filter(pk=role.student_profile.pk)
         
         return self.queryset.none()
     
@@ -106,7 +236,7 @@ class StudentProfileViewSet(viewsets.ModelViewSet):
         GET/PUT/PATCH /api/v1/students/me/
         """
         try:
-            profile = request.user.student_profile
+            profile = StudentProfile.objects.select_related('user').get(user=request.user)
         except StudentProfile.DoesNotExist:
             return Response(
                 {'error': 'Student profile not found'},
@@ -124,15 +254,16 @@ class StudentProfileViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TeacherProfileViewSet(viewsets.ModelViewSet):
+class TeacherProfileViewSet(CompiledListMixin, ProjectionViewSetMixin, FlexFieldsViewSetMixin,
+                            viewsets.ModelViewSet):
     """
     ViewSet for TeacherProfile management.
     - Teachers can view/edit their own profile
     - Admins can view/edit all profiles
     """
-    queryset = TeacherProfile.objects.select_related('user').all()
+    queryset = TeacherProfile.objects.all()
     serializer_class = TeacherProfileSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_class = TeacherProfileFilter
     search_fields = ['user__username', 'user__email', 'department']
     ordering_fields = ['department', 'created_at']
@@ -147,12 +278,12 @@ class TeacherProfileViewSet(viewsets.ModelViewSet):
             return [IsAdmin()]
     
     def get_queryset(self):
-        user = self.request.user
+        role = role_context(self.request)
         
-        if user.role == 'admin':
+        if role.is_admin:
             return self.queryset
-        elif user.role == 'teacher' and hasattr(user, 'teacher_profile'):
-            return self.queryset.filter(user=user)
+        elif role.teacher_profile:
+            return self.queryset.filter(pk=role.teacher_profile.pk)
         
         return self.queryset
     
@@ -163,7 +294,7 @@ class TeacherProfileViewSet(viewsets.ModelViewSet):
         GET/PUT/PATCH /api/v1/teachers/me/
         """
         try:
-            profile = request.user.teacher_profile
+            profile = TeacherProfile.objects.select_related('user').get(user=request.user)
         except TeacherProfile.DoesNotExist:
             return Response(
                 {'error': 'Teacher profile not found'},
@@ -181,38 +312,46 @@ class TeacherProfileViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, ResponseCacheMixin, AtomicWritesMixin, CompiledListMixin,
+                    ProjectionViewSetMixin, FlexFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Course management.
     - Admins can manage all courses
     - Teachers can manage only their own courses
     - Students can view courses
+    - Teachers and admins can upload a course's gradebook as CSV
+    List responses are cached per role scope; students share one catalog.
     """
-    queryset = Course.objects.select_related('teacher__user').all()
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_class = CourseFilter
     search_fields = ['title', 'code', 'description']
     ordering_fields = ['code', 'title', 'created_at']
     ordering = ['code']
+    tombstone_kind = 'courses'
+    # Courses, with their teacher and the teacher's user via ?expand=
+    # The teacher's user columns touch its profile when they change (see
+    # signals.save_user_profile), so logins do not flush the catalog
+    cache_models = (Course, TeacherProfile)
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.IsAuthenticated()]
-        elif self.action == 'create':
+        elif self.action in ['create', 'gradebook']:
             return [IsAdminOrTeacher()]
         else:
             return [IsAdmin()]
     
     def get_queryset(self):
-        user = self.request.user
+        role = role_context(self.request)
         
-        if user.role == 'admin':
+        if role.is_admin:
             return self.queryset
-        elif user.role == 'teacher' and hasattr(user, 'teacher_profile'):
+        elif role.teacher_profile:
             # Teachers can see their own courses
-            return self.queryset.filter(teacher=user.teacher_profile)
-        elif user.role == 'student':
+            return self.queryset.filter(teacher=role.teacher_profile)
+        elif role.role == 'student':
             # Students can see all active courses
             return self.queryset.filter(is_active=True)
         
@@ -220,25 +359,64 @@ class CourseViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         # If teacher creates a course, assign it to them
-        if self.request.user.role == 'teacher' and hasattr(self.request.user, 'teacher_profile'):
-            serializer.save(teacher=self.request.user.teacher_profile)
-        else:
-            serializer.save()
+        teacher_profile = role_context(self.request).teacher_profile
+        if teacher_profile:
+            serializer.validated_data['teacher'] = teacher_profile
+        super().perform_create(serializer)
+    
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
+    def gradebook(self, request, pk=None):
+        """
+        Upload the course's grades as a CSV `file` with enrollment_number
+        and grade columns. New and changed grades are upserted; any
+        rejected row rejects the whole upload. ?dry_run=1 only reports
+        which rows would be inserted, changed, unchanged or rejected.
+        POST /api/v1/courses/{id}/gradebook/
+        """
+        course = self.get_object()
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No gradebook file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = read_gradebook(upload)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        diff = diff_gradebook(course, rows)
+        if request.query_params.get('dry_run') in ('1', 'true'):
+            return Response(diff.as_dict())
+        if diff.rejected:
+            return Response(diff.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        
+        teacher = role_context(request).teacher_profile or course.teacher
+        apply_gradebook(course, diff, teacher)
+        return Response(diff.as_dict())
+    
+    @action(detail=False, url_path='cache-stats')
+    def cache_stats(self, request):
+        """
+        Hits and misses of this process's list response cache (admin only).
+        GET /api/v1/courses/cache-stats/
+        """
+        return Response(response_cache_stats())
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(ConditionalGetMixin, AtomicWritesMixin, BulkCreateMixin, CompiledListMixin,
+                        ProjectionViewSetMixin, FlexFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Enrollment management.
     - Students can enroll themselves in courses
+    - POST a list to create many enrollments at once
     - Teachers can view enrollments for their courses
     - Admins can manage all enrollments
     """
-    queryset = Enrollment.objects.select_related('student__user', 'course').all()
+    queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = EnrollmentFilter
     ordering_fields = ['enrolled_at']
     ordering = ['-enrolled_at']
+    tombstone_kind = 'enrollments'
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -249,40 +427,46 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             return [IsAdmin()]
     
     def get_queryset(self):
-        user = self.request.user
+        role = role_context(self.request)
         
-        if user.role == 'admin':
+        if role.is_admin:
             return self.queryset
-        elif user.role == 'teacher' and hasattr(user, 'teacher_profile'):
+        elif role.teacher_profile:
             # Teachers can see enrollments for their courses
-            return self.queryset.filter(course__teacher=user.teacher_profile)
-        elif user.role == 'student' and hasattr(user, 'student_profile'):
+            return self.queryset.filter(course__in=role.taught_courses)
+        elif role.student_profile:
             # Students can see their own enrollments
-            return self.queryset.filter(student=user.student_profile)
+            return self.queryset.filter(student=role.student_profile)
         
         return self.queryset.none()
     
-    def perform_create(self, serializer):
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
         # If student creates enrollment, assign it to them
-        if self.request.user.role == 'student' and hasattr(self.request.user, 'student_profile'):
-            serializer.save(student=self.request.user.student_profile)
-        else:
-            serializer.save()
+        if self.action == 'create':
+            student_profile = role_context(self.request).student_profile
+            if student_profile:
+                context['student'] = student_profile
+        return context
 
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(ConditionalGetMixin, BulkCreateMixin, CompiledListMixin,
+                   ProjectionViewSetMixin, FlexFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Grade management.
+    Nested student, course and teacher details are opt-in via ?expand=.
     - Teachers can manage grades for their courses
+    - POST a list to record a whole class's grades at once
     - Students can view their own grades
     - Admins can manage all grades
     """
-    queryset = Grade.objects.select_related('student__user', 'course', 'teacher__user').all()
+    queryset = Grade.objects.all()
     serializer_class = GradeSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = GradeFilter
     ordering_fields = ['graded_at', 'value']
     ordering = ['-graded_at']
+    tombstone_kind = 'grades'
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -293,95 +477,111 @@ class GradeViewSet(viewsets.ModelViewSet):
             return [IsAdminOrTeacher()]
     
     def get_queryset(self):
-        user = self.request.user
+        role = role_context(self.request)
         
-        if user.role == 'admin':
+        if role.is_admin:
             return self.queryset
-        elif user.role == 'teacher' and hasattr(user, 'teacher_profile'):
+        elif role.teacher_profile:
             # Teachers can see grades for their courses
-            return self.queryset.filter(course__teacher=user.teacher_profile)
-        elif user.role == 'student' and hasattr(user, 'student_profile'):
+            return self.queryset.filter(course__in=role.taught_courses)
+        elif role.student_profile:
             # Students can see their own grades
-            return self.queryset.filter(student=user.student_profile)
+            return self.queryset.filter(student=role.student_profile)
         
         return self.queryset.none()
     
     def perform_create(self, serializer):
         # If teacher creates grade, assign them as the grader
-        if self.request.user.role == 'teacher' and hasattr(self.request.user, 'teacher_profile'):
-            serializer.save(teacher=self.request.user.teacher_profile)
+        teacher_profile = role_context(self.request).teacher_profile
+        if teacher_profile:
+            serializer.save(teacher=teacher_profile)
         else:
             serializer.save()
 
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
-def export_students_csv(request):
+@renderer_classes(EXPORT_RENDERER_CLASSES)
+def export_data(request, kind):
     """
-    Export all students to CSV (admin only).
-    GET /api/v1/exports/students/
+    Export students, grades, courses or enrollments (admin only).
+    Rows are streamed from a server-side cursor as value tuples.
+    The format is chosen by ?format= (csv, csv.gz, ndjson, ndjson.gz, xlsx)
+    or the Accept header; grades and enrollments filter by course_id.
+    Pass since or watermark for only the rows changed after that point.
+    GET /api/v1/exports/grades/?course_id=1&format=ndjson.gz&watermark=<token>
     """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="students.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'Username', 'Email', 'First Name', 'Last Name',
-        'Enrollment Number', 'Date of Birth', 'Phone Number', 'Address'
-    ])
-
-    students = StudentProfile.objects.select_related('user').all()
-    for student in students:
-        writer.writerow([
-            student.id,
-            student.user.username,
-            student.user.email,
-            student.user.first_name,
-            student.user.last_name,
-            student.enrollment_number,
-            student.date_of_birth,
-            student.phone_number,
-            student.address,
-        ])
-
-    return response
+    try:
+        since = parse_since(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    params = {name: request.query_params.get(name) for name in EXPORTS[kind].filters}
+    return export_response(kind, request.accepted_renderer.format, params, since)
+
+
+LOOKUP_VIEWSETS = {
+    'students': StudentProfileViewSet,
+    'courses': CourseViewSet,
+}
 
 
 @api_view(['GET'])
-@permission_classes([IsAdmin])
-def export_grades_csv(request):
+@permission_classes([permissions.IsAuthenticated])
+def lookup(request, kind):
     """
-    Export grades to CSV (admin only).
-    Optionally filter by course_id query parameter.
-    GET /api/v1/exports/grades/?course_id=1
+    Typeahead lookup of students by enrollment number or username, or of
+    courses by code. Returns up to ?limit= (at most LOOKUP_MAX_RESULTS)
+    {id, key, label} matches of the ?q= prefix, limited to the rows the
+    list endpoint shows the user.
+    GET /api/v1/lookup/students/?q=ENR0001&limit=5
     """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="grades.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'Student Username', 'Student Enrollment', 'Course Code',
-        'Course Title', 'Grade', 'Teacher', 'Graded At'
-    ])
-
-    grades = Grade.objects.select_related('student__user', 'course', 'teacher__user').all()
-
-    # Filter by course if provided
-    course_id = request.query_params.get('course_id')
-    if course_id:
-        grades = grades.filter(course_id=course_id)
-
-    for grade in grades:
-        writer.writerow([
-            grade.id,
-            grade.student.user.username,
-            grade.student.enrollment_number,
-            grade.course.code,
-            grade.course.title,
-            grade.value,
-            grade.teacher.user.username if grade.teacher else 'N/A',
-            grade.graded_at,
-        ])
-
-    return response
+    prefix = request.query_params.get('q', '').strip()
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), settings.LOOKUP_MAX_RESULTS)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not prefix or limit < 1:
+        return Response({'results': []})
+    
+    view = LOOKUP_VIEWSETS[kind](request=request, action='list', format_kwarg=None, args=(), kwargs={})
+    return Response({'results': LOOKUP_KINDS[kind].lookup(prefix, limit, view.get_queryset())})
+
 
+class ExportJobViewSet(ProjectionViewSetMixin,
+                       FlexFieldsViewSetMixin,
+                       mixins.CreateModelMixin,
+                       mixins.RetrieveModelMixin,
+                       mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    ViewSet for background export jobs (admin only).
+    - POST queues an export that the export worker writes to disk
+    - GET reports status, progress and row counts
+    - download serves the finished file with Range support
+    """
+    queryset = ExportJob.objects.all()
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+    
+    def perform_create(self, serializer):
+        serializer.save(requested_by=self.request.user)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Download the finished export file.
+        GET /api/v1/exports/jobs/{id}/download/
+        """
+        job = self.get_object()
+        path = export_file_path(job)
+        if job.status != ExportJob.STATUS_COMPLETED or not path.exists():
+            return Response(
+                {'error': 'Export is not ready', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        writer = WRITERS[job.file_format]
+        filename = f'{job.kind}.{job.file_format}'
+        return ranged_file_response(request, path, writer.content_type, filename)
@@ -0,0 +1,114 @@
+"""
+Teacher-to-student visibility.
+
+Teachers see the students enrolled in their courses. Instead of joining
+enrollments to courses on every teacher-scoped student query, the
+TeacherStudentVisibility table keeps one row per (teacher, student) with
+the number of enrollments behind it, and those queries join it on its
+unique (teacher, student) index.
+
+Counts go up when an enrollment is created, down when one is deleted,
+and move between teachers when a course changes teacher (see signals.py
+and EnrollmentSerializer.bulk_created). A row is dropped when its count
+reaches zero. Writes that bypass signals, such as queryset.update() of
+course teachers, need rebuild_visibility().
+"""
+from django.db import connections, transaction
+
+from .counts import invalidate_counts
+from .models import Course, Enrollment, TeacherStudentVisibility
+
+
+VISIBILITY = TeacherStudentVisibility._meta.db_table
+COURSES = Course._meta.db_table
+ENROLLMENTS = Enrollment._meta.db_table
+
+# Count one enrollment (student id, course id) for the course's teacher
+GRANT_ENROLLMENT = f"""
+INSERT INTO {VISIBILITY} (teacher_id, student_id, enrollment_count)
+SELECT teacher_id, %s, 1 FROM {COURSES} WHERE id = %s AND teacher_id IS NOT NULL
+ON CONFLICT (teacher_id, student_id)
+DO UPDATE SET enrollment_count = {VISIBILITY}.enrollment_count + 1
+"""
+
+REVOKE_ENROLLMENT = f"""
+UPDATE {VISIBILITY} SET enrollment_count = enrollment_count - 1
+WHERE student_id = %s AND teacher_id = (SELECT teacher_id FROM {COURSES} WHERE id = %s)
+"""
+
+DROP_UNUSED_ENROLLMENT = f"""
+DELETE FROM {VISIBILITY}
+WHERE student_id = %s AND teacher_id = (SELECT teacher_id FROM {COURSES} WHERE id = %s)
+AND enrollment_count = 0
+"""
+
+# Count every enrollment of a course (course id) for a teacher
+GRANT_COURSE = f"""
+INSERT INTO {VISIBILITY} (teacher_id, student_id, enrollment_count)
+SELECT %s, student_id, 1 FROM {ENROLLMENTS} WHERE course_id = %s
+ON CONFLICT (teacher_id, student_id)
+DO UPDATE SET enrollment_count = {VISIBILITY}.enrollment_count + 1
+"""
+
+REVOKE_COURSE = f"""
+UPDATE {VISIBILITY} SET enrollment_count = enrollment_count - 1
+WHERE teacher_id = %s AND student_id IN (SELECT student_id FROM {ENROLLMENTS} WHERE course_id = %s)
+"""
+
+DROP_UNUSED_TEACHER = f"DELETE FROM {VISIBILITY} WHERE teacher_id = %s AND enrollment_count = 0"
+
+REBUILD = f"""
+INSERT INTO {VISIBILITY} (teacher_id, student_id, enrollment_count)
+SELECT c.teacher_id, e.student_id, COUNT(*)
+FROM {ENROLLMENTS} e JOIN {COURSES} c ON c.id = e.course_id
+WHERE c.teacher_id IS NOT NULL
+GROUP BY c.teacher_id, e.student_id
+"""
+
+
+def grant_enrollments(pairs, using='default'):
+    """Count new enrollments, given as (student id, course id) pairs."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.executemany(GRANT_ENROLLMENT, pairs)
+    invalidate_counts(TeacherStudentVisibility)
+
+
+def revoke_enrollments(pairs, using='default'):
+    """
+    Uncount removed enrollments, given as (student id, course id) pairs.
+    The courses must still exist, as they do in an enrollment's
+    post_delete, cascades included.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.executemany(REVOKE_ENROLLMENT, pairs)
+        cursor.executemany(DROP_UNUSED_ENROLLMENT, pairs)
+    invalidate_counts(TeacherStudentVisibility)
+
+
+def move_course(course_id, old_teacher_id, new_teacher_id, using='default'):
+    """Move the counts of a course's enrollments from its old teacher to its new one."""
+    if old_teacher_id == new_teacher_id:
+        return
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        if old_teacher_id is not None:
+            cursor.execute(REVOKE_COURSE, [old_teacher_id, course_id])
+            cursor.execute(DROP_UNUSED_TEACHER, [old_teacher_id])
+        if new_teacher_id is not None:
+            cursor.execute(GRANT_COURSE, [new_teacher_id, course_id])
+    invalidate_counts(TeacherStudentVisibility)
+
+
+def rebuild_visibility(using='default'):
+    """Recompute the whole table from enrollments, returning its row count."""
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {VISIBILITY}')
+        cursor.execute(REBUILD)
+        rows = cursor.rowcount
+    invalidate_counts(TeacherStudentVisibility)
+    return rows
@@ -18,7 +18,9 @@ export const CourseManagement: React.FC = () => {
     const { data: courses, isLoading } = useQuery({
         queryKey: ['courses'],
         queryFn: async () => {
-            const response = await axiosInstance.get<PaginatedResponse<Course>>('/courses/');
+            const response = await axiosInstance.get<PaginatedResponse<Course>>('/courses/', {
+                params: { expand: 'teacher_detail' },
+            });
             return response.data;
         },
     });
@@ -5,19 +5,35 @@ import axiosInstance from '../../api/axiosInstance';
 import { LoadingSpinner } from '../../components/LoadingSpinner';
 import { DashboardLayout } from '../../components/DashboardLayout';
 
+// Page-number responses carry count; one row keeps the request small
+const countParams = { page: 1, page_size: 1 };
+const roles = ['student', 'teacher', 'admin', 'base'];
+
 export const AdminDashboard: React.FC = () => {
   const { data: users, isLoading: usersLoading } = useQuery({
     queryKey: ['users-count'],
     queryFn: async () => {
-      const response = await axiosInstance.get(`/users/`);
+      const response = await axiosInstance.get(`/users/`, { params: countParams });
       return response.data;
     },
   });
 
+  const { data: roleCounts, isLoading: roleCountsLoading } = useQuery({
+    queryKey: ['users-role-counts'],
+    queryFn: async () => {
+      const responses = await Promise.all(
+        roles.map((role) => axiosInstance.get(`/users/`, { params: { ...countParams, role } }))
+      );
+      return Object.fromEntries(
+        roles.map((role, index) => [role, responses[index].data.count || 0])
+      ) as Record<string, number>;
+    },
+  });
+
   const { data: courses, isLoading: coursesLoading } = useQuery({
     queryKey: ['courses-count'],
     queryFn: async () => {
-      const response = await axiosInstance.get(`/courses/`);
+      const response = await axiosInstance.get(`/courses/`, { params: countParams });
       return response.data;
     },
   });
@@ -25,7 +41,7 @@ export const AdminDashboard: React.FC = () => {
   const { data: enrollments, isLoading: enrollmentsLoading } = useQuery({
     queryKey: ['enrollments-count'],
     queryFn: async () => {
-      const response = await axiosInstance.get(`/enrollments/`);
+      const response = await axiosInstance.get(`/enrollments/`, { params: countParams });
       return response.data;
     },
   });
@@ -33,12 +49,12 @@ export const AdminDashboard: React.FC = () => {
   const { data: grades, isLoading: gradesLoading } = useQuery({
     queryKey: ['grades-count'],
     queryFn: async () => {
-      const response = await axiosInstance.get(`/grades/`);
+      const response = await axiosInstance.get(`/grades/`, { params: countParams });
       return response.data;
     },
   });
 
-  if (usersLoading || coursesLoading || enrollmentsLoading || gradesLoading) {
+  if (usersLoading || roleCountsLoading || coursesLoading || enrollmentsLoading || gradesLoading) {
     return (
       <DashboardLayout>
         <LoadingSpinner fullScreen />
@@ -132,29 +148,29 @@ export const AdminDashboard: React.FC = () => {
         <div className="bg-white p-6 rounded-xl shadow-md border border-gray-200">
           <h3 className="text-lg font-semibold text-gray-900 mb-4">User Distribution</h3>
           <div className="grid grid-cols-1 md:grid-cols-4 gap-4">
-            {users?.results && (
+            {roleCounts && (
               <>
                 <div className="text-center p-4 bg-blue-50 rounded-lg">
                   <div className="text-2xl font-bold text-blue-600">
-                    {users.results.filter((u: any) => u.role === 'student').length}
+                    {roleCounts.student}
                   </div>
                   <div className="text-sm text-blue-600">Students</div>
                 </div>
                 <div className="text-center p-4 bg-green-50 rounded-lg">
                   <div className="text-2xl font-bold text-green-600">
-                    {users.results.filter((u: any) => u.role === 'teacher').length}
+                    {roleCounts.teacher}
                   </div>
                   <div className="text-sm text-green-600">Teachers</div>
                 </div>
                 <div className="text-center p-4 bg-purple-50 rounded-lg">
                   <div className="text-2xl font-bold text-purple-600">
-                    {users.results.filter((u: any) => u.role === 'admin').length}
+                    {roleCounts.admin}
                   </div>
                   <div className="text-sm text-purple-600">Admins</div>
                 </div>
                 <div className="text-center p-4 bg-gray-50 rounded-lg">
                   <div className="text-2xl font-bold text-gray-600">
-                    {users.results.filter((u: any) => u.role === 'base').length}
+                    {roleCounts.base}
                   </div>
                   <div className="text-sm text-gray-600">Base Users</div>
                 </div>
@@ -14,7 +14,9 @@ export const EnrollmentManagement: React.FC = () => {
   const { data: enrollments, isLoading: enrollmentsLoading } = useQuery({
     queryKey: ['enrollments'],
     queryFn: async () => {
-      const response = await axiosInstance.get<PaginatedResponse<Enrollment>>('/enrollments/');
+      const response = await axiosInstance.get<PaginatedResponse<Enrollment>>('/enrollments/', {
+        params: { expand: 'student_detail' },
+      });
       return response.data;
     },
   });
@@ -13,7 +13,9 @@ export const MyEnrollments: React.FC = () => {
   const { data: enrollments, isLoading: enrollmentsLoading } = useQuery({
     queryKey: ['my-enrollments'],
     queryFn: async () => {
-      const response = await axiosInstance.get<PaginatedResponse<Enrollment>>('/enrollments/');
+      const response = await axiosInstance.get<PaginatedResponse<Enrollment>>('/enrollments/', {
+        params: { expand: 'course_detail' },
+      });
       return response.data;
     },
   });
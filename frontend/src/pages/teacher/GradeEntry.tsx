@@ -16,7 +16,9 @@ export const GradeEntry: React.FC = () => {
     queryKey: ['teacher-grades', selectedCourse],
     queryFn: async () => {
       const url = selectedCourse ? `/grades/?course=${selectedCourse}` : '/grades/';
-      const response = await axiosInstance.get<PaginatedResponse<Grade>>(url);
+      const response = await axiosInstance.get<PaginatedResponse<Grade>>(url, {
+        params: { expand: 'student_detail,course_detail' },
+      });
       return response.data;
     },
   });
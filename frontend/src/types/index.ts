@@ -84,7 +84,7 @@ export interface TokenResponse {
 }
 
 export interface PaginatedResponse<T> {
-  count: number;
+  count?: number; // absent with ?cursor=
   next: string | null;
   previous: string | null;
   results: T[];